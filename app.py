@@ -1,15 +1,15 @@
 import os
+import json
+import logging
+import hashlib
 import time
-import torch
 import jwt
 import datetime
-import threading
-import gc
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, g, render_template, request, redirect, url_for, flash, send_from_directory, send_file, jsonify, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from flask_dance.contrib.google import google
-from PIL import Image
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 
@@ -17,9 +17,22 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 from extension import db, bcrypt, login_manager
 from models import Feedback, User, ImageHistory
 from services.auth_service import create_google_blueprint
-from services.image_service import get_canny_image
+from services.image_service import inspect_image
+from services.preprocess_pool import preprocess_pool
 from services.sd_service import ai_service 
-from sqlalchemy import func
+from services.result_cache import result_cache
+from services.thumbnail_service import thumbnail_service, THUMB_SIZES, THUMB_FORMATS
+from services.job_service import generation_queue, QueueFullError, UserQueueFullError, STATUS_DONE
+from services.rate_limit_service import rate_limiter, RateLimitedError
+from services.feedback_stats import feedback_stats
+from services.auth_cache import auth_cache
+from services.edge_map_service import edge_map_store
+from services.storage_service import output_storage
+from services.rescore_service import rescore_service, RescoreAlreadyRunning
+from services.export_service import export_service
+from services.upload_service import upload_service, UploadError
+from services.metrics import metrics, RequestTiming, HTTP_REQUEST_SECONDS, QUEUE_REJECTIONS, timing_logger
+from sqlalchemy.orm import joinedload
 
 app = Flask(__name__)
 @app.after_request
@@ -35,22 +48,125 @@ def add_header(response):
     response.headers['User-Agent'] = 'CapstoneProject-Bot-Testing'
     
     return response
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if "request_start" in g:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, request.endpoint or "unknown", response.status_code)
+    return response
+
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 app.secret_key = "capstone_staging_ai_secret"
-app.config["SQLALCHEMY_DATABASE_URI"] = "mysql+pymysql://root@localhost/staging_ai"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "mysql+pymysql://root@localhost/staging_ai")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config['GENERATED_FOLDER'] = os.path.join('static', 'outputs')
+app.config['GENERATED_FOLDER'] = os.getenv("GENERATED_FOLDER", os.path.join('static', 'outputs'))
+app.config['HISTORY_PAGE_SIZE'] = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+app.config['HISTORY_MAX_PAGE_SIZE'] = 200
+
+# Thumbnail / format turunan gambar hasil generate
+app.config['DERIVED_FOLDER'] = os.getenv("DERIVED_FOLDER", os.path.join('static', 'derived'))
+app.config['THUMB_PRERENDER_SIZES'] = (256,)
+app.config['OUTPUT_MAX_AGE'] = 365 * 24 * 3600  # Nama file hasil unik, isinya tidak pernah berubah
 
 if not os.path.exists(app.config['GENERATED_FOLDER']):
     os.makedirs(app.config['GENERATED_FOLDER'])
 
+# Log timing per request / job (satu baris JSON) ke stdout
+if not timing_logger.handlers:
+    timing_logger.addHandler(logging.StreamHandler())
+    timing_logger.setLevel(logging.INFO if os.getenv("TIMING_LOG", "1") == "1" else logging.WARNING)
+    timing_logger.propagate = False
+
 # Inisialisasi Extensions
 db.init_app(app)
 bcrypt.init_app(app)
 login_manager.init_app(app)
 
-# Lock untuk mencegah Double Inference
-generation_lock = threading.Lock()
+# Preprocessing foto (decode + Canny + PNG) di pool proses terpisah (0 = di thread worker generate).
+# Proses worker dijalankan hook startup server (gunicorn.conf.py / lifespan asgi.py), bukan saat import.
+app.config['PREPROCESS_WORKERS'] = int(os.getenv("PREPROCESS_WORKERS", min(2, os.cpu_count() or 1)))
+app.config['PREPROCESS_MAX_PENDING'] = int(os.getenv("PREPROCESS_MAX_PENDING", 4))
+app.config['PREPROCESS_QUEUE_TIMEOUT'] = int(os.getenv("PREPROCESS_QUEUE_TIMEOUT", 30))
+preprocess_pool.init_app(app)
+
+# Antrean Generate: jumlah worker = jumlah slot backend cloud yang dipakai paralel
+app.config['GENERATION_WORKERS'] = int(os.getenv("GENERATION_WORKERS", 2))
+app.config['GENERATION_QUEUE_SIZE'] = int(os.getenv("GENERATION_QUEUE_SIZE", 16))
+app.config['GENERATION_RESULT_TTL'] = int(os.getenv("GENERATION_RESULT_TTL", 3600))
+# Penjadwalan adil per user: batas job antre / berjalan per user, dan bobot giliran akun admin
+app.config['GENERATION_USER_MAX_QUEUED'] = int(os.getenv("GENERATION_USER_MAX_QUEUED", 4))
+app.config['GENERATION_USER_MAX_RUNNING'] = int(os.getenv("GENERATION_USER_MAX_RUNNING", 1))
+app.config['GENERATION_ADMIN_WEIGHT'] = int(os.getenv("GENERATION_ADMIN_WEIGHT", 2))
+# Batas request AI per user (token bucket per menit + burst, 0 = tanpa batas) dan chat berjalan bersamaan
+app.config['CHAT_RATE_PER_MIN'] = float(os.getenv("CHAT_RATE_PER_MIN", 20))
+app.config['CHAT_BURST'] = int(os.getenv("CHAT_BURST", 10))
+app.config['CHAT_USER_CONCURRENCY'] = int(os.getenv("CHAT_USER_CONCURRENCY", 2))
+app.config['GENERATE_RATE_PER_MIN'] = float(os.getenv("GENERATE_RATE_PER_MIN", 6))
+app.config['GENERATE_BURST'] = int(os.getenv("GENERATE_BURST", 3))
+rate_limiter.init_app(app)
+
+# variants=N: jumlah gambar maksimal per request, dan total request varian paralel ke Cloud
+# (samakan dengan total slot backend; generate tunggal tetap dikerjakan langsung oleh worker).
+# Per job varian paralel dibatasi GENERATION_USER_MAX_RUNNING, tiap varian dihitung satu slot running user
+app.config['GENERATION_MAX_VARIANTS'] = int(os.getenv("GENERATION_MAX_VARIANTS", 4))
+app.config['GENERATION_FANOUT'] = int(os.getenv("GENERATION_FANOUT", 4))
+
+# Cache hasil generate (edge map + prompt yang sama -> pakai ulang gambar lama)
+app.config['RESULT_CACHE_ENABLED'] = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+app.config['RESULT_CACHE_MAX_ENTRIES'] = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 500))
+app.config['RESULT_CACHE_MAX_AGE'] = int(os.getenv("RESULT_CACHE_MAX_AGE", 7 * 24 * 3600))
+app.config['RESULT_CACHE_INDEX'] = os.getenv("RESULT_CACHE_INDEX", os.path.join(app.instance_path, "result_cache.json"))
+# Ingest feedback batch (ulasan yang di-buffer offline di Android) dan re-score massal
+app.config['FEEDBACK_BATCH_MAX'] = int(os.getenv("FEEDBACK_BATCH_MAX", 500))
+app.config['RESCORE_CHUNK_SIZE'] = int(os.getenv("RESCORE_CHUNK_SIZE", 1000))
+app.config['REVIEWS_PAGE_SIZE'] = int(os.getenv("REVIEWS_PAGE_SIZE", 50))
+app.config['DASHBOARD_DAYS'] = 30
+# Foto upload + edge map disimpan per hash isi untuk /api/generate/regenerate (bukan folder static publik)
+app.config['EDGE_MAP_FOLDER'] = os.getenv("EDGE_MAP_FOLDER", "edge_maps")
+app.config['EDGE_MAP_MAX_PER_USER'] = int(os.getenv("EDGE_MAP_MAX_PER_USER", 20))
+app.config['EDGE_MAP_MAX_AGE'] = int(os.getenv("EDGE_MAP_MAX_AGE", 30 * 24 * 3600))
+# Upload foto resumable (/api/uploads): ukuran maksimal, chunk maksimal, guard piksel, umur sesi (detik)
+app.config['UPLOAD_FOLDER'] = os.getenv("UPLOAD_FOLDER", "uploads")
+app.config['UPLOAD_MAX_BYTES'] = int(os.getenv("UPLOAD_MAX_MB", 20)) * 1024 * 1024
+app.config['UPLOAD_CHUNK_MAX'] = int(os.getenv("UPLOAD_CHUNK_MAX", 1024 * 1024))
+app.config['UPLOAD_MAX_PIXELS'] = int(os.getenv("UPLOAD_MAX_PIXELS", 50_000_000))
+app.config['UPLOAD_TTL'] = int(os.getenv("UPLOAD_TTL", 24 * 3600))
+# Body multipart /generate & /api/generate ikut dibatasi (413 sebelum file dibaca)
+app.config['MAX_CONTENT_LENGTH'] = app.config['UPLOAD_MAX_BYTES'] + 1024 * 1024
+upload_service.init_app(app)
+result_cache.init_app(app)
+edge_map_store.init_app(app)
+# Storage hasil: layout bertingkat per user, sweeper background, kuota (MB, 0 = tanpa batas)
+app.config['OUTPUT_SHARDING'] = os.getenv("OUTPUT_SHARDING", "1") == "1"
+app.config['STORAGE_USER_QUOTA'] = int(os.getenv("STORAGE_USER_QUOTA_MB", 0)) * 1024 * 1024
+app.config['STORAGE_GLOBAL_QUOTA'] = int(os.getenv("STORAGE_GLOBAL_QUOTA_MB", 0)) * 1024 * 1024
+app.config['STORAGE_SWEEP_INTERVAL'] = int(os.getenv("STORAGE_SWEEP_INTERVAL", 600))
+# PNG yang lebih tua dari N hari dikompres ulang ke WebP (0 = nonaktif)
+app.config['STORAGE_RECOMPRESS_AFTER'] = int(os.getenv("STORAGE_RECOMPRESS_AFTER_DAYS", 0)) * 24 * 3600
+thumbnail_service.init_app(app)
+output_storage.init_app(app)
+# Cache user / claims JWT untuk token_required (TTL detik)
+app.config['AUTH_CACHE_ENABLED'] = os.getenv("AUTH_CACHE_ENABLED", "1") == "1"
+app.config['AUTH_USER_CACHE_TTL'] = int(os.getenv("AUTH_USER_CACHE_TTL", 60))
+app.config['AUTH_TOKEN_CACHE_TTL'] = int(os.getenv("AUTH_TOKEN_CACHE_TTL", 300))
+# Export streaming (ZIP histori user, CSV/NDJSON ulasan admin): baris per query keyset / fetch cursor server
+app.config['EXPORT_CHUNK_SIZE'] = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+app.config['EXPORT_FETCH_SIZE'] = int(os.getenv("EXPORT_FETCH_SIZE", 1000))
+export_service.init_app(app)
+rescore_service.init_app(app, ai_service.predict_sentiment_batch)
+auth_cache.init_app(app, User)
+
+# Folder model lokal (dimuat di background oleh __main__, hook gunicorn, atau lifespan asgi.py)
+app.config['MODELS_DIR'] = os.getenv("MODELS_DIR", "./models")
+# Mode ASGI: thread untuk kerja sinkron route async (query DB, skor sentimen, retrieval chat),
+# dan batas long-poll GET /api/generate/<job_id>?wait=<detik>
+app.config['ASYNC_EXECUTOR_WORKERS'] = int(os.getenv("ASYNC_EXECUTOR_WORKERS", 16))
+app.config['WSGI_THREADS'] = int(os.getenv("WSGI_THREADS", 16))  # route Flask yang di-mount di asgi.py
+app.config['GENERATION_LONGPOLL_MAX'] = int(os.getenv("GENERATION_LONGPOLL_MAX", 60))
 
 # Register Google Blueprint (Untuk Web)
 app.register_blueprint(create_google_blueprint(), url_prefix="/login")
@@ -68,17 +184,71 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token is missing!'}), 401
         try:
-            # Format: Authorization: Bearer <token>
-            token = token.split(" ")[1] 
-            data = jwt.decode(token, app.secret_key, algorithms=["HS256"])
-            current_user_api = db.session.get(User, data['user_id'])
-            if not current_user_api:
-                raise Exception("User not found")
+            current_user_api = user_from_token(token)
         except:
             return jsonify({'message': 'Token is invalid!'}), 401
         return f(current_user_api, *args, **kwargs)
     return decorated
 
+def user_from_token(authorization):
+    """Header 'Bearer <token>' -> UserSnapshot; exception jika token / user tidak valid (dipakai juga oleh asgi.py)"""
+    # Format: Authorization: Bearer <token>
+    token = authorization.split(" ")[1]
+    data = auth_cache.decode_token(token, lambda t: jwt.decode(t, app.secret_key, algorithms=["HS256"]))
+    # Snapshot user (id, name, email, google_id, role) dari cache, query DB hanya saat miss
+    user = auth_cache.get_user(data['user_id'], lambda user_id: db.session.get(User, user_id))
+    if not user:
+        raise Exception("User not found")
+    return user
+
+
+# Detik yang disarankan ke client (Retry-After) selama model masih dimuat
+MODELS_RETRY_AFTER = 10
+
+def models_required(*names):
+    """
+    Tolak cepat (503 + Retry-After) selama model lokal belum selesai dimuat / warm-up.
+    `names` = model yang dipakai route (t5, sentiment); jika salah satunya gagal dimuat -> 503 tanpa Retry-After,
+    route lain yang tidak memakainya (misal chat) tetap dilayani.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            state = ai_service.model_state(*names)
+            if state != "ready":
+                loading = state == "loading"
+                if not request.path.startswith("/api/"):
+                    flash("Model AI masih dimuat, silakan coba beberapa saat lagi." if loading
+                          else "Model AI untuk fitur ini gagal dimuat, hubungi admin.", "warning")
+                    return redirect(url_for("index"))
+                msg = "Model AI masih dimuat, silakan coba lagi." if loading else "Model AI untuk fitur ini gagal dimuat."
+                response = jsonify({"message": msg, "models": ai_service.status()})
+                if loading:
+                    response.headers["Retry-After"] = str(MODELS_RETRY_AFTER)
+                return response, 503
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def rate_limit_response(e, status=429):
+    response = jsonify({"message": str(e), "retry_after": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, status
+
+def rate_limited(scope):
+    """Token bucket per user untuk route ber-token_required; 429 + Retry-After jika habis"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user_api, *args, **kwargs):
+            try:
+                rate_limiter.acquire(scope, current_user_api.id)
+            except RateLimitedError as e:
+                return rate_limit_response(e)
+            return f(current_user_api, *args, **kwargs)
+        return decorated
+    return decorator
+
 
 # ================= API ROUTES (UNTUK ANDROID) =================
 
@@ -128,17 +298,92 @@ def api_login_google():
     
     return jsonify({"token": token, "status": "success"})
 
+# Field yang boleh diminta lewat ?fields=id,image_url,...
+HISTORY_FIELDS = ("id", "prompt", "image_url", "thumb_url", "created_at", "edge_map_id", "batch_id")
+
 @app.route("/api/history", methods=["GET"])
 @token_required
 def api_get_history(current_user_api):
-    histories = ImageHistory.query.filter_by(user_id=current_user_api.id).order_by(ImageHistory.id.desc()).all()
-    data = [{
-        "id": h.id,
-        "prompt": h.prompt,
-        "image_url": url_for('display_image', filename=h.image_filename, _external=True),
-        "created_at": h.created_at
-    } for h in histories]
-    return jsonify({"status": "success", "data": data})
+    # Pagination keyset: ?cursor=<id terakhir halaman sebelumnya>&limit=N
+    limit = request.args.get("limit", app.config['HISTORY_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['HISTORY_MAX_PAGE_SIZE']))
+    cursor = request.args.get("cursor", type=int)
+
+    fields = request.args.get("fields")
+    fields = [f for f in fields.split(",") if f in HISTORY_FIELDS] if fields else list(HISTORY_FIELDS)
+
+    # Ambil kolom yang dibutuhkan saja, bukan seluruh objek ORM
+    columns = [ImageHistory.id, ImageHistory.image_filename]
+    if "prompt" in fields:
+        columns.append(ImageHistory.prompt)
+    if "created_at" in fields:
+        columns.append(ImageHistory.created_at)
+    if "edge_map_id" in fields:
+        columns.append(ImageHistory.edge_map_id)
+    if "batch_id" in fields:
+        columns.append(ImageHistory.batch_id)
+
+    query = db.session.query(*columns).filter(ImageHistory.user_id == current_user_api.id)
+    if cursor:
+        query = query.filter(ImageHistory.id < cursor)
+    rows = query.order_by(ImageHistory.id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = rows[-1].id if has_more else None
+
+    thumb_size = request.args.get("thumb_size", 256, type=int)
+    if thumb_size not in THUMB_SIZES:
+        thumb_size = 256
+
+    # Halaman yang sama -> ETag sama -> client cukup dapat 304.
+    # Host + thumb_size ikut dihitung karena keduanya menentukan URL di body respon
+    etag_src = f"{current_user_api.id}|{cursor}|{limit}|{','.join(fields)}|{next_cursor}|" \
+        f"{thumb_size}|{request.host_url}|" + ",".join(f"{r.id}:{r.image_filename}" for r in rows)
+    etag = hashlib.md5(etag_src.encode("utf-8")).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    # url_for cukup dipanggil sekali, lalu nama file disisipkan per baris
+    url_template = url_for('display_image', filename="__FILE__", _external=True)
+    thumb_template = url_for('display_thumbnail', size=thumb_size, filename="__FILE__", _external=True)
+    data = []
+    for r in rows:
+        item = {}
+        if "id" in fields:
+            item["id"] = r.id
+        if "prompt" in fields:
+            item["prompt"] = r.prompt
+        if "image_url" in fields:
+            item["image_url"] = url_template.replace("__FILE__", r.image_filename)
+        if "thumb_url" in fields:
+            item["thumb_url"] = thumb_template.replace("__FILE__", r.image_filename)
+        if "created_at" in fields:
+            item["created_at"] = r.created_at
+        if "edge_map_id" in fields:
+            item["edge_map_id"] = r.edge_map_id
+        if "batch_id" in fields:
+            item["batch_id"] = r.batch_id
+        data.append(item)
+
+    response = jsonify({"status": "success", "data": data, "next_cursor": next_cursor})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+@app.route("/api/history/export", methods=["GET"])
+@token_required
+def api_export_history(current_user_api):
+    # ZIP di-stream sambil ditulis: tidak ada arsip utuh di memori / disk
+    filename = f"riwayat_{current_user_api.id}_{datetime.date.today().isoformat()}.zip"
+    return Response(stream_with_context(export_service.history_zip(current_user_api.id)),
+                    mimetype="application/zip", headers={
+                        "Content-Disposition": f'attachment; filename="{filename}"',
+                        "Cache-Control": "private, no-store",
+                        "X-Accel-Buffering": "no",
+                    })
 
 @app.route("/api/history/delete/<int:history_id>", methods=["DELETE"])
 @token_required
@@ -147,40 +392,164 @@ def api_delete_history(current_user_api, history_id):
     if not history:
         return jsonify({"message": "Histori tidak ditemukan"}), 404
     try:
-        # Hapus file fisik
-        file_path = os.path.join("static/outputs", history.image_filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
+        filename = history.image_filename
         db.session.delete(history)
         db.session.commit()
+
+        # Hapus file fisik hanya jika tidak dipakai histori lain (hasil cache bisa dipakai bersama);
+        # file, thumbnail & entri cache dihapus oleh sweeper di background
+        if not ImageHistory.query.filter_by(image_filename=filename).first():
+            output_storage.delete_async(filename)
         return jsonify({"status": "success", "message": "Histori berhasil dihapus"})
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
+# ================= UPLOAD RESUMABLE (API) =================
+# POST /api/uploads {"size"} -> PATCH /api/uploads/<id> (Upload-Offset + body chunk mentah)
+# -> POST /api/uploads/<id>/complete {"sha256"} -> POST /api/generate dengan form upload_id=<id>
+
+def _upload_response(meta, status=200):
+    data = upload_service.public(meta)
+    data["upload_url"] = url_for('api_upload_chunk', upload_id=meta["id"], _external=True)
+    return jsonify({"status": "success", "data": data}), status
+
+@app.route("/api/uploads", methods=["POST"])
+@token_required
+def api_create_upload(current_user_api):
+    data = request.get_json(silent=True) or {}
+    try:
+        meta = upload_service.create(current_user_api.id, data.get("size"))
+    except UploadError as e:
+        return jsonify({"message": str(e), **e.extra}), e.status
+    response, status = _upload_response(meta, 201)
+    response.headers["Location"] = response.json["data"]["upload_url"]
+    return response, status
+
+@app.route("/api/uploads/<upload_id>", methods=["GET", "PATCH", "DELETE"])
+@token_required
+def api_upload_chunk(current_user_api, upload_id):
+    try:
+        if request.method == "GET":
+            # Offset yang sudah diterima server, dipakai client untuk melanjutkan setelah koneksi putus
+            return _upload_response(upload_service.get(current_user_api.id, upload_id))
+        if request.method == "DELETE":
+            upload_service.delete(current_user_api.id, upload_id)
+            return jsonify({"status": "success", "message": "Upload dibatalkan"})
+
+        offset = request.headers.get("Upload-Offset", request.args.get("offset"))
+        try:
+            offset = int(offset)
+        except (TypeError, ValueError):
+            return jsonify({"message": "Header Upload-Offset wajib diisi"}), 400
+        # Body dibaca per blok langsung ke file, tidak lewat request.data
+        new_offset = upload_service.append(current_user_api.id, upload_id, offset,
+                                           request.stream, request.content_length)
+        response = jsonify({"status": "success", "offset": new_offset})
+        response.headers["Upload-Offset"] = str(new_offset)
+        return response
+    except UploadError as e:
+        response = jsonify({"message": str(e), **e.extra})
+        if "offset" in e.extra:
+            response.headers["Upload-Offset"] = str(e.extra["offset"])
+        return response, e.status
+
+@app.route("/api/uploads/<upload_id>/complete", methods=["POST"])
+@token_required
+def api_complete_upload(current_user_api, upload_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        meta = upload_service.complete(current_user_api.id, upload_id, data.get("sha256"))
+    except UploadError as e:
+        return jsonify({"message": str(e), **e.extra}), e.status
+    return _upload_response(meta)
+
 # ================= FEEDBACK ROUTES (API) =================
 
 @app.route("/api/feedback", methods=["POST"])
 @token_required
+@models_required("sentiment")
 def api_submit_feedback(current_user_api):
     data = request.json
-    content = data.get("content")
-    star_rating = data.get("star_rating")
+    label = save_feedback(current_user_api.id, data.get("content"), data.get("star_rating"))
+    return jsonify({"status": "success", "sentiment": label})
+
+def save_feedback(user_id, content, star_rating):
+    """Skor sentimen + simpan satu ulasan; return label. Sinkron (di mode ASGI dijalankan di executor)."""
+    timing = RequestTiming("feedback", user_id=user_id)
 
     # PANGGIL FUNGSI DARI AISERVICE
     score, label = ai_service.predict_sentiment(content)
 
     new_fb = Feedback(
-        user_id=current_user_api.id,
+        user_id=user_id,
         content=content,
         star_rating=star_rating,
         ai_score=score,
         sentiment=label
     )
-    db.session.add(new_fb)
-    db.session.commit()
+    with timing.span("db_commit"):
+        feedback_stats.record_inserts([new_fb])
+        db.session.add(new_fb)
+        db.session.commit()
+    timing.emit("ok", sentiment=label)
+    return label
 
-    return jsonify({"status": "success", "sentiment": label})
+@app.route("/api/feedback/batch", methods=["POST"])
+@token_required
+@models_required("sentiment")
+def api_submit_feedback_batch(current_user_api):
+    # Body: {"items": [{"content": ..., "star_rating": 1-5, "created_at": <unix detik, opsional>}, ...]}
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"message": "items harus berupa list yang tidak kosong"}), 400
+    if len(items) > app.config['FEEDBACK_BATCH_MAX']:
+        return jsonify({"message": f"Maksimal {app.config['FEEDBACK_BATCH_MAX']} ulasan per batch"}), 413
+
+    # 1. Validasi per item, item yang tidak valid dilaporkan tanpa menggagalkan seluruh batch
+    results = [None] * len(items)
+    valid = []
+    now = datetime.datetime.utcnow()
+    for i, item in enumerate(items):
+        content = item.get("content") if isinstance(item, dict) else None
+        star_rating = item.get("star_rating") if isinstance(item, dict) else None
+        if not content or not isinstance(star_rating, int) or not 1 <= star_rating <= 5:
+            results[i] = {"index": i, "status": "error", "message": "content / star_rating tidak valid"}
+            continue
+        created_at = now
+        client_ts = item.get("created_at")
+        if isinstance(client_ts, (int, float)) and not isinstance(client_ts, bool):
+            # Timestamp dari client: NaN / inf / di luar jangkauan datetime dilaporkan sebagai error item ini
+            try:
+                if client_ts < 0:
+                    raise ValueError
+                created_at = min(now, datetime.datetime.utcfromtimestamp(client_ts))
+            except (OverflowError, ValueError, OSError):
+                results[i] = {"index": i, "status": "error", "message": "created_at tidak valid"}
+                continue
+        valid.append((i, content, star_rating, created_at))
+
+    timing = RequestTiming("feedback_batch", user_id=current_user_api.id, items=len(items))
+
+    # 2. Satu panggilan model untuk seluruh batch
+    predictions = ai_service.predict_sentiment_batch([v[1] for v in valid])
+
+    # 3. Satu commit untuk semua baris
+    feedbacks = [
+        Feedback(user_id=current_user_api.id, content=content, star_rating=star_rating,
+                 ai_score=score, sentiment=label, created_at=created_at)
+        for (_, content, star_rating, created_at), (score, label) in zip(valid, predictions)
+    ]
+    with timing.span("db_commit"):
+        feedback_stats.record_inserts(feedbacks)
+        db.session.add_all(feedbacks)
+        db.session.commit()
+
+    for (i, *_), fb in zip(valid, feedbacks):
+        results[i] = {"index": i, "status": "success", "id": fb.id, "sentiment": fb.sentiment}
+    timing.emit("ok", saved=len(feedbacks))
+
+    return jsonify({"status": "success", "saved": len(feedbacks), "results": results})
 
 # ================= PROFILE ROUTES (API) =================
 
@@ -233,6 +602,8 @@ def api_update_profile(current_user_api):
         
         # Eksekusi simpan
         db.session.commit()
+        # Snapshot lama di cache token_required tidak boleh dipakai lagi
+        auth_cache.invalidate_user(user.id)
         
         return jsonify({"status": "success", "message": "Profil berhasil diperbarui"})
     
@@ -250,6 +621,8 @@ def api_update_profile(current_user_api):
 
 @app.route("/api/chat", methods=["POST"])
 @token_required
+@models_required()
+@rate_limited("chat")
 def api_chat(current_user_api):
     data = request.json
     user_message = data.get("message")
@@ -258,13 +631,22 @@ def api_chat(current_user_api):
         return jsonify({"message": "Pesan tidak boleh kosong"}), 400
 
     try:
-        # Panggil fungsi yang baru kita buat di ai_service (sd_service.py)
-        # Fungsi ini akan otomatis mengirim pesan ke Colab via Ngrok
-        answer = ai_service.get_chat_response(user_message)
+        started = rate_limiter.enter("chat", current_user_api.id)
+    except RateLimitedError as e:
+        return rate_limit_response(e)
+    try:
+        # Dijawab dari index Dataset_json jika skor kemiripan tinggi,
+        # selain itu otomatis dikirim ke Colab via Ngrok
+        timing = RequestTiming("chat", user_id=current_user_api.id)
+        with timing.span("answer"):
+            answer = ai_service.answer_chat(user_message)
+        timing.emit("ok", source=answer["source"], score=answer["score"])
 
         return jsonify({
             "status": "success",
-            "reply": answer
+            "reply": answer["reply"],
+            "source": answer["source"],
+            "score": answer["score"]
         })
 
     except Exception as e:
@@ -273,112 +655,410 @@ def api_chat(current_user_api):
             "message": "Gagal memproses pesan ke chatbot cloud", 
             "error": str(e)
         }), 500
+    finally:
+        rate_limiter.leave("chat", current_user_api.id, started)
+    
+@app.route("/api/chat/stream", methods=["POST"])
+@token_required
+@models_required()
+@rate_limited("chat")
+def api_chat_stream(current_user_api):
+    data = request.json
+    user_message = data.get("message")
+
+    if not user_message:
+        return jsonify({"message": "Pesan tidak boleh kosong"}), 400
+
+    try:
+        started = rate_limiter.enter("chat", current_user_api.id)
+    except RateLimitedError as e:
+        return rate_limit_response(e)
+
+    def event_stream():
+        # Jika client putus, Werkzeug menutup generator ini -> GeneratorExit
+        # menutup koneksi stream ke backend cloud juga
+        events = ai_service.stream_chat_response(user_message)
+        try:
+            for ev in events:
+                name = ev.pop("event")
+                if name == "delta":
+                    yield f"data: {json.dumps(ev)}\n\n"
+                else:
+                    yield f"event: {name}\ndata: {json.dumps(ev)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            print(f"CHAT ERROR: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+        finally:
+            events.close()
+
+    response = Response(event_stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    # Slot chat dilepas saat response ditutup server, juga jika client putus sebelum stream dimulai
+    response.call_on_close(lambda: rate_limiter.leave("chat", current_user_api.id, started))
+    return response
     
 # ================= GENERATE LOGIC (UNIFIED - CLOUD MODE) =================
 
 @app.route("/generate", methods=["POST"])
 @login_required
+@models_required("t5")
 def generate():
     return _process_generation(current_user, is_api=False)
 
 @app.route("/api/generate", methods=["POST"])
 @token_required
+@models_required("t5")
 def api_generate(current_user_api):
     return _process_generation(current_user_api, is_api=True)
 
+@app.route("/api/generate/<job_id>", methods=["GET"])
+@token_required
+def api_generate_status(current_user_api, job_id):
+    job = generation_queue.get(job_id)
+    if not job or job.user_id != current_user_api.id:
+        return jsonify({"message": "Job tidak ditemukan"}), 404
+    return jsonify({"status": "success", "data": job_status_data(job)})
+
+def job_status_data(job):
+    """Status job generate untuk client (butuh request context untuk URL gambar)"""
+    data = job.to_dict()
+    data["queue_position"] = generation_queue.position(job)
+    if job.status == STATUS_DONE:
+        data["image_url"] = url_for('display_image', filename=job.result["image_filename"], _external=True)
+        data["prompt"] = job.result["prompt"]
+        data["cached"] = job.result["cached"]
+        data["edge_map_id"] = job.result["edge_map_id"]
+        data["batch_id"] = job.result["batch_id"]
+        data["variants"] = [
+            {"history_id": v["history_id"], "prompt": v["prompt"], "cached": v["cached"],
+             "image_url": url_for('display_image', filename=v["image_filename"], _external=True)}
+            for v in job.result["variants"]
+        ]
+        data["failed_variants"] = job.result["failed"]
+    return data
+
 def _process_generation(user_obj, is_api=False):
-    # 1. Lock agar tidak ada proses bersamaan (Concurrency Control)
-    if not generation_lock.acquire(blocking=False):
-        msg = "Server sibuk memproses gambar lain."
+    # 1. Validasi Input Gambar (di thread request, sebelum masuk antrean)
+    timing = RequestTiming("generate_submit", user_id=user_obj.id)
+    file = request.files.get("image")
+    upload_id = request.form.get("upload_id")
+    if not file and not upload_id:
+        msg = "File gambar tidak ditemukan."
         if is_api:
-            return jsonify({"message": msg}), 429
+            return jsonify({"message": msg}), 400
         else:
-            flash(msg, "warning")
+            flash(msg, "danger")
             return redirect(url_for("index"))
 
-    try:
-        # 2. Validasi Input Gambar
-        file = request.files.get("image")
-        if not file:
-            msg = "File gambar tidak ditemukan."
-            if is_api:
-                return jsonify({"message": msg}), 400
-            else:
-                flash(msg, "danger")
+    variants = _parse_variants(request.form.get('variants'))
+    if variants is None:
+        msg = f"variants harus angka 1-{app.config['GENERATION_MAX_VARIANTS']}."
+        if is_api:
+            return jsonify({"message": msg}), 400
+        else:
+            flash(msg, "danger")
+            return redirect(url_for("index"))
+
+    if file:
+        with timing.span("upload_read"):
+            # Format + dimensi dari header dulu (guard decompression bomb), baru isi file dibaca
+            try:
+                inspect_image(file.stream, app.config['UPLOAD_MAX_PIXELS'])
+            except ValueError as e:
+                if is_api:
+                    return jsonify({"message": str(e)}), 422
+                flash(str(e), "danger")
                 return redirect(url_for("index"))
+            source = {"image_bytes": file.read()}
+    else:
+        # Foto dari /api/uploads (resumable): isi dibaca worker dari disk, request ini tanpa body file
+        try:
+            meta = upload_service.get(user_obj.id, upload_id)
+        except UploadError as e:
+            if is_api:
+                return jsonify({"message": str(e)}), e.status
+            flash(str(e), "danger")
+            return redirect(url_for("index"))
+        if meta["status"] != "complete":
+            msg = "Upload belum selesai."
+            if is_api:
+                return jsonify({"message": msg, "offset": meta["offset"]}), 409
+            flash(msg, "warning")
+            return redirect(url_for("index"))
+        source = {"upload_id": upload_id}
 
-        # 3. Proses Canny Lokal (Laptop)
-        # Kita resize ke 512x512 agar proses upload ke Colab lebih cepat
-        pil_img = Image.open(file).convert("RGB")
-        canny_img = get_canny_image(pil_img).resize((512, 512))
-        
-        # Simpan canny sementara sebagai perantara
-        canny_temp_path = f"temp_canny_{user_obj.id}.png"
-        canny_img.save(canny_temp_path)
-        # 5. Generate Prompt Menggunakan T5 (Lokal di Laptop)
-        # Menghasilkan deskripsi AI berdasarkan tipe ruangan & gaya
-        prompt_ai = ai_service.generate_prompt(
-        request.form.get('room_type'), request.form.get('style'),
-        request.form.get('width'), request.form.get('length'), request.form.get('height')
-        )
-        negative_prompt = "low quality, blurry, distorted, messy room, low resolution, bad anatomy"
-        full_prompt = f"{prompt_ai}, photorealistic, 8k, interior photography, highly detailed"
-        
-        # 6. PANGGIL COLAB API (Proses AI Berat di Cloud)
-        print(f"Mengirim permintaan generate ke Colab untuk user {user_obj.id}...")
-        output_bytes = ai_service.generate_staged_image(full_prompt, negative_prompt, canny_temp_path)
-        
-        if not output_bytes:
-            raise Exception("Colab tidak mengembalikan gambar. Pastikan Colab aktif & Ngrok benar.")
+    payload = {
+        **source,
+        "room_type": request.form.get('room_type'),
+        "style": request.form.get('style'),
+        "width": request.form.get('width'),
+        "length": request.form.get('length'),
+        "height": request.form.get('height'),
+        # no_cache=1 memaksa sampel baru dari Cloud walaupun ada hasil yang sama di cache
+        "no_cache": request.form.get('no_cache', '').lower() in ("1", "true", "yes"),
+        "variants": variants,
+    }
 
-        # 7. Simpan Hasil Akhir ke Folder Static
-        output_filename = f"gen_{user_obj.id}_{int(time.time())}.png"
-        output_path = os.path.join(app.config['GENERATED_FOLDER'], output_filename)
-        
-        with open(output_path, "wb") as f:
-            f.write(output_bytes)
-
-        # 8. Simpan ke Database (Sesuaikan nama kolom dengan model Anda)
-        # Diasumsikan model database Anda bernama 'Generation'
-        new_history = ImageHistory(
-        user_id=user_obj.id, 
-        prompt=full_prompt, 
-        image_filename=output_filename, # Sesuai nama kolom di models.py
-        created_at=int(time.time())      # Sesuai tipe data Integer di models.py
-        )
-        db.session.add(new_history)
-        db.session.commit()
+    return _enqueue_generation(user_obj, payload, timing, is_api)
+
+@app.route("/api/generate/regenerate", methods=["POST"])
+@token_required
+@models_required("t5")
+def api_regenerate(current_user_api):
+    """
+    Generate ulang dari foto yang sudah pernah di-upload: tanpa upload & tanpa preprocessing.
+    Body (JSON / form): history_id atau edge_map_id, plus room_type, style, width, length, height, no_cache.
+    """
+    data = request.get_json(silent=True) or request.form
+    timing = RequestTiming("generate_submit", user_id=current_user_api.id, regenerate=True)
+
+    def as_int(name):
+        try:
+            return int(data.get(name)) if data.get(name) not in (None, "") else None
+        except (TypeError, ValueError):
+            return None
+
+    edge_map_id, history_id = as_int("edge_map_id"), as_int("history_id")
+    if edge_map_id is None and history_id is None:
+        return jsonify({"message": "history_id atau edge_map_id wajib diisi"}), 400
 
-        # 9. Bersihkan File Temporary
-        if os.path.exists(canny_temp_path):
-            os.remove(canny_temp_path)
+    variants = _parse_variants(data.get('variants'))
+    if variants is None:
+        return jsonify({"message": f"variants harus angka 1-{app.config['GENERATION_MAX_VARIANTS']}."}), 400
 
-        # 10. Return Response
+    edge_map = edge_map_store.resolve(current_user_api.id, edge_map_id=edge_map_id, history_id=history_id)
+    if edge_map is None:
+        # Tidak ada / sudah dibersihkan oleh retensi -> client harus upload ulang foto
+        return jsonify({"message": "Foto asal tidak tersedia lagi, silakan upload ulang."}), 404
+
+    payload = {
+        "edge_map_id": edge_map.id,
+        "room_type": data.get('room_type'),
+        "style": data.get('style'),
+        "width": data.get('width'),
+        "length": data.get('length'),
+        "height": data.get('height'),
+        "no_cache": str(data.get('no_cache', '')).lower() in ("1", "true", "yes"),
+        "variants": variants,
+    }
+    return _enqueue_generation(current_user_api, payload, timing, is_api=True)
+
+def _parse_variants(value):
+    """Nilai form variants -> int 1..GENERATION_MAX_VARIANTS (default 1), None jika tidak valid"""
+    if value in (None, ""):
+        return 1
+    try:
+        variants = int(value)
+    except (TypeError, ValueError):
+        return None
+    return variants if 1 <= variants <= app.config['GENERATION_MAX_VARIANTS'] else None
+
+def _enqueue_generation(user_obj, payload, timing, is_api):
+    # Batas submit per user (client yang retry terus-menerus ditolak di sini, bukan memenuhi antrean)
+    try:
+        rate_limiter.acquire("generate", user_obj.id)
+    except RateLimitedError as e:
+        timing.emit("rejected", reason="rate_limit")
         if is_api:
-            # Gunakan url_for agar Flutter mendapatkan URL lengkap (http://IP:PORT/...)
-            full_image_url = url_for('display_image', filename=output_filename, _external=True)
-            return jsonify({
-                "status": "success",
-                "message": "Gambar berhasil dibuat",
-                "image_url": full_image_url, # BENAR: Mengirim URL lengkap
-                "prompt": full_prompt
-            })
+            return rate_limit_response(e)
+        flash(str(e), "warning")
+        return redirect(url_for("index"))
+
+    # Kuota disk hasil (per user / global) dicek sebelum masuk antrean
+    quota = output_storage.over_quota(user_obj.id)
+    if quota:
+        # Ditolak karena kondisi server, bukan karena user: token rate limit dikembalikan
+        rate_limiter.refund("generate", user_obj.id)
+        timing.emit("rejected", reason=f"quota_{quota}")
+        msg = ("Kuota penyimpanan Anda penuh, hapus beberapa histori terlebih dahulu." if quota == "user"
+               else "Penyimpanan server penuh, silakan coba lagi nanti.")
+        if is_api:
+            return jsonify({"message": msg}), 507
         else:
-            flash("Gambar berhasil dibuat!", "success")
-            return redirect(url_for("history"))
+            flash(msg, "warning")
+            return redirect(url_for("index"))
 
-    except Exception as e:
-        print(f"GENERATION ERROR: {str(e)}")
-        error_msg = f"Gagal memproses gambar: {str(e)}"
+    # 2. Masukkan ke antrean, worker yang akan memproses ke Cloud
+    # Antrean dibagi per user dan diambil bergiliran; akun admin mendapat bobot giliran lebih besar
+    weight = app.config['GENERATION_ADMIN_WEIGHT'] if user_obj.role == 'admin' else 1
+    try:
+        job = generation_queue.submit(user_obj.id, payload, weight=weight, slots=payload["variants"])
+    except QueueFullError as e:
+        rate_limiter.refund("generate", user_obj.id)
+        reason = "user" if isinstance(e, UserQueueFullError) else "global"
+        QUEUE_REJECTIONS.inc(reason)
+        timing.emit("rejected", reason=f"queue_{reason}")
+        msg = str(e) + " Tunggu job sebelumnya selesai." if reason == "user" else "Server sibuk, antrean generate sedang penuh."
         if is_api:
-            return jsonify({"message": error_msg}), 500
+            response = jsonify({"message": msg, "retry_after": e.retry_after})
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, 429
         else:
-            flash(error_msg, "danger")
+            flash(msg, "warning")
             return redirect(url_for("index"))
-            
-    finally:
-        # Selalu buka lock di akhir proses, baik sukses maupun gagal
-        generation_lock.release()
+
+    timing.emit("queued", job_id=job.id)
+    if is_api:
+        return jsonify({
+            "status": "success",
+            "message": "Permintaan masuk antrean",
+            "job_id": job.id,
+            "job_status": job.status,
+            "queue_position": generation_queue.position(job),
+            "status_url": url_for('api_generate_status', job_id=job.id, _external=True)
+        }), 202
+    else:
+        flash("Permintaan generate masuk antrean, gambar sedang diproses.", "info")
+        return redirect(url_for("index"))
+
+def _run_generation_job(job):
+    """Dijalankan oleh worker antrean di dalam app context"""
+    timing = RequestTiming("generate", job_id=job.id, user_id=job.user_id)
+    try:
+        result = _generation_steps(job, timing)
+    except Exception as e:
+        timing.emit("failed", error=str(e))
+        raise
+    timing.emit("done", cached=result["cached"], variants=len(result["variants"]), failed=len(result["failed"]))
+    return result
+
+def _generation_steps(job, timing):
+    payload = job.payload
+    # 3. Proses Canny Lokal (Laptop), seluruhnya di memori
+    # Foto langsung di-decode & di-resize ke 512x512 sebelum Canny agar upload ke Colab cepat,
+    # dikerjakan di pool proses preprocessing (foto dikirim lewat shared memory)
+    # Foto yang sama (upload ulang / regenerate) memakai edge map tersimpan tanpa preprocessing ulang
+    with timing.span("canny"):
+        if payload.get("edge_map_id"):
+            edge_map, canny_bytes = edge_map_store.load(payload["edge_map_id"])
+        else:
+            image_bytes = payload.get("image_bytes") or upload_service.read(job.user_id, payload["upload_id"])
+            edge_map, canny_bytes = edge_map_store.get_or_create(job.user_id, image_bytes, preprocess_pool.canny_png)
+
+    # 5. Generate Prompt Menggunakan T5 (Lokal di Laptop)
+    # Menghasilkan deskripsi AI berdasarkan tipe ruangan & gaya; variants=N -> N prompt dalam satu panggilan
+    variants = payload.get("variants", 1)
+    with timing.span("prompt"):
+        prompts_ai = ai_service.generate_prompt_variants(
+        payload['room_type'], payload['style'],
+        payload['width'], payload['length'], payload['height'], variants
+        )
+    negative_prompt = "low quality, blurry, distorted, messy room, low resolution, bad anatomy"
+
+    def render(index):
+        full_prompt = f"{prompts_ai[index]}, photorealistic, 8k, interior photography, highly detailed"
+        # Seed per varian agar gambar tetap berbeda walaupun sampling T5 menghasilkan prompt yang sama
+        seed = index if variants > 1 else None
+
+        # 6. Cek cache hasil: foto & prompt identik dari user yang sama tidak perlu ke Cloud lagi
+        cache_key = result_cache.make_key(job.user_id, canny_bytes, full_prompt, negative_prompt, seed)
+        output_filename = None if payload["no_cache"] else result_cache.get(cache_key)
+        cached = output_filename is not None
+
+        if not cached:
+            # 7. PANGGIL COLAB API (Proses AI Berat di Cloud)
+            print(f"Mengirim permintaan generate ke Colab untuk user {job.user_id} (job {job.id}, varian {index})...")
+            # Hasil langsung ditulis ke Folder Static oleh ai_service
+            suffix = f"_{index}" if variants > 1 else ""
+            output_filename = output_storage.new_filename(job.user_id, job.id, suffix)
+            output_path = output_storage.path(output_filename, create_dirs=True)
+            written = ai_service.generate_staged_image(full_prompt, negative_prompt, canny_bytes, output_path, seed)
+
+            if not written:
+                raise Exception("Colab tidak mengembalikan gambar. Pastikan Colab aktif & Ngrok benar.")
+            output_storage.add_usage(output_filename, written)
+            result_cache.put(cache_key, output_filename)
+            thumbnail_service.prerender(output_filename)
+        return {"prompt": full_prompt, "image_filename": output_filename, "cached": cached}
+
+    # Varian dikirim paralel ke slot backend, paling banyak job.slots sekaligus (jatah running user);
+    # yang gagal dilaporkan tanpa menggagalkan yang berhasil
+    results, failed = [], []
+    with timing.span("cloud"):
+        if variants == 1:
+            results.append(render(0))
+        else:
+            for start in range(0, variants, job.slots):
+                indexes = range(start, min(start + job.slots, variants))
+                futures = [variant_executor.submit(render, i) for i in indexes]
+                for i, future in zip(indexes, futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        failed.append({"variant": i, "error": str(e)})
+    if not results:
+        raise Exception(failed[0]["error"])
+
+    # 8. Simpan ke Database
+    with timing.span("db_commit"):
+        histories = [
+            ImageHistory(
+            user_id=job.user_id,
+            prompt=r["prompt"],
+            image_filename=r["image_filename"], # Sesuai nama kolom di models.py
+            created_at=int(time.time()),        # Sesuai tipe data Integer di models.py
+            edge_map_id=edge_map.id,
+            batch_id=job.id if variants > 1 else None
+            )
+            for r in results
+        ]
+        db.session.add_all(histories)
+        db.session.commit()
+
+    for r, history in zip(results, histories):
+        r["history_id"] = history.id
+    first = results[0]
+    return {"history_id": first["history_id"], "image_filename": first["image_filename"], "prompt": first["prompt"],
+            "cached": all(r["cached"] for r in results), "edge_map_id": edge_map.id,
+            "batch_id": job.id if variants > 1 else None, "variants": results, "failed": failed}
+
+variant_executor = ThreadPoolExecutor(max_workers=app.config['GENERATION_FANOUT'], thread_name_prefix="gen-variant")
+generation_queue.init_app(app, _run_generation_job)
+
+
+# ================= METRICS (PROMETHEUS) =================
+
+metrics.callback("staging_result_cache_total", "Hit/miss cache hasil generate", "counter", ("result",),
+                 lambda: {("hit",): result_cache.stats()["hits"], ("miss",): result_cache.stats()["misses"]})
+metrics.callback("staging_prompt_cache_total", "Hit/miss cache prompt T5", "counter", ("result",),
+                 lambda: {("hit",): ai_service.prompt_cache.stats()["hits"], ("miss",): ai_service.prompt_cache.stats()["misses"]})
+metrics.callback("staging_auth_cache_total", "Hit/miss cache user & token JWT", "counter", ("cache", "result"),
+                 lambda: {(name, result): st[result] for name, st in auth_cache.stats().items() for result in ("hits", "misses")})
+metrics.callback("staging_storage_bytes", "Total byte gambar hasil generate di disk", "gauge", (),
+                 lambda: {(): output_storage.stats()["total_bytes"]})
+metrics.callback("staging_generation_queue", "Job generate yang sedang antre / berjalan", "gauge", ("state",),
+                 lambda: {(k,): v for k, v in generation_queue.stats().items()})
+metrics.callback("staging_preprocess_pending", "Job preprocessing foto yang menunggu / berjalan di pool proses", "gauge", (),
+                 lambda: {(): preprocess_pool.stats()["pending"]})
+metrics.callback("staging_backend_outstanding", "Request berjalan per backend cloud", "gauge", ("backend",),
+                 lambda: {(b["url"],): b["outstanding"] for b in ai_service.backends.status()})
+metrics.callback("staging_backend_circuit_open", "1 jika circuit breaker backend terbuka", "gauge", ("backend",),
+                 lambda: {(b["url"],): int(b["circuit_open"]) for b in ai_service.backends.status()})
+
+@app.route("/healthz")
+def healthz():
+    # Liveness: proses hidup dan bisa melayani request, tidak menunggu model
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: 200 hanya jika model sudah dimuat + warm-up, agar load balancer belum mengirim traffic AI
+    status = ai_service.status()
+    if status["ready"]:
+        return jsonify({"status": "ready", "models": status})
+    if status["loaded"]:
+        # Model wajib gagal dimuat (path / file salah): tidak akan ready tanpa restart, lihat models.errors
+        return jsonify({"status": "failed", "models": status}), 503
+    response = jsonify({"status": "loading", "models": status})
+    response.headers["Retry-After"] = str(MODELS_RETRY_AFTER)
+    return response, 503
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 # ================= WEB ROUTES =================
@@ -429,18 +1109,18 @@ def admin_dashboard():
         flash("Akses ditolak!", "danger")
         return redirect(url_for("login"))
 
-    # Statistik untuk Diagram
-    stats = db.session.query(
-        Feedback.sentiment, func.count(Feedback.id)
-    ).group_by(Feedback.sentiment).all()
-    
-    chart_data = {s[0]: s[1] for s in stats if s[0] is not None}
+    # Statistik untuk Diagram (dari tabel agregat, bukan GROUP BY atas seluruh feedback)
+    summary = feedback_stats.summary(days=app.config['DASHBOARD_DAYS'])
+    chart_data = {label: v["count"] for label, v in summary["by_sentiment"].items()}
     
     # Ambil 5 review terbaru untuk tabel ringkasan
-    recent_reviews = Feedback.query.order_by(Feedback.id.desc()).limit(5).all()
+    recent_reviews = (Feedback.query.options(joinedload(Feedback.user))
+                      .order_by(Feedback.id.desc()).limit(5).all())
 
     return render_template("admin/dashboard.html", 
                            chart_data=chart_data, 
+                           sentiment_stats=summary["by_sentiment"],
+                           daily=summary["daily"],
                            recent_reviews=recent_reviews)
 
 @app.route("/admin/add-admin", methods=["GET", "POST"])
@@ -473,18 +1153,115 @@ def admin_reviews():
     if current_user.role != 'admin':
         return redirect(url_for('login'))
     
-    # Ambil semua ulasan dari database
-    all_reviews = Feedback.query.order_by(Feedback.id.desc()).all()
-    return render_template("admin/reviews.html", reviews=all_reviews)
+    # Pagination keyset: ?before=<id terakhir halaman sebelumnya>, filter opsional ?sentiment=
+    page_size = app.config['REVIEWS_PAGE_SIZE']
+    before = request.args.get("before", type=int)
+    sentiment = request.args.get("sentiment") or None
+
+    query = Feedback.query.options(joinedload(Feedback.user))
+    if sentiment:
+        query = query.filter(Feedback.sentiment == sentiment)
+    if before:
+        query = query.filter(Feedback.id < before)
+    reviews = query.order_by(Feedback.id.desc()).limit(page_size + 1).all()
+
+    next_before = reviews[page_size - 1].id if len(reviews) > page_size else None
+    return render_template("admin/reviews.html", reviews=reviews[:page_size], next_before=next_before,
+                           sentiment=sentiment, is_first_page=not before, rescore=rescore_service.progress())
 
 
-@app.route('/static/outputs/<filename>')
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+@app.route("/admin/reviews/export")
+@login_required
+def admin_export_reviews():
+    if current_user.role != 'admin':
+        return redirect(url_for('login'))
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"message": "format harus csv atau ndjson"}), 400
+    sentiment = request.args.get("sentiment") or None
+
+    filename = f"ulasan_{sentiment.lower() + '_' if sentiment else ''}{datetime.date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(export_service.feedback_export(fmt, sentiment)),
+                    mimetype=EXPORT_FORMATS[fmt], headers={
+                        "Content-Disposition": f'attachment; filename="{filename}"',
+                        "Cache-Control": "no-store",
+                        "X-Accel-Buffering": "no",
+                    })
+
+
+@app.route("/admin/reviews/rescore", methods=["POST"])
+@login_required
+def admin_rescore_reviews():
+    if current_user.role != 'admin':
+        return redirect(url_for('login'))
+
+    if ai_service.model_state("sentiment") != "ready" or ai_service.rf_model is None:
+        flash("Model sentimen belum dimuat.", "warning")
+        return redirect(url_for("admin_reviews"))
+    try:
+        rescore_service.start()
+        flash("Re-score ulasan dimulai di background.", "success")
+    except RescoreAlreadyRunning as e:
+        flash(str(e), "warning")
+    return redirect(url_for("admin_reviews"))
+
+@app.route("/admin/reviews/rescore/status")
+@login_required
+def admin_rescore_status():
+    if current_user.role != 'admin':
+        return jsonify({"message": "Akses ditolak"}), 403
+    return jsonify(rescore_service.progress())
+
+@app.route("/admin/queue/status")
+@login_required
+def admin_queue_status():
+    # Rincian antrean per user hanya untuk admin (/metrics publik tidak memuat user ID)
+    if current_user.role != 'admin':
+        return jsonify({"message": "Akses ditolak"}), 403
+    return jsonify({**generation_queue.stats(),
+                    "users": {str(uid): st for uid, st in generation_queue.user_stats().items()}})
+
+
+@app.route('/static/outputs/<path:filename>')
 def display_image(filename):
-    return send_from_directory("static/outputs", filename)
+    # PNG lama yang sudah dikompres ulang ke WebP: URL lama (ter-cache client / app) diarahkan ke nama baru
+    new_filename = output_storage.renamed(filename)
+    if new_filename:
+        return redirect(url_for('display_image', filename=new_filename), 301)
+    return send_from_directory(app.config['GENERATED_FOLDER'], filename, max_age=app.config['OUTPUT_MAX_AGE'])
+
+@app.route('/thumbs/<int:size>/<path:filename>')
+def display_thumbnail(filename, size):
+    # ?format=webp (default) atau jpeg
+    fmt = request.args.get("format", "webp")
+    if size not in THUMB_SIZES or fmt not in THUMB_FORMATS:
+        return jsonify({"message": "Ukuran atau format thumbnail tidak didukung"}), 400
+
+    path = thumbnail_service.get(filename, size, fmt)
+    if path is None:
+        new_filename = output_storage.renamed(filename)
+        if new_filename:
+            return redirect(url_for('display_thumbnail', size=size, filename=new_filename, **request.args), 301)
+        return jsonify({"message": "Gambar tidak ditemukan"}), 404
+
+    response = send_file(
+        path,
+        mimetype=THUMB_FORMATS[fmt][1],
+        etag=thumbnail_service.etag(filename, size, fmt),
+        conditional=True,
+        max_age=app.config['OUTPUT_MAX_AGE'],
+    )
+    response.headers["Cache-Control"] = f"public, max-age={app.config['OUTPUT_MAX_AGE']}, immutable"
+    return response
 
 
 
 if __name__ == "__main__":
-    with app.app_context():
-        ai_service.load_models("./models")
+    # Model dimuat di background: server langsung listen, /readyz menjadi 200 setelah warm-up selesai
+    ai_service.start_background_load(app.config['MODELS_DIR'])
+    # Pool preprocessing tidak di-start di mode dev: worker forkserver meng-import ulang modul __main__
+    # (app.py ini beserta thread background-nya), foto diproses langsung di thread worker generate
     app.run(debug=True, host="0.0.0.0", port=5000, use_reloader=False)
\ No newline at end of file
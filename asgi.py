@@ -0,0 +1,246 @@
+"""
+Mode serving async (ASGI) untuk route yang menunggu AI / backend cloud.
+
+Route di bawah ditulis ulang sebagai coroutine: selama menunggu Colab (hingga 60 detik untuk chat)
+request hanya memegang koneksi + coroutine, bukan thread, sehingga satu proses bisa menahan ribuan
+client yang sedang menunggu dengan memori datar:
+    POST /api/chat                  -> aiohttp async ke backend cloud
+    POST /api/chat/stream           -> SSE, stream backend dibaca dengan aiohttp
+    POST /api/feedback              -> skor sentimen + commit DB di executor
+    GET  /api/generate/<job_id>     -> long-poll ?wait=<detik> sampai job selesai (tanpa thread)
+Route lain (web, admin, upload POST /api/generate yang langsung membalas 202, dst.) tetap dilayani
+aplikasi Flask lewat a2wsgi dengan pool thread terbatas.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    gunicorn -c gunicorn.conf.py asgi:app
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import wraps
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, MODELS_RETRY_AFTER, user_from_token, save_feedback, job_status_data
+from services.sd_service import ai_service
+from services.preprocess_pool import preprocess_pool
+from services.job_service import generation_queue, STATUS_DONE, STATUS_FAILED
+from services.metrics import RequestTiming, HTTP_REQUEST_SECONDS
+from services.rate_limit_service import rate_limiter, RateLimitedError
+
+# Kerja sinkron (query DB saat cache auth miss, skor sentimen, retrieval chat) dijalankan di sini
+executor = ThreadPoolExecutor(max_workers=flask_app.config['ASYNC_EXECUTOR_WORKERS'], thread_name_prefix="asgi-sync")
+
+
+async def run_sync(fn, *args):
+    """Jalankan fn di executor dengan app context Flask (db.session dibersihkan saat context ditutup)"""
+    def call():
+        with flask_app.app_context():
+            return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+# ================= DECORATOR =================
+
+def observed(endpoint):
+    """Catat latensi ke staging_http_request_seconds seperti hook after_request Flask"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(request):
+            t0 = time.perf_counter()
+            response = await f(request)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint, response.status_code)
+            return response
+        return decorated
+    return decorator
+
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(request):
+        token = request.headers.get('Authorization')
+        if not token:
+            return JSONResponse({'message': 'Token is missing!'}, 401)
+        try:
+            current_user_api = await run_sync(user_from_token, token)
+        except Exception:
+            return JSONResponse({'message': 'Token is invalid!'}, 401)
+        return await f(request, current_user_api)
+    return decorated
+
+
+def models_required(*names):
+    # Sama dengan app.models_required: loading -> 503 + Retry-After, model route gagal dimuat -> 503
+    def decorator(f):
+        @wraps(f)
+        async def decorated(request, *args):
+            state = ai_service.model_state(*names)
+            if state == "loading":
+                return JSONResponse({"message": "Model AI masih dimuat, silakan coba lagi.", "models": ai_service.status()},
+                                    503, headers={"Retry-After": str(MODELS_RETRY_AFTER)})
+            if state == "failed":
+                return JSONResponse({"message": "Model AI untuk fitur ini gagal dimuat.", "models": ai_service.status()}, 503)
+            return await f(request, *args)
+        return decorated
+    return decorator
+
+
+def rate_limit_response(e):
+    return JSONResponse({"message": str(e), "retry_after": e.retry_after}, 429,
+                        headers={"Retry-After": str(e.retry_after)})
+
+
+def rate_limited(scope):
+    """Token bucket per user, sama dengan decorator rate_limited di app.py"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(request, current_user_api):
+            try:
+                rate_limiter.acquire(scope, current_user_api.id)
+            except RateLimitedError as e:
+                return rate_limit_response(e)
+            return await f(request, current_user_api)
+        return decorated
+    return decorator
+
+
+async def json_body(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+# ================= ROUTES =================
+
+@observed("api_chat")
+@token_required
+@models_required()
+@rate_limited("chat")
+async def api_chat(request, current_user_api):
+    user_message = (await json_body(request)).get("message")
+    if not user_message:
+        return JSONResponse({"message": "Pesan tidak boleh kosong"}, 400)
+
+    try:
+        started = rate_limiter.enter("chat", current_user_api.id)
+    except RateLimitedError as e:
+        return rate_limit_response(e)
+    try:
+        timing = RequestTiming("chat", user_id=current_user_api.id)
+        with timing.span("answer"):
+            answer = await ai_service.answer_chat_async(user_message, executor)
+        timing.emit("ok", source=answer["source"], score=answer["score"])
+        return JSONResponse({
+            "status": "success",
+            "reply": answer["reply"],
+            "source": answer["source"],
+            "score": answer["score"]
+        })
+    except Exception as e:
+        print(f"CHAT ERROR: {str(e)}")
+        return JSONResponse({"message": "Gagal memproses pesan ke chatbot cloud", "error": str(e)}, 500)
+    finally:
+        rate_limiter.leave("chat", current_user_api.id, started)
+
+
+@observed("api_chat_stream")
+@token_required
+@models_required()
+@rate_limited("chat")
+async def api_chat_stream(request, current_user_api):
+    user_message = (await json_body(request)).get("message")
+    if not user_message:
+        return JSONResponse({"message": "Pesan tidak boleh kosong"}, 400)
+
+    try:
+        started = rate_limiter.enter("chat", current_user_api.id)
+    except RateLimitedError as e:
+        return rate_limit_response(e)
+
+    async def event_stream():
+        # Client putus -> generator dibatalkan, blok `async with` stream backend ikut ditutup
+        events = ai_service.stream_chat_response_async(user_message, executor)
+        try:
+            async for ev in events:
+                name = ev.pop("event")
+                if name == "delta":
+                    yield f"data: {json.dumps(ev)}\n\n"
+                else:
+                    yield f"event: {name}\ndata: {json.dumps(ev)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            print(f"CHAT ERROR: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+        finally:
+            await events.aclose()
+
+    # Slot chat dilepas setelah response selesai / client putus (background task tetap dijalankan Starlette)
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    }, background=BackgroundTask(rate_limiter.leave, "chat", current_user_api.id, started))
+
+
+@observed("api_submit_feedback")
+@token_required
+@models_required("sentiment")
+async def api_submit_feedback(request, current_user_api):
+    data = await json_body(request)
+    label = await run_sync(save_feedback, current_user_api.id, data.get("content"), data.get("star_rating"))
+    return JSONResponse({"status": "success", "sentiment": label})
+
+
+@observed("api_generate_status")
+@token_required
+async def api_generate_status(request, current_user_api):
+    job_id = request.path_params["job_id"]
+    job = generation_queue.get(job_id)
+    if not job or job.user_id != current_user_api.id:
+        return JSONResponse({"message": "Job tidak ditemukan"}, 404)
+
+    # Long-poll: tahan request sampai job selesai / gagal atau batas wait habis (0 = langsung jawab)
+    try:
+        wait = min(max(float(request.query_params.get("wait", 0)), 0), flask_app.config['GENERATION_LONGPOLL_MAX'])
+    except ValueError:
+        return JSONResponse({"message": "wait harus berupa angka (detik)"}, 400)
+    deadline = time.monotonic() + wait
+    while job.status not in (STATUS_DONE, STATUS_FAILED) and time.monotonic() < deadline:
+        await asyncio.sleep(min(0.5, deadline - time.monotonic()))
+
+    def status_data():
+        # URL gambar absolut dibangun dari host request ini
+        with flask_app.test_request_context(base_url=str(request.base_url)):
+            return job_status_data(job)
+    return JSONResponse({"status": "success", "data": await run_sync(status_data)})
+
+
+# ================= APP =================
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Dijalankan uvicorn langsung maupun lewat gunicorn (hook di gunicorn.conf.py aman dipanggil dua kali)
+    ai_service.start_background_load(flask_app.config['MODELS_DIR'])
+    preprocess_pool.start()
+    yield
+    await ai_service.backends.aclose()
+    executor.shutdown(wait=False)
+    preprocess_pool.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/chat", api_chat, methods=["POST"]),
+        Route("/api/chat/stream", api_chat_stream, methods=["POST"]),
+        Route("/api/feedback", api_submit_feedback, methods=["POST"]),
+        Route("/api/generate/{job_id}", api_generate_status, methods=["GET"]),
+        Mount("/", WSGIMiddleware(flask_app, workers=flask_app.config['WSGI_THREADS'])),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,192 @@
+"""
+Ribuan client /api/chat yang menunggu backend cloud lambat: mode sinkron (gunicorn gthread, app:app)
+vs mode async (uvicorn, asgi:app).
+
+Backend tiruan (fake_backend.py, proses terpisah) membalas /chat setelah --latency detik. Semua client
+dikirim serentak; dicatat berapa yang selesai sebelum --timeout, latensi, serta RSS dan jumlah thread
+puncak proses server (dibaca dari /proc).
+
+    python benchmarks/bench_async_chat.py --mode async --clients 2000 --latency 5
+    python benchmarks/bench_async_chat.py --mode sync --clients 2000 --latency 5 --threads 32
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+
+
+def proc_stats(pids):
+    """(RSS MB, thread) dijumlah untuk semua pid (master + worker gunicorn)"""
+    rss, threads = 0, 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) / 1024
+                    elif line.startswith("Threads:"):
+                        threads += int(line.split()[1])
+        except OSError:
+            pass
+    return rss, threads
+
+
+def cpu_seconds(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except OSError:
+            pass
+    return total
+
+
+def server_pids(root_pid):
+    pids = [root_pid]
+    try:
+        children = subprocess.check_output(["pgrep", "-P", str(root_pid)]).decode().split()
+        pids += [int(p) for p in children]
+    except subprocess.CalledProcessError:
+        pass
+    return pids
+
+
+def prepare_db():
+    """Buat tabel + satu user, return token JWT"""
+    from app import app
+    from extension import db
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post("/api/register", json={"name": "bench", "email": "bench@example.com", "password": "rahasia123"})
+    return client.post("/api/login", json={"email": "bench@example.com", "password": "rahasia123"}).json["token"]
+
+
+async def wait_ready(base_url, timeout=120):
+    import aiohttp
+
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            try:
+                async with session.get(base_url + "/readyz") as r:
+                    if r.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("Server tidak siap")
+
+
+async def run_clients(base_url, token, n, timeout, pids):
+    import aiohttp
+
+    latencies, errors = [], {}
+    peak = [0, 0]
+
+    async def sample():
+        while True:
+            rss, threads = proc_stats(pids)
+            peak[0], peak[1] = max(peak[0], rss), max(peak[1], threads)
+            await asyncio.sleep(0.2)
+
+    async def one(session, i):
+        t0 = time.perf_counter()
+        try:
+            # Kata acak di luar kosakata dataset -> skor retrieval 0 -> diteruskan ke Cloud
+            async with session.post(base_url + "/api/chat", json={"message": f"qzx{i} vbnm{i}"},
+                                    headers={"Authorization": f"Bearer {token}"}) as r:
+                data = await r.json() if r.status == 200 else {}
+                if data.get("source") == "cloud":
+                    latencies.append(time.perf_counter() - t0)
+                else:
+                    errors[str(r.status)] = errors.get(str(r.status), 0) + 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    sampler = asyncio.create_task(sample())
+    connector = aiohttp.TCPConnector(limit=n)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(session, i) for i in range(n)))
+        wall = time.perf_counter() - t0
+    sampler.cancel()
+    return latencies, errors, wall, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("async", "sync"), default="async")
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=5.0, help="Delay backend tiruan (detik)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Batas tunggu tiap client (detik)")
+    parser.add_argument("--threads", type=int, default=32, help="Thread worker gthread (mode sync)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--backend-port", type=int, default=7055)
+    args = parser.parse_args()
+
+    # Tiap client = 1 fd di sini + 2 fd di server (client & backend) + 1 fd di backend tiruan
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench_async.db')}",
+               MODELS_DIR=os.path.join(tmp, "models"),
+               GENERATED_FOLDER=os.path.join(tmp, "outputs"),
+               EDGE_MAP_FOLDER=os.path.join(tmp, "edge_maps"),
+               RESULT_CACHE_INDEX=os.path.join(tmp, "result_cache.json"),
+               COLAB_BACKEND_URLS=f"http://127.0.0.1:{args.backend_port}",
+               BACKEND_HEALTH_INTERVAL="0",
+               BACKEND_POOL_SIZE=str(args.threads),
+               BACKEND_ASYNC_POOL_SIZE=str(args.clients),
+               MODELS_REQUIRED="",  # Hanya chat Cloud yang diukur, tanpa T5 / model sentimen
+               TIMING_LOG="0")
+    os.environ.update(env)
+    token = prepare_db()
+
+    backend = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, "benchmarks", "fake_backend.py"),
+                                "--port", str(args.backend_port), "--latency", str(args.latency)],
+                               stdout=subprocess.DEVNULL)
+    if args.mode == "async":
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(args.port),
+               "--backlog", "4096", "--log-level", "warning", "--no-access-log"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app", "--bind",
+               f"127.0.0.1:{args.port}", "-w", "1", "-k", "gthread", "--threads", str(args.threads)]
+    server = subprocess.Popen(cmd, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_ready(base_url))
+        pids = server_pids(server.pid)
+        idle_rss, idle_threads = proc_stats(pids)
+        cpu_start, backend_cpu_start = cpu_seconds(pids), cpu_seconds([backend.pid])
+        latencies, errors, wall, (peak_rss, peak_threads) = asyncio.run(
+            run_clients(base_url, token, args.clients, args.timeout, pids))
+        cpu, backend_cpu = cpu_seconds(pids) - cpu_start, cpu_seconds([backend.pid]) - backend_cpu_start
+    finally:
+        server.terminate()
+        backend.terminate()
+        server.wait()
+        backend.wait()
+
+    latencies.sort()
+    print(f"mode {args.mode}: {args.clients} client serentak, backend {args.latency}s, timeout {args.timeout}s")
+    print(f"  selesai      : {len(latencies)}/{args.clients} dalam {wall:.1f}s, gagal {errors or '-'}")
+    if latencies:
+        print(f"  latensi      : p50 {latencies[len(latencies) // 2]:.2f}s, "
+              f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.2f}s")
+    print(f"  RSS server   : {idle_rss:.0f} MB idle -> {peak_rss:.0f} MB puncak")
+    print(f"  thread server: {idle_threads} idle -> {peak_threads} puncak")
+    print(f"  CPU          : server {cpu:.1f}s, backend tiruan {backend_cpu:.1f}s")
@@ -0,0 +1,68 @@
+"""
+Jumlah query DB dan latensi per request API ber-token, dengan dan tanpa cache token_required.
+
+Memakai campuran endpoint seperti loadtest (history polling, profile, status job) pada database
+SQLite sementara; query dihitung lewat event before_cursor_execute SQLAlchemy.
+
+    python benchmarks/bench_auth_cache.py --requests 2000 --users 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def run(client, app, tokens, n, auth_cache, enabled):
+    from sqlalchemy import event
+    from extension import db
+
+    auth_cache.enabled = enabled
+    counter = {"queries": 0}
+
+    def count(*_):
+        counter["queries"] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    paths = ["/api/history?limit=20"] * 6 + ["/api/profile"] * 2 + ["/api/generate/unknown"]
+    t0 = time.perf_counter()
+    for _ in range(n):
+        r = client.get(random.choice(paths), headers={"Authorization": f"Bearer {random.choice(tokens)}"})
+        assert r.status_code in (200, 404), r.status_code
+    elapsed = time.perf_counter() - t0
+    event.remove(engine, "before_cursor_execute", count)
+    return counter["queries"] / n, elapsed / n * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_auth.db')}"
+    os.environ.setdefault("TIMING_LOG", "0")
+
+    from app import app
+    from extension import db
+    from services.auth_cache import auth_cache
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    tokens = []
+    for i in range(args.users):
+        client.post("/api/register", json={"name": f"u{i}", "email": f"u{i}@example.com", "password": "rahasia123"})
+        r = client.post("/api/login", json={"email": f"u{i}@example.com", "password": "rahasia123"})
+        tokens.append(r.json["token"])
+
+    for enabled in (False, True):
+        queries, ms = run(client, app, tokens, args.requests, auth_cache, enabled)
+        label = "dengan cache" if enabled else "tanpa cache "
+        print(f"{label}: {queries:.2f} query DB / request, {ms:.2f} ms / request")
+    print(f"statistik cache: {auth_cache.stats()}")
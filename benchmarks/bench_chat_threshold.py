@@ -0,0 +1,90 @@
+"""
+Kalibrasi CHAT_LOCAL_THRESHOLD / CHAT_LOCAL_MARGIN untuk index retrieval chatbot (services/chat_retrieval.py).
+
+Dua kelompok pertanyaan dari Dataset_json:
+- positif: pertanyaan dataset yang sedikit diubah (huruf kecil tanpa '?', kata pengisi, satu kata dibuang);
+  seharusnya dijawab lokal dengan response-nya sendiri
+- leave-one-out: pertanyaan dataset ditanyakan ke index yang dibangun TANPA pertanyaan itu; jawaban lokal
+  apa pun (selain response yang identik) salah, setara pertanyaan baru yang mirip pertanyaan lain di dataset
+Per kombinasi threshold / margin dicetak: porsi positif yang dijawab lokal (dan benar), serta porsi
+leave-one-out yang salah dijawab lokal (seharusnya diteruskan ke Cloud).
+
+    python benchmarks/bench_chat_threshold.py
+    python benchmarks/bench_chat_threshold.py --thresholds 0.8,0.85,0.9 --margins 0,0.05
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+FILLERS = ["tolong jelaskan", "kak", "dong", "menurut anda", "mohon info"]
+
+
+def build_index(items, workdir):
+    from services.chat_retrieval import ChatRetrievalIndex
+
+    dataset_dir = tempfile.mkdtemp(dir=workdir)
+    with open(os.path.join(dataset_dir, "dataset.json"), "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False)
+    index = ChatRetrievalIndex()
+    index.load_or_build(dataset_dir, os.path.join(dataset_dir, "index"))
+    return index
+
+
+def perturb(question, rng):
+    yield question.lower().rstrip("?")
+    yield f"{rng.choice(FILLERS)} {question}"
+    words = question.rstrip("?").split()
+    if len(words) > 4:
+        drop = rng.randrange(len(words))
+        yield " ".join(w for i, w in enumerate(words) if i != drop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="Dataset_json")
+    parser.add_argument("--thresholds", default="0.6,0.7,0.75,0.8,0.85,0.9")
+    parser.add_argument("--margins", default="0,0.05,0.1")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    items = []
+    for path in sorted(glob.glob(os.path.join(args.dataset, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            items.extend(json.load(f))
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="bench_chat_threshold_")
+    try:
+        full = build_index(items, workdir)
+        positive = []  # (skor, runner-up, benar)
+        for item in items:
+            for question in perturb(item["instruction"], rng):
+                score, reply, _, runner_up = full.query(question)
+                positive.append((score, runner_up, reply == item["response"]))
+
+        leave_one_out = []
+        for i, item in enumerate(items):
+            index = build_index(items[:i] + items[i + 1:], workdir)
+            score, reply, _, runner_up = index.query(item["instruction"])
+            leave_one_out.append((score, runner_up, reply == item["response"]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(items)} data, {len(positive)} pertanyaan positif, {len(leave_one_out)} leave-one-out")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        for margin in (float(m) for m in args.margins.split(",")):
+            def local(score, runner_up):
+                return score >= threshold and score - runner_up >= margin
+
+            answered = [ok for score, runner_up, ok in positive if local(score, runner_up)]
+            wrong = sum(1 for score, runner_up, ok in leave_one_out if local(score, runner_up) and not ok)
+            print(f"  threshold {threshold:.2f} margin {margin:.2f}: positif dijawab lokal "
+                  f"{len(answered) / len(positive):6.1%} (benar {sum(answered) / max(len(answered), 1):6.1%}), "
+                  f"leave-one-out salah dijawab lokal {wrong / len(leave_one_out):6.1%}")
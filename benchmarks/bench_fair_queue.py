@@ -0,0 +1,98 @@
+"""
+Waktu tunggu antrean generate user biasa saat satu akun membanjiri antrean (client yang retry terus).
+
+Memakai GenerationQueue langsung dengan handler tiruan (sleep --job-seconds, setara satu panggilan
+Colab). Satu user berat mengirim job dari --heavy-threads thread tanpa jeda (langsung kirim ulang
+saat ditolak), sementara --users user biasa masing-masing mengirim satu job lalu menunggu hasilnya.
+Dicatat p50 / p99 waktu tunggu antrean + jumlah job selesai per kelompok.
+
+    python benchmarks/bench_fair_queue.py --duration 20 --users 8
+    python benchmarks/bench_fair_queue.py --user-max-queued 16 --user-max-running 2   # tanpa batas per user
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--user-max-queued", type=int, default=4)
+    parser.add_argument("--user-max-running", type=int, default=1)
+    parser.add_argument("--job-seconds", type=float, default=0.5)
+    parser.add_argument("--users", type=int, default=8, help="Jumlah user biasa")
+    parser.add_argument("--think", type=float, default=1.0, help="Jeda rata-rata user biasa antar job (detik)")
+    parser.add_argument("--heavy-threads", type=int, default=8)
+    args = parser.parse_args()
+
+    from flask import Flask
+    from services.job_service import GenerationQueue, QueueFullError, STATUS_DONE, STATUS_FAILED
+
+    app = Flask(__name__)
+    app.config.update(GENERATION_WORKERS=args.workers, GENERATION_QUEUE_SIZE=args.queue_size,
+                      GENERATION_USER_MAX_QUEUED=args.user_max_queued,
+                      GENERATION_USER_MAX_RUNNING=args.user_max_running)
+    queue = GenerationQueue()
+    queue.init_app(app, lambda job: time.sleep(args.job_seconds))
+
+    stop = time.time() + args.duration
+    waits = {"berat": [], "biasa": []}
+    rejected = {"berat": 0, "biasa": 0}
+    lock = threading.Lock()
+
+    def wait_done(job):
+        while job.status not in (STATUS_DONE, STATUS_FAILED):
+            time.sleep(0.01)
+
+    def heavy():
+        # Tiap thread: kirim, tunggu selesai, kirim lagi; ditolak -> langsung coba lagi
+        while time.time() < stop:
+            try:
+                job = queue.submit(0, {})
+            except QueueFullError:
+                with lock:
+                    rejected["berat"] += 1
+                time.sleep(0.005)
+                continue
+            wait_done(job)
+            with lock:
+                waits["berat"].append(job.started_at - job.created_at)
+
+    def light(user_id):
+        while time.time() < stop:
+            time.sleep(random.expovariate(1 / args.think))
+            try:
+                job = queue.submit(user_id, {})
+            except QueueFullError:
+                with lock:
+                    rejected["biasa"] += 1
+                continue
+            wait_done(job)
+            with lock:
+                waits["biasa"].append(job.started_at - job.created_at)
+
+    threads = [threading.Thread(target=heavy) for _ in range(args.heavy_threads)]
+    threads += [threading.Thread(target=light, args=(i + 1,)) for i in range(args.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"{args.workers} worker, job {args.job_seconds}s, antrean {args.queue_size}, per user: "
+          f"antre {args.user_max_queued} / berjalan {args.user_max_running}, {args.duration:.0f}s")
+    for group in ("berat", "biasa"):
+        w = waits[group]
+        print(f"  user {group:5}: {len(w):4} job selesai, tunggu antrean p50 {percentile(w, 0.5):.2f}s "
+              f"p99 {percentile(w, 0.99):.2f}s, ditolak {rejected[group]}")
@@ -0,0 +1,88 @@
+"""
+Benchmark /api/history dengan pagination keyset.
+
+Mengisi database SQLite sementara dengan banyak baris ImageHistory untuk satu user,
+lalu mengukur latensi halaman pertama, tengah dan terakhir (harus tetap datar),
+request ulang dengan If-None-Match (304), serta cara lama (.all() seluruh histori).
+
+    python benchmarks/bench_history_pagination.py --rows 100000
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return result, round(1000 * samples[len(samples) // 2], 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_history.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    import jwt
+    from app import app
+    from extension import db
+    from models import User, ImageHistory
+
+    with app.app_context():
+        db.create_all()
+        user = User(name="bench", email="bench@example.com", role="user")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        print(f"Mengisi {args.rows} baris histori...")
+        batch = []
+        for i in range(args.rows):
+            batch.append({"user_id": user_id, "prompt": f"prompt ruangan {i}",
+                          "image_filename": f"gen_{user_id}_{i}.png", "created_at": 1700000000 + i})
+            if len(batch) == 5000:
+                db.session.execute(ImageHistory.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(ImageHistory.__table__.insert(), batch)
+        db.session.commit()
+
+        token = jwt.encode({"user_id": user_id, "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+                           app.secret_key, algorithm="HS256")
+
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def page(cursor=None, extra_headers=None):
+        url = f"/api/history?limit={args.limit}" + (f"&cursor={cursor}" if cursor else "")
+        return client.get(url, headers={**headers, **(extra_headers or {})})
+
+    first, first_ms = timed(lambda: page(), args.runs)
+    _, middle_ms = timed(lambda: page(cursor=args.rows // 2), args.runs)
+    _, last_ms = timed(lambda: page(cursor=args.limit + 1), args.runs)
+    not_modified, etag_ms = timed(lambda: page(extra_headers={"If-None-Match": first.headers["ETag"]}), args.runs)
+
+    def old_all():
+        with app.app_context():
+            return ImageHistory.query.filter_by(user_id=user_id).order_by(ImageHistory.id.desc()).all()
+    _, old_ms = timed(old_all, 3)
+
+    print(f"halaman pertama   : {first_ms} ms ({len(first.data)} bytes)")
+    print(f"halaman tengah    : {middle_ms} ms")
+    print(f"halaman terakhir  : {last_ms} ms")
+    print(f"If-None-Match     : {etag_ms} ms (status {not_modified.status_code})")
+    print(f"cara lama .all()  : {old_ms} ms (query ORM saja, tanpa serialisasi)")
@@ -0,0 +1,56 @@
+"""
+Rincian waktu import `app.py` per paket top-level (dari `python -X importtime`).
+
+    python benchmarks/bench_import_time.py --top 12
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def measure(module):
+    env = dict(os.environ, DATABASE_URL=os.environ.get("DATABASE_URL", "sqlite://"))
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1])
+
+    # Baris: "import time: self [us] | cumulative | imported package", urutan post-order
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        parts = name.strip().split(".")
+        # Modul internal (services.*) ditampilkan per file, paket lain per nama top-level
+        key = ".".join(parts[:2]) if parts[0] == "services" else parts[0]
+        entries.append((len(name) - len(name.lstrip()), key, int(cumulative)))
+
+    # Hitung waktu kumulatif import terluar tiap paket (inklusif dependensinya)
+    per_package = {}
+    stack = []
+    for depth, key, cumulative in reversed(entries):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        if not any(k == key for _, k in stack):
+            per_package[key] = per_package.get(key, 0) + cumulative
+        stack.append((depth, key))
+    return wall, per_package
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    wall, per_package = measure(args.module)
+    print(f"import {args.module}: {wall:.2f} s total proses (termasuk startup interpreter)")
+    for name, us in sorted(per_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:24s} {us / 1e6:7.3f} s")
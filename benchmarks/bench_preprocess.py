@@ -0,0 +1,123 @@
+"""
+Benchmark preprocessing foto -> edge map Canny.
+
+Membandingkan jalur lama (decode penuh, Canny resolusi penuh, resize,
+tulis temp_canny_*.png lalu dibaca ulang) dengan jalur baru di memori
+(get_canny_png_bytes: decode draft + Canny di 512x512).
+
+Tiap mode dijalankan di subprocess terpisah agar peak RSS tidak tercampur.
+
+    python benchmarks/bench_preprocess.py --width 4000 --height 3000 --runs 10
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def peak_rss():
+    """Peak RSS proses ini (MB). VmHWM di-reset saat exec, berbeda dengan ru_maxrss yang diwarisi dari induk."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_photo(width, height):
+    """Buat foto JPEG sintetis (gradasi + noise) seukuran foto kamera HP"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = (x + y) / 2
+    img = np.stack([base, base[::-1], base[:, ::-1]], axis=-1)
+    img += rng.normal(0, 20, img.shape)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(img, 0, 255).astype("uint8")).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def run_old(image_bytes):
+    import base64
+    from PIL import Image
+    from services.image_service import get_canny_image
+
+    pil_img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    canny_img = get_canny_image(pil_img).resize((512, 512))
+    path = "temp_canny_bench.png"
+    canny_img.save(path)
+    with open(path, "rb") as f:
+        payload = base64.b64encode(f.read())
+    os.remove(path)
+    return payload
+
+
+def run_new(image_bytes):
+    import base64
+    from services.image_service import get_canny_png_bytes
+
+    return base64.b64encode(get_canny_png_bytes(image_bytes))
+
+
+def worker(mode, photo_path, runs):
+    with open(photo_path, "rb") as f:
+        image_bytes = f.read()
+    fn = run_old if mode == "old" else run_new
+    fn(image_bytes)  # warm-up (import cv2, dll)
+
+    cpu_times = []
+    wall_times = []
+    for _ in range(runs):
+        c0, w0 = time.process_time(), time.perf_counter()
+        fn(image_bytes)
+        cpu_times.append(time.process_time() - c0)
+        wall_times.append(time.perf_counter() - w0)
+
+    peak_rss_mb = peak_rss()
+    print(json.dumps({
+        "mode": mode,
+        "cpu_ms_per_request": round(1000 * sum(cpu_times) / runs, 2),
+        "wall_ms_per_request": round(1000 * sum(wall_times) / runs, 2),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--worker", choices=["old", "new"], help=argparse.SUPPRESS)
+    parser.add_argument("--photo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.photo, args.runs)
+        sys.exit(0)
+
+    # Foto dibuat sekali di proses induk agar tidak ikut terhitung di peak RSS worker
+    photo_path = "bench_photo.jpg"
+    with open(photo_path, "wb") as f:
+        f.write(make_photo(args.width, args.height))
+
+    print(f"Foto sintetis {args.width}x{args.height}, {args.runs} run per mode")
+    try:
+        for mode in ("old", "new"):
+            out = subprocess.check_output([
+                sys.executable, __file__, "--worker", mode, "--photo", photo_path, "--runs", str(args.runs),
+            ])
+            print(out.decode().strip())
+    finally:
+        os.remove(photo_path)
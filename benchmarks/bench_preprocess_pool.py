@@ -0,0 +1,72 @@
+"""
+Throughput preprocessing foto (decode + Canny + PNG) lewat pool proses (services/preprocess_pool.py)
+untuk beberapa jumlah proses worker, dibanding dikerjakan langsung di thread (workers 0).
+
+Foto dikirim dari --threads thread pemanggil sekaligus (setara worker antrean generate + request lain),
+sehingga pada mode thread decode / Canny berebut GIL, sedangkan pada pool tiap proses punya core sendiri.
+Hasil hanya naik sampai jumlah core yang tersedia (dicetak di awal).
+
+    python benchmarks/bench_preprocess_pool.py --workers 0,1,2,4 --jobs 64 --threads 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_preprocess import make_photo
+
+
+def run(pool, photo, jobs, threads):
+    remaining = [jobs]
+    lock = threading.Lock()
+
+    def caller():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            pool.canny_png(photo)
+
+    t0 = time.perf_counter()
+    callers = [threading.Thread(target=caller) for _ in range(threads)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+    return jobs / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--workers", default="0,1,2,4", help="Daftar jumlah proses, 0 = di thread pemanggil")
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8, help="Thread pemanggil serentak")
+    args = parser.parse_args()
+
+    from flask import Flask
+    from services.preprocess_pool import PreprocessPool
+
+    photo = make_photo(args.width, args.height)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"Foto sintetis {args.width}x{args.height} ({len(photo) // 1024} KB), {args.jobs} job, "
+          f"{args.threads} thread pemanggil, {cores} core tersedia")
+
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        app = Flask(__name__)
+        app.config.update(PREPROCESS_WORKERS=workers, PREPROCESS_MAX_PENDING=max(workers * 2, 1))
+        pool = PreprocessPool()
+        pool.init_app(app)
+        pool.start()
+        run(pool, photo, max(workers, 1) * 2, args.threads)  # warm-up (import cv2, proses worker)
+        rate = run(pool, photo, args.jobs, args.threads)
+        pool.shutdown()
+        baseline = baseline or rate
+        label = "thread" if workers == 0 else f"{workers} proses"
+        print(f"  {label:>9}: {rate:6.1f} foto/detik ({rate / baseline:.2f}x)")
@@ -0,0 +1,110 @@
+"""
+Benchmark backend inferensi T5 (torch / int8 / onnx) di CPU.
+
+Untuk tiap backend (di subprocess terpisah agar memori tidak tercampur):
+- latensi 1 prompt (rata-rata), throughput batch, peak RSS
+- output deterministik (do_sample=False) untuk sekumpulan input tetap,
+  dibandingkan dengan backend torch untuk cek paritas
+
+    python benchmarks/bench_t5_backends.py --models ./models --threads 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+FIXED_INPUTS = [
+    ("Kamar Tidur", "Minimalis", "3", "4", "3"),
+    ("Ruang Tamu", "Modern", "4", "5", "3"),
+    ("Dapur", "Industrial", "2.5", "3", "2.8"),
+    ("Ruang Keluarga", "Skandinavia", "5", "6", "3"),
+    ("Kamar Mandi", "Klasik", "2", "2.5", "2.7"),
+    ("Ruang Makan", "Japandi", "3.5", "4", "3"),
+    ("Kamar Anak", "Bohemian", "3", "3", "2.8"),
+    ("Ruang Kerja", "Kontemporer", "2.5", "3.5", "3"),
+]
+
+
+def peak_rss():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def worker(backend, models_dir, threads, runs):
+    os.environ["T5_BACKEND"] = backend
+    os.environ["T5_NUM_THREADS"] = str(threads)
+    from services.sd_service import AIService
+
+    service = AIService()
+    t0 = time.perf_counter()
+    service.load_models(models_dir)
+    load_s = time.perf_counter() - t0
+
+    texts = [
+        f"generate prompt: jenis_ruangan: {r}, gaya: {s}, lebar: {w}m, panjang: {l}m, tinggi: {h}m"
+        for r, s, w, l, h in FIXED_INPUTS
+    ]
+    service._generate_prompt_batch(texts[:1], do_sample=False)  # warm-up
+
+    latencies = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        service._generate_prompt_batch([texts[i % len(texts)]], do_sample=False)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    outputs = service._generate_prompt_batch(texts, do_sample=False)
+    batch_s = time.perf_counter() - t0
+
+    print(json.dumps({
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "latency_ms": round(1000 * sum(latencies) / runs, 1),
+        "throughput_prompts_per_s": round(len(texts) / batch_s, 2),
+        "peak_rss_mb": round(peak_rss(), 1),
+        "outputs": outputs,
+    }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default="./models")
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--backends", default="torch,int8,onnx")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.models, args.threads, args.runs)
+        sys.exit(0)
+
+    results = {}
+    for backend in args.backends.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, "--models", args.models,
+             "--threads", str(args.threads), "--runs", str(args.runs)],
+            capture_output=True, text=True,
+        )
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            print(f"{backend:6s} GAGAL: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        results[backend] = json.loads(lines[-1])
+
+    reference = results.get("torch", {}).get("outputs")
+    print(f"{'backend':8s} {'load_s':>7s} {'lat_ms':>8s} {'prompt/s':>9s} {'rss_mb':>8s} {'parity':>7s}")
+    for backend, r in results.items():
+        parity = "-"
+        if reference:
+            same = sum(a == b for a, b in zip(reference, r["outputs"]))
+            parity = f"{same}/{len(reference)}"
+        print(f"{backend:8s} {r['load_s']:7.2f} {r['latency_ms']:8.1f} "
+              f"{r['throughput_prompts_per_s']:9.2f} {r['peak_rss_mb']:8.1f} {parity:>7s}")
@@ -0,0 +1,68 @@
+"""
+Bandingkan transport generate: JSON base64 vs binary (multipart + image/png di-stream ke file).
+
+Menjalankan fake backend lokal yang mengembalikan gambar sintetis, lalu mengukur
+per request: byte di jaringan (dari sisi backend) dan peak memori Python (tracemalloc).
+
+    python benchmarks/bench_transport.py --output-px 1024 --runs 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_backend import run  # noqa: E402
+
+
+def get_stats(service):
+    return service.backends.request("GET", "/stats", timeout=5).json()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-px", type=int, default=1024)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=7201)
+    args = parser.parse_args()
+
+    server = run(args.port, output_px=args.output_px)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["COLAB_BACKEND_URLS"] = f"http://127.0.0.1:{args.port}"
+
+    from services.image_service import get_canny_png_bytes
+    from services.sd_service import AIService
+
+    sample_dir = os.path.join(BENCH_DIR, "..", "static", "uploads")
+    with open(os.path.join(sample_dir, sorted(os.listdir(sample_dir))[0]), "rb") as f:
+        canny = get_canny_png_bytes(f.read())
+    out_dir = tempfile.mkdtemp()
+    print(f"Edge map {len(canny) / 1024:.0f} KB, gambar hasil {len(server.RequestHandlerClass.output_png) / 1024:.0f} KB")
+
+    for mode in ("json", "binary"):
+        os.environ["GENERATE_TRANSPORT"] = mode
+        service = AIService()
+        before = get_stats(service)
+
+        peaks, times = [], []
+        for i in range(args.runs):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            written = service.generate_staged_image("prompt", "negative", canny, os.path.join(out_dir, f"{mode}_{i}.png"))
+            times.append(time.perf_counter() - t0)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert written, "generate gagal"
+
+        after = get_stats(service)
+        requests_made = after["requests"] - before["requests"] - 1  # tanpa request /stats pertama
+        print(f"{mode:6s}: upload {(after['bytes_in'] - before['bytes_in']) / requests_made / 1024:8.0f} KB/req, "
+              f"download {(after['bytes_out'] - before['bytes_out']) / requests_made / 1024:8.0f} KB/req, "
+              f"peak memori Python {max(peaks) / 1024 / 1024:6.1f} MB, "
+              f"{1000 * sum(times) / len(times):6.1f} ms/req")
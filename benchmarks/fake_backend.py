@@ -0,0 +1,176 @@
+"""
+Backend cloud tiruan (pengganti Colab/Ngrok) untuk uji lokal.
+
+Menyediakan endpoint yang sama dengan backend Colab:
+    GET  /health
+    GET  /stats                                               -> jumlah byte masuk/keluar
+    POST /chat       {"message": ...}                         -> {"reply": ...}
+    POST /chat/stream {"message": ...}                        -> SSE `data: {"token": ...}` per kata
+    POST /generate   {"prompt", "negative_prompt", "image"}   -> {"generated_image": <base64>}
+    POST /generate/binary  multipart (prompt, negative_prompt, image) -> image/png mentah
+
+Contoh uji failover dengan dua backend (satu mati):
+    python benchmarks/fake_backend.py --port 7001
+    python benchmarks/fake_backend.py --port 7002 --fail
+    COLAB_BACKEND_URLS=http://127.0.0.1:7001,http://127.0.0.1:7002 python app.py
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_output_png(px):
+    """Gambar noise acak NxN (PNG sulit dikompres, mirip ukuran hasil diffusion)"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (px, px, 3), dtype="uint8")).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def parse_multipart(content_type, body):
+    """Parser multipart/form-data minimal: {name: bytes}"""
+    boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+    fields = {}
+    for part in body.split(b"--" + boundary):
+        if b"\r\n\r\n" not in part:
+            continue
+        head, value = part.split(b"\r\n\r\n", 1)
+        for token in head.decode("utf-8", "replace").split(";"):
+            token = token.strip()
+            if token.startswith("name="):
+                fields[token[5:].strip('"')] = value[:-2] if value.endswith(b"\r\n") else value
+    return fields
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fail = False
+    error_rate = 0.0
+    stream = True
+    binary = True
+    token_delay = 0.05
+    output_png = None  # None = kembalikan gambar input apa adanya
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, received, sent):
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+            self.server.stats["bytes_in"] += received
+            self.server.stats["bytes_out"] += sent
+
+    def _send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self._count(self._received, len(body))
+
+    def _send_json(self, status, data):
+        self._send_body(status, "application/json", json.dumps(data).encode("utf-8"))
+
+    def _send_stream(self, reply):
+        # Kirim jawaban kata per kata sebagai Server-Sent Events (chunked)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for word in reply.split(" ") + ["[DONE]"]:
+                if word == "[DONE]":
+                    event = "data: [DONE]\n\n"
+                else:
+                    event = f"data: {json.dumps({'token': word + ' '})}\n\n"
+                chunk = event.encode("utf-8")
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+                time.sleep(self.token_delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client (server Flask) memutus stream -> berhenti generate
+            self.close_connection = True
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        self._received = len(body)
+        return body
+
+    def do_GET(self):
+        self._received = 0
+        if self.path == "/health":
+            if self.fail:
+                return self._send_json(503, {"status": "down"})
+            return self._send_json(200, {"status": "ok"})
+        if self.path == "/stats":
+            with self.server.stats_lock:
+                stats = dict(self.server.stats)
+            return self._send_json(200, stats)
+        self._send_json(404, {"message": "not found"})
+
+    def do_POST(self):
+        body = self._read_body()
+        time.sleep(self.latency)
+        if self.fail or (self.error_rate and random.random() < self.error_rate):
+            return self._send_json(500, {"message": "backend error"})
+
+        if self.path == "/generate/binary" and self.binary:
+            fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+            return self._send_body(200, "image/png", self.output_png or fields.get("image", b""))
+
+        data = json.loads(body or b"{}") if self.path in ("/chat", "/chat/stream", "/generate") else {}
+        if self.path == "/chat/stream" and self.stream:
+            return self._send_stream(f"[fake:{self.server.server_port}] {data.get('message')}")
+        if self.path == "/chat":
+            return self._send_json(200, {"reply": f"[fake:{self.server.server_port}] {data.get('message')}"})
+        if self.path == "/generate":
+            # Kembalikan gambar input apa adanya (atau gambar sintetis) sebagai "hasil generate"
+            image_b64 = base64.b64encode(self.output_png).decode() if self.output_png else data.get("image", "")
+            return self._send_json(200, {"generated_image": image_b64})
+        self._send_json(404, {"message": "not found"})
+
+
+def run(port, latency=0.0, fail=False, stream=True, binary=True, output_px=0, error_rate=0.0):
+    handler = type("Handler", (FakeBackendHandler,), {
+        "latency": latency,
+        "fail": fail,
+        "error_rate": error_rate,
+        "stream": stream,
+        "binary": binary,
+        "output_png": make_output_png(output_px) if output_px else None,
+    })
+    # Backlog besar agar ribuan koneksi serentak (bench_async_chat) tidak ditolak saat accept
+    server_class = type("Server", (ThreadingHTTPServer,), {"request_queue_size": 4096})
+    server = server_class(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0}
+    server.stats_lock = threading.Lock()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend cloud tiruan untuk uji lokal")
+    parser.add_argument("--port", type=int, default=7001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay tiap request (detik)")
+    parser.add_argument("--fail", action="store_true", help="Selalu balas 500 (simulasi node mati)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang tiap request dibalas 500 (0-1)")
+    parser.add_argument("--no-stream", action="store_true", help="/chat/stream balas 404 (backend lama)")
+    parser.add_argument("--no-binary", action="store_true", help="/generate/binary balas 404 (backend lama)")
+    parser.add_argument("--output-px", type=int, default=0, help="Ukuran gambar hasil sintetis (0 = echo input)")
+    args = parser.parse_args()
+
+    server = run(args.port, args.latency, args.fail, stream=not args.no_stream,
+                 binary=not args.no_binary, output_px=args.output_px, error_rate=args.error_rate)
+    print(f"Fake backend berjalan di http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,299 @@
+"""
+Load test untuk API Android: /api/generate, /api/chat, /api/feedback, /api/history.
+
+Mode --self-host (default) menjalankan semuanya di laptop tanpa GPU / internet:
+fake backend cloud (benchmarks/fake_backend.py), database SQLite sementara,
+dan app.py di server Werkzeug multi-thread. Mode --base-url menyerang server yang sudah berjalan.
+
+Hasil (p50/p95/p99, throughput, error rate per endpoint) disimpan sebagai JSON
+di benchmarks/results/ untuk dibandingkan antar commit:
+
+    python benchmarks/loadtest.py --concurrency 16 --duration 30
+    python benchmarks/loadtest.py --compare benchmarks/results/<file_lama>.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# Bobot campuran traffic default (endpoint -> bobot)
+DEFAULT_MIX = "generate=1,chat=4,feedback=2,history=6"
+# Jumlah gambar per request generate (--variants)
+VARIANTS = 1
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[idx] * 1000, 2)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # endpoint -> list[(latency_s, ok)]
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, latency, ok):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((latency, ok))
+
+    def summary(self, duration):
+        result = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(l for l, _ in samples)
+            errors = sum(1 for _, ok in samples if not ok)
+            result[endpoint] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / duration, 2),
+                "error_rate": round(errors / len(samples), 4),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+            }
+        return result
+
+
+# ================= SELF-HOST =================
+
+def start_self_hosted(args):
+    """Jalankan fake backend + app.py (SQLite sementara) di proses ini"""
+    from fake_backend import run as run_fake_backend
+    from werkzeug.serving import make_server
+
+    backend = run_fake_backend(args.backend_port, latency=args.backend_latency,
+                               output_px=args.backend_output_px, error_rate=args.backend_error_rate)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    os.environ["COLAB_BACKEND_URLS"] = f"http://127.0.0.1:{args.backend_port}"
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    os.environ["GENERATED_FOLDER"] = os.path.join(workdir, "outputs")
+    os.environ["DERIVED_FOLDER"] = os.path.join(workdir, "derived")
+    os.environ["EDGE_MAP_FOLDER"] = os.path.join(workdir, "edge_maps")
+    os.environ["RESULT_CACHE_INDEX"] = os.path.join(workdir, "result_cache.json")
+    os.environ.setdefault("TIMING_LOG", "0")
+    # Batas per user (token bucket / request bersamaan) dimatikan: tiap thread load test memang
+    # mengirim tanpa jeda, 429 dari rate limiter akan terhitung error. Set env-nya untuk mengukur limiter.
+    for name in ("CHAT_RATE_PER_MIN", "GENERATE_RATE_PER_MIN", "CHAT_USER_CONCURRENCY"):
+        os.environ.setdefault(name, "0")
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    from app import app
+    from extension import db
+    from services.sd_service import ai_service
+
+    with app.app_context():
+        db.create_all()
+    if args.models:
+        ai_service.load_models(args.models)
+    if ai_service.t5_model is None:
+        # Tanpa model T5 lokal: prompt diganti template tetap agar yang diukur adalah overhead service
+        print("ℹ️ INFO: Model T5 tidak dimuat, prompt generator diganti template tetap.")
+        ai_service.prompt_batcher.generate_fn = lambda texts: [f"interior {t}" for t in texts]
+        # Tanpa load_models model tidak pernah selesai dimuat, route AI akan menjawab 503
+        ai_service.models_loaded.set()
+        ai_service.models_ready.set()
+
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{args.port}"
+
+
+# ================= SKENARIO =================
+
+def get_token(base_url, index):
+    email = f"load_{uuid.uuid4().hex[:8]}_{index}@example.com"
+    requests.post(f"{base_url}/api/register", json={"name": "load", "email": email, "password": "rahasia123"})
+    r = requests.post(f"{base_url}/api/login", json={"email": email, "password": "rahasia123"})
+    return r.json()["token"]
+
+
+def load_sample_image():
+    sample_dir = os.path.join(ROOT_DIR, "static", "uploads")
+    with open(os.path.join(sample_dir, sorted(os.listdir(sample_dir))[0]), "rb") as f:
+        return f.read()
+
+
+def do_generate(session, base_url, recorder, image, poll_timeout):
+    form = {"room_type": random.choice(["Kamar Tidur", "Ruang Tamu", "Dapur"]),
+            "style": random.choice(["Minimalis", "Modern"]), "width": "3", "length": "4", "height": "3",
+            "variants": str(VARIANTS)}
+    t0 = time.perf_counter()
+    r = session.post(f"{base_url}/api/generate", data=form, files={"image": ("room.jpg", image, "image/jpeg")})
+    recorder.add("generate_submit", time.perf_counter() - t0, r.status_code in (200, 202))
+    if r.status_code != 202:
+        return
+
+    wait_job(session, base_url, recorder, "generate_e2e", r.json()["job_id"], t0, poll_timeout)
+
+
+def wait_job(session, base_url, recorder, name, job_id, t0, poll_timeout):
+    # Ukur end-to-end sampai job selesai
+    status_url = f"{base_url}/api/generate/{job_id}"
+    while time.perf_counter() - t0 < poll_timeout:
+        time.sleep(0.2)
+        status = session.get(status_url).json().get("data", {}).get("status")
+        if status in ("done", "failed"):
+            recorder.add(name, time.perf_counter() - t0, status == "done")
+            return
+    recorder.add(name, time.perf_counter() - t0, False)
+
+
+def do_regenerate(session, base_url, recorder, image, poll_timeout):
+    # Gaya baru untuk foto terakhir user, tanpa upload ulang (jika belum punya histori: generate biasa)
+    history = session.get(f"{base_url}/api/history", params={"limit": 1, "fields": "id,edge_map_id"}).json()
+    items = [h for h in history.get("data", []) if h.get("edge_map_id")]
+    if not items:
+        return do_generate(session, base_url, recorder, image, poll_timeout)
+
+    form = {"edge_map_id": items[0]["edge_map_id"], "room_type": random.choice(["Kamar Tidur", "Ruang Tamu"]),
+            "style": random.choice(["Minimalis", "Modern", "Industrial"]), "width": "3", "length": "4", "height": "3"}
+    t0 = time.perf_counter()
+    r = session.post(f"{base_url}/api/generate/regenerate", json=form)
+    recorder.add("regenerate_submit", time.perf_counter() - t0, r.status_code == 202)
+    if r.status_code == 202:
+        wait_job(session, base_url, recorder, "regenerate_e2e", r.json()["job_id"], t0, poll_timeout)
+
+
+def do_chat(session, base_url, recorder):
+    message = random.choice([
+        "Warna cat apa yang cocok untuk kamar tidur?",
+        "Bagaimana cara merawat sofa kulit?",
+        "Berapa harga sofa minimalis di Jakarta?",
+    ])
+    t0 = time.perf_counter()
+    r = session.post(f"{base_url}/api/chat", json={"message": message})
+    recorder.add("chat", time.perf_counter() - t0, r.status_code == 200)
+
+
+def do_feedback(session, base_url, recorder):
+    t0 = time.perf_counter()
+    r = session.post(f"{base_url}/api/feedback", json={"content": "Hasilnya bagus sekali, suka!", "star_rating": 5})
+    recorder.add("feedback", time.perf_counter() - t0, r.status_code == 200)
+
+
+def do_history(session, base_url, recorder):
+    t0 = time.perf_counter()
+    r = session.get(f"{base_url}/api/history")
+    recorder.add("history", time.perf_counter() - t0, r.status_code == 200)
+
+
+def worker(base_url, token, mix, deadline, recorder, image, poll_timeout):
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    names, weights = zip(*mix.items())
+    while time.time() < deadline:
+        name = random.choices(names, weights)[0]
+        try:
+            if name == "generate":
+                do_generate(session, base_url, recorder, image, poll_timeout)
+            elif name == "regenerate":
+                do_regenerate(session, base_url, recorder, image, poll_timeout)
+            elif name == "chat":
+                do_chat(session, base_url, recorder)
+            elif name == "feedback":
+                do_feedback(session, base_url, recorder)
+            elif name == "history":
+                do_history(session, base_url, recorder)
+        except requests.RequestException:
+            recorder.add(name, 0.0, False)
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nPerbandingan dengan {baseline_path} ({baseline.get('revision')}):")
+    for endpoint, cur in current["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(endpoint)
+        if not old:
+            continue
+        parts = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "error_rate"):
+            if old.get(key) and cur.get(key) is not None:
+                parts.append(f"{key} {old[key]} -> {cur[key]} ({(cur[key] - old[key]) / old[key] * 100:+.1f}%)")
+        print(f"  {endpoint:16s} " + ", ".join(parts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Server yang sudah berjalan (tanpa ini: --self-host)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--models", help="Folder model untuk load_models (opsional)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20, help="Durasi (detik)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Bobot endpoint, misal generate=1,chat=4")
+    parser.add_argument("--variants", type=int, default=1, help="variants=N untuk /api/generate")
+    parser.add_argument("--poll-timeout", type=float, default=120)
+    parser.add_argument("--backend-port", type=int, default=7401)
+    parser.add_argument("--backend-latency", type=float, default=0.5)
+    parser.add_argument("--backend-output-px", type=int, default=512)
+    parser.add_argument("--backend-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="File JSON hasil (default benchmarks/results/<waktu>_<rev>.json)")
+    parser.add_argument("--compare", help="File JSON hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    VARIANTS = args.variants
+    base_url = args.base_url or start_self_hosted(args)
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+    tokens = [get_token(base_url, i) for i in range(args.concurrency)]
+    image = load_sample_image()
+
+    recorder = Recorder()
+    deadline = time.time() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(base_url, tokens[i], mix, deadline, recorder, image, args.poll_timeout))
+        for i in range(args.concurrency)
+    ]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+
+    result = {
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "duration_s": round(elapsed, 2),
+        "endpoints": recorder.summary(elapsed),
+    }
+
+    print(f"{'endpoint':16s} {'req':>6s} {'rps':>8s} {'err':>7s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    for endpoint, s in result["endpoints"].items():
+        print(f"{endpoint:16s} {s['requests']:6d} {s['throughput_rps']:8.2f} {s['error_rate']:7.2%} "
+              f"{s['p50_ms']:9.1f} {s['p95_ms']:9.1f} {s['p99_ms']:9.1f}")
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{result['revision']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nHasil disimpan di {output}")
+
+    if args.compare:
+        compare(result, args.compare)
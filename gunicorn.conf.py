@@ -0,0 +1,43 @@
+"""
+Konfigurasi launcher produksi (pengganti app.run(debug=True)).
+
+    gunicorn -c gunicorn.conf.py asgi:app    # mode async: route AI menunggu Cloud tanpa memegang thread
+    WORKER_CLASS=gthread gunicorn -c gunicorn.conf.py app:app   # mode sinkron (WSGI) seperti sebelumnya
+
+Default satu worker: antrean + status job generate dan batas request per user disimpan di
+memori proses. Dengan beberapa worker, GET /api/generate/<job_id> bisa jatuh ke worker
+lain (404) dan batas per user ikut berlipat sejumlah worker. Konkurensi datang dari event loop:
+di mode async satu worker sudah bisa menahan ribuan request yang sedang menunggu backend.
+Naikkan WEB_CONCURRENCY hanya setelah state tersebut dipindah ke store bersama.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = os.getenv("WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+threads = int(os.getenv("THREADS", 16))  # hanya dipakai worker gthread
+
+# Koneksi yang boleh ditahan per worker (gthread); UvicornWorker memakai limit_concurrency sendiri
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 10000))
+backlog = 2048
+
+# Generate Cloud bisa sampai 180 detik; worker async tidak diblok, tetapi worker gthread ya
+timeout = int(os.getenv("WORKER_TIMEOUT", 200))
+graceful_timeout = 30
+keepalive = 5
+
+# Di belakang Ngrok / reverse proxy: percayai X-Forwarded-* (setara ProxyFix di app.py)
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    # Model dimuat di background per worker; /readyz 503 sampai warm-up selesai
+    from services.sd_service import ai_service
+    from services.preprocess_pool import preprocess_pool
+    from app import app
+
+    ai_service.start_background_load(app.config['MODELS_DIR'])
+    preprocess_pool.start()
@@ -17,8 +17,28 @@ class ImageHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True) # Sesuai gambar db: AUTO_INCREMENT
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Sesuai gambar db
     prompt = db.Column(db.Text, nullable=True) # Sesuai gambar db: text
-    image_filename = db.Column(db.String(255), nullable=True) # Sesuai gambar db: varchar(255)
+    image_filename = db.Column(db.String(255), nullable=True, index=True) # Sesuai gambar db: varchar(255)
     created_at = db.Column(db.Integer, nullable=True) # Sesuai gambar db: int
+    # Edge map foto asal, dipakai ulang oleh /api/generate/regenerate (NULL jika sudah dibersihkan)
+    edge_map_id = db.Column(db.Integer, db.ForeignKey('edge_map.id'), nullable=True, index=True)
+    # Id job untuk hasil variants=N (satu request -> beberapa baris), NULL untuk generate tunggal
+    batch_id = db.Column(db.String(32), nullable=True, index=True)
+
+    # Index komposit untuk pagination keyset /api/history (WHERE user_id = ? AND id < ? ORDER BY id DESC)
+    __table_args__ = (db.Index('ix_image_history_user_id_id', 'user_id', 'id'),)
+
+# --- FOTO UPLOAD + EDGE MAP (disimpan per hash isi foto, dipakai ulang saat regenerate) ---
+class EdgeMap(db.Model):
+    __tablename__ = 'edge_map'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)          # Hash foto asli = nama file di EDGE_MAP_FOLDER
+    photo_size = db.Column(db.Integer, nullable=False)         # Ukuran foto asli (byte)
+    created_at = db.Column(db.Integer, nullable=False)
+    last_used_at = db.Column(db.Integer, nullable=False, index=True)  # Dasar retensi
+
+    # Satu baris per (user, foto); file di disk dibagi bila user lain meng-upload foto yang sama
+    __table_args__ = (db.UniqueConstraint('user_id', 'sha256', name='uq_edge_map_user_sha256'),)
 
 # --- TABEL BARU UNTUK SENTIMEN ANALISIS ---
 class Feedback(db.Model):
@@ -34,4 +54,18 @@ class Feedback(db.Model):
     ai_score = db.Column(db.Integer, nullable=True)     # Prediksi rating 1-5 oleh AI
     sentiment = db.Column(db.String(20), nullable=True)  # POSITIF, NEGATIF, atau NETRAL
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    # Filter halaman review admin (WHERE sentiment = ? ORDER BY id DESC)
+    __table_args__ = (db.Index('ix_feedback_sentiment_id', 'sentiment', 'id'),)
+
+# --- AGREGAT SENTIMEN (diperbarui saat insert / re-score, dibaca dashboard admin) ---
+class FeedbackDailyStat(db.Model):
+    __tablename__ = 'feedback_daily_stat'
+    day = db.Column(db.Date, primary_key=True)
+    sentiment = db.Column(db.String(20), primary_key=True)  # '' jika model belum memberi label
+
+    count = db.Column(db.Integer, nullable=False, default=0)
+    star_sum = db.Column(db.Integer, nullable=False, default=0)      # Jumlah star_rating user
+    ai_score_sum = db.Column(db.Integer, nullable=False, default=0)  # Jumlah ai_score (baris yang punya skor)
+    ai_scored = db.Column(db.Integer, nullable=False, default=0)     # Banyak baris yang punya ai_score
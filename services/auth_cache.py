@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+# Data user yang dibutuhkan route API; immutable agar aman dibagi antar thread / request
+UserSnapshot = namedtuple("UserSnapshot", ["id", "name", "email", "google_id", "role"])
+
+
+def snapshot_user(user):
+    return UserSnapshot(user.id, user.name, user.email, user.google_id, user.role)
+
+
+class TTLCache:
+    """LRU dengan batas jumlah entri dan umur per entri"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class AuthCache:
+    """
+    Cache in-process untuk token_required:
+    - claims JWT per token (dekode + verifikasi tanda tangan tidak diulang tiap request)
+    - snapshot User per id (tanpa query DB per request)
+    Snapshot di-invalidate saat baris User di-update / dihapus lewat ORM.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.users = TTLCache(10000, 60)
+        self.tokens = TTLCache(10000, 300)
+
+    def init_app(self, app, user_model):
+        self.enabled = app.config.get("AUTH_CACHE_ENABLED", True)
+        self.users = TTLCache(app.config.get("AUTH_USER_CACHE_SIZE", 10000),
+                              app.config.get("AUTH_USER_CACHE_TTL", 60))
+        self.tokens = TTLCache(app.config.get("AUTH_TOKEN_CACHE_SIZE", 10000),
+                               app.config.get("AUTH_TOKEN_CACHE_TTL", 300))
+
+        # Invalidate saat flush (langsung) dan sekali lagi setelah commit,
+        # agar request paralel yang sempat mengisi ulang cache dengan data lama ikut terhapus
+        event.listen(user_model, "after_update", self._on_user_change)
+        event.listen(user_model, "after_delete", self._on_user_change)
+        event.listen(Session, "after_commit", self._on_commit)
+        event.listen(Session, "after_rollback", self._on_rollback)
+
+    def _on_user_change(self, mapper, connection, target):
+        self.invalidate_user(target.id)
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault("auth_cache_invalidate", set()).add(target.id)
+
+    def _on_commit(self, session):
+        for user_id in session.info.pop("auth_cache_invalidate", ()):
+            self.invalidate_user(user_id)
+
+    def _on_rollback(self, session):
+        session.info.pop("auth_cache_invalidate", None)
+
+    # --- API UNTUK token_required ---
+    def decode_token(self, token, decode_fn):
+        """decode_fn(token) -> claims; exception dari decode_fn diteruskan (token tidak valid)"""
+        if not self.enabled:
+            return decode_fn(token)
+        claims = self.tokens.get(token)
+        if claims is not None:
+            # Token kedaluwarsa tetap ditolak walau masih ada di cache
+            if claims.get("exp") is None or claims["exp"] > time.time():
+                return claims
+            self.tokens.discard(token)
+        claims = decode_fn(token)
+        ttl = claims["exp"] - time.time() if claims.get("exp") else None
+        self.tokens.put(token, claims, ttl)
+        return claims
+
+    def get_user(self, user_id, load_fn):
+        """load_fn(user_id) -> objek User atau None; hasil None tidak di-cache"""
+        if not self.enabled:
+            user = load_fn(user_id)
+            return snapshot_user(user) if user else None
+        snapshot = self.users.get(user_id)
+        if snapshot is None:
+            user = load_fn(user_id)
+            if user is None:
+                return None
+            snapshot = snapshot_user(user)
+            self.users.put(user_id, snapshot)
+        return snapshot
+
+    def invalidate_user(self, user_id):
+        self.users.discard(user_id)
+
+    def stats(self):
+        return {"user": self.users.stats(), "token": self.tokens.stats()}
+
+
+# Inisialisasi Singleton
+auth_cache = AuthCache()
@@ -9,10 +9,10 @@ os.environ['PREFERRED_URL_SCHEME'] = 'https'
 
 def create_google_blueprint():
     # Nama blueprint adalah 'google'
+    load_dotenv()
     google_bp = make_google_blueprint(
-        load_dotenv()
-        CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
-        CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+        client_id=os.getenv("GOOGLE_CLIENT_ID"),
+        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
         scope=[
             "https://www.googleapis.com/auth/userinfo.profile",
             "https://www.googleapis.com/auth/userinfo.email",
@@ -0,0 +1,313 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from services.metrics import BACKEND_ERRORS
+
+
+class NoBackendAvailable(Exception):
+    """Dilempar saat semua backend cloud sedang mati / circuit terbuka"""
+
+
+class Backend:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0          # Jumlah request yang sedang berjalan
+        self.consecutive_failures = 0
+        self.open_until = 0.0         # Circuit breaker terbuka sampai waktu ini
+        self.half_open_inflight = False
+        self.last_latency = None
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "failures": self.consecutive_failures,
+            "circuit_open": self.open_until > time.time(),
+            "last_latency": self.last_latency,
+        }
+
+
+class BackendPool:
+    """
+    Pool HTTP keep-alive ke satu atau lebih backend cloud (Colab / Ngrok).
+    - Load balancing: pilih backend dengan request berjalan paling sedikit
+    - Circuit breaker: backend yang gagal / lambat berturut-turut dikeluarkan sementara
+    - Health probe: thread latar belakang mengecek backend secara berkala
+    """
+
+    def __init__(self, urls, pool_size=10, failure_threshold=3, cooldown=30,
+                 slow_threshold=None, health_interval=15, health_path="/health", async_pool_size=1000):
+        self.backends = [Backend(u) for u in urls]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.slow_threshold = slow_threshold
+        self.health_interval = health_interval
+        self.health_path = health_path
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+        # Satu Session dipakai bersama agar koneksi TCP/TLS digunakan ulang
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(self.backends), 1), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Session aiohttp untuk mode ASGI (asgi.py), dibuat saat pertama dipakai di event loop
+        self.async_pool_size = async_pool_size
+        self._async_session = None
+        self._async_loop = None
+
+    # --- PEMILIHAN BACKEND ---
+    def acquire(self, exclude=()):
+        """Ambil backend sehat dengan outstanding paling sedikit, lalu tandai sedang dipakai"""
+        self._ensure_health_thread()
+        now = time.time()
+        with self._lock:
+            candidates = []
+            for b in self.backends:
+                if b in exclude:
+                    continue
+                if b.open_until > now:
+                    continue
+                # Setelah cooldown (half-open) hanya satu request uji yang boleh lewat
+                if b.consecutive_failures >= self.failure_threshold and b.half_open_inflight:
+                    continue
+                candidates.append(b)
+
+            if not candidates:
+                raise NoBackendAvailable("Semua backend cloud sedang tidak tersedia.")
+
+            backend = min(candidates, key=lambda b: b.outstanding)
+            backend.outstanding += 1
+            if backend.consecutive_failures >= self.failure_threshold:
+                backend.half_open_inflight = True
+            return backend
+
+    def release(self, backend, ok, elapsed=None):
+        with self._lock:
+            backend.outstanding -= 1
+            backend.half_open_inflight = False
+            if elapsed is not None:
+                backend.last_latency = round(elapsed, 3)
+                if ok and self.slow_threshold and elapsed > self.slow_threshold:
+                    # Backend yang terlalu lambat diperlakukan seperti gagal
+                    ok = False
+            self._record(backend, ok)
+
+    def _record(self, backend, ok):
+        # Dipanggil dengan self._lock sudah dipegang
+        if ok:
+            backend.consecutive_failures = 0
+            backend.open_until = 0.0
+            return
+        backend.consecutive_failures += 1
+        BACKEND_ERRORS.inc(backend.url)
+        if backend.consecutive_failures >= self.failure_threshold:
+            backend.open_until = time.time() + self.cooldown
+            print(f"⚠️ WARN: Backend {backend.url} dikeluarkan selama {self.cooldown}s (circuit terbuka).")
+
+    # --- REQUEST ---
+    def request(self, method, path, **kwargs):
+        """
+        Kirim request ke backend terbaik. Jika gagal koneksi / 5xx,
+        otomatis dicoba ke backend lain (masing-masing maksimal sekali).
+        """
+        tried = []
+        last_error = None
+        while len(tried) < len(self.backends):
+            try:
+                backend = self.acquire(exclude=tried)
+            except NoBackendAvailable:
+                break
+            tried.append(backend)
+
+            start = time.time()
+            try:
+                response = self.session.request(method, backend.url + path, **kwargs)
+            except requests.RequestException as e:
+                self.release(backend, ok=False, elapsed=time.time() - start)
+                last_error = e
+                continue
+
+            ok = response.status_code < 500
+            self.release(backend, ok=ok, elapsed=time.time() - start)
+            if ok:
+                return response
+            last_error = Exception(f"Error Server Cloud ({response.status_code}) dari {backend.url}")
+
+        if last_error:
+            raise last_error
+        raise NoBackendAvailable("Semua backend cloud sedang tidak tersedia.")
+
+    @contextmanager
+    def stream(self, method, path, **kwargs):
+        """
+        Seperti request(), tetapi body respon dibaca bertahap (stream=True).
+        Backend dianggap sibuk sampai blok `with` selesai; menutup blok lebih awal
+        (misal client putus) ikut menutup koneksi ke backend.
+        """
+        tried = []
+        last_error = None
+        while len(tried) < len(self.backends):
+            try:
+                backend = self.acquire(exclude=tried)
+            except NoBackendAvailable:
+                break
+            tried.append(backend)
+
+            start = time.time()
+            try:
+                response = self.session.request(method, backend.url + path, stream=True, **kwargs)
+            except requests.RequestException as e:
+                self.release(backend, ok=False, elapsed=time.time() - start)
+                last_error = e
+                continue
+
+            if response.status_code >= 500:
+                response.close()
+                self.release(backend, ok=False, elapsed=time.time() - start)
+                last_error = Exception(f"Error Server Cloud ({response.status_code}) dari {backend.url}")
+                continue
+
+            ok = False
+            try:
+                yield response
+                ok = True
+            except GeneratorExit:
+                # Dibatalkan oleh pemanggil (bukan kesalahan backend)
+                ok = True
+                raise
+            finally:
+                response.close()
+                self.release(backend, ok=ok)
+            return
+
+        if last_error:
+            raise last_error
+        raise NoBackendAvailable("Semua backend cloud sedang tidak tersedia.")
+
+    # --- REQUEST ASYNC (mode ASGI) ---
+    def async_session(self):
+        """
+        aiohttp.ClientSession bersama untuk event loop yang sedang berjalan. Request yang menunggu
+        backend hanya memegang koneksi + coroutine, bukan thread, sehingga ribuan bisa menunggu sekaligus.
+        """
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.async_pool_size, keepalive_timeout=30)
+            self._async_session = aiohttp.ClientSession(connector=connector)
+            self._async_loop = loop
+        return self._async_session
+
+    async def aclose(self):
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    @staticmethod
+    def _async_timeout(timeout):
+        # Format requests (connect, read) -> aiohttp; antre di pool koneksi dibatasi seperti read
+        import aiohttp
+
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return aiohttp.ClientTimeout(total=None, connect=read, sock_connect=connect, sock_read=read)
+
+    async def arequest(self, method, path, **kwargs):
+        """Versi async dari request(): body dibaca penuh, return (status, bytes)"""
+        async with self._aopen(method, path, stream=False, **kwargs) as response:
+            return response.status, await response.read()
+
+    def astream(self, method, path, **kwargs):
+        """Versi async dari stream(): `async with` lalu baca bertahap lewat `async for line in response.content`"""
+        return self._aopen(method, path, stream=True, **kwargs)
+
+    @asynccontextmanager
+    async def _aopen(self, method, path, stream, timeout=None, **kwargs):
+        # Failover dan circuit breaker sama dengan request() / stream(), transport aiohttp
+        import aiohttp
+
+        session = self.async_session()
+        tried = []
+        last_error = None
+        while len(tried) < len(self.backends):
+            try:
+                backend = self.acquire(exclude=tried)
+            except NoBackendAvailable:
+                break
+            tried.append(backend)
+
+            start = time.time()
+            try:
+                response = await session.request(method, backend.url + path,
+                                                 timeout=self._async_timeout(timeout), **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.release(backend, ok=False, elapsed=time.time() - start)
+                last_error = e
+                continue
+            except asyncio.CancelledError:
+                # Client putus sebelum backend menjawab (bukan kesalahan backend)
+                self.release(backend, ok=True)
+                raise
+
+            if response.status >= 500:
+                response.release()
+                self.release(backend, ok=False, elapsed=time.time() - start)
+                last_error = Exception(f"Error Server Cloud ({response.status}) dari {backend.url}")
+                continue
+
+            ok = False
+            try:
+                yield response
+                ok = True
+            except (GeneratorExit, asyncio.CancelledError):
+                ok = True
+                raise
+            finally:
+                response.release()
+                # Durasi stream bergantung panjang jawaban, tidak dipakai untuk deteksi backend lambat
+                self.release(backend, ok=ok, elapsed=None if stream else time.time() - start)
+            return
+
+        if last_error:
+            raise last_error
+        raise NoBackendAvailable("Semua backend cloud sedang tidak tersedia.")
+
+    def status(self):
+        with self._lock:
+            return [b.to_dict() for b in self.backends]
+
+    # --- HEALTH PROBE ---
+    def _ensure_health_thread(self):
+        if self._health_thread or not self.health_interval:
+            return
+        with self._lock:
+            if self._health_thread:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="backend-health", daemon=True)
+            self._health_thread.start()
+
+    def probe(self, backend):
+        """Cek apakah backend bisa dihubungi. Respon < 500 (termasuk 404) dianggap hidup."""
+        try:
+            response = self.session.get(backend.url + self.health_path, timeout=5)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        with self._lock:
+            # Circuit terbuka: probe sukses tidak memasukkan backend sebelum cooldown habis,
+            # setelahnya (half-open) probe sukses boleh menutup circuit
+            if ok and backend.open_until > time.time():
+                return ok
+            self._record(backend, ok)
+        return ok
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            for backend in list(self.backends):
+                self.probe(backend)
@@ -0,0 +1,154 @@
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_TOP_K = 8
+
+# Kata tanya / kata sambung yang terlalu umum untuk membedakan pertanyaan
+STOPWORDS = {
+    "apa", "apakah", "yang", "untuk", "dan", "di", "ke", "dari", "pada", "dengan",
+    "agar", "bagaimana", "cara", "mengapa", "kenapa", "adalah", "ini", "itu", "saya",
+    "atau", "jika", "akan", "bisa", "dapat", "tidak", "lebih", "seperti", "sebaiknya",
+}
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+class ChatRetrievalIndex:
+    """
+    Index TF-IDF (ternormalisasi L2) atas field `instruction` di Dataset_json.
+    Matriks disimpan per-term (postings) sebagai file .npy dan dibuka dengan mmap,
+    sehingga startup berikutnya tidak perlu membangun ulang.
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.idf = None
+        self.indptr = None
+        self.doc_ids = None
+        self.weights = None
+        self.responses = []
+        self.instructions = []
+
+    @property
+    def ready(self):
+        return self.idf is not None
+
+    # --- BUILD / LOAD ---
+    @staticmethod
+    def _fingerprint(files):
+        h = hashlib.sha256()
+        for path in files:
+            with open(path, "rb") as f:
+                h.update(os.path.basename(path).encode("utf-8") + b"\0" + f.read())
+        return h.hexdigest()
+
+    def load_or_build(self, dataset_dir, index_dir):
+        files = sorted(glob.glob(os.path.join(dataset_dir, "*.json")))
+        fingerprint = self._fingerprint(files)
+        meta_path = os.path.join(index_dir, "meta.json")
+
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") == fingerprint:
+                self._load(index_dir, meta)
+                return "loaded"
+        except (OSError, ValueError):
+            pass
+
+        self._build(files)
+        self._save(index_dir, fingerprint)
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self._load(index_dir, meta)
+        return "built"
+
+    def _build(self, files):
+        self.instructions, self.responses = [], []
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                for item in json.load(f):
+                    self.instructions.append(item["instruction"])
+                    self.responses.append(item["response"])
+
+        docs = [Counter(tokenize(text)) for text in self.instructions]
+        df = Counter(term for doc in docs for term in doc)
+        self.vocab = {term: i for i, term in enumerate(sorted(df))}
+        n_docs = len(docs)
+        self.idf = np.array(
+            [math.log((1 + n_docs) / (1 + df[term])) + 1 for term in sorted(df)], dtype=np.float32
+        )
+
+        # Postings per term: (doc_id, bobot tf-idf ternormalisasi)
+        postings = [[] for _ in self.vocab]
+        for doc_id, doc in enumerate(docs):
+            vec = {self.vocab[t]: (1 + math.log(c)) * self.idf[self.vocab[t]] for t, c in doc.items()}
+            norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+            for term_id, v in vec.items():
+                postings[term_id].append((doc_id, v / norm))
+
+        self.indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum([len(p) for p in postings])
+        self.doc_ids = np.array([d for p in postings for d, _ in p], dtype=np.int32)
+        self.weights = np.array([w for p in postings for _, w in p], dtype=np.float32)
+
+    def _save(self, index_dir, fingerprint):
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "idf.npy"), self.idf)
+        np.save(os.path.join(index_dir, "indptr.npy"), self.indptr)
+        np.save(os.path.join(index_dir, "doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(index_dir, "weights.npy"), self.weights)
+        with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "vocab": self.vocab,
+                "instructions": self.instructions,
+                "responses": self.responses,
+            }, f, ensure_ascii=False)
+
+    def _load(self, index_dir, meta):
+        self.vocab = meta["vocab"]
+        self.instructions = meta["instructions"]
+        self.responses = meta["responses"]
+        self.idf = np.load(os.path.join(index_dir, "idf.npy"), mmap_mode="r")
+        self.indptr = np.load(os.path.join(index_dir, "indptr.npy"), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(index_dir, "doc_ids.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(index_dir, "weights.npy"), mmap_mode="r")
+
+    # --- QUERY ---
+    def query(self, text):
+        """
+        Kembalikan (skor cosine 0-1, response, instruction, skor runner-up) dokumen paling mirip.
+        Runner-up = skor tertinggi dokumen dengan response berbeda; selisih kecil berarti pertanyaan
+        ambigu di antara beberapa jawaban (lihat CHAT_LOCAL_MARGIN).
+        """
+        if not self.ready:
+            return 0.0, None, None, 0.0
+
+        counts = Counter(t for t in tokenize(text) if t in self.vocab)
+        if not counts:
+            return 0.0, None, None, 0.0
+
+        q = {self.vocab[t]: (1 + math.log(c)) * float(self.idf[self.vocab[t]]) for t, c in counts.items()}
+        q_norm = math.sqrt(sum(v * v for v in q.values()))
+
+        scores = np.zeros(len(self.responses), dtype=np.float32)
+        for term_id, qw in q.items():
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            np.add.at(scores, self.doc_ids[start:end], self.weights[start:end] * (qw / q_norm))
+
+        # Cukup beberapa kandidat teratas untuk mencari runner-up dengan response berbeda
+        top = np.argpartition(scores, -_TOP_K)[-_TOP_K:] if len(scores) > _TOP_K else np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+        best = int(top[0])
+        runner_up = next((float(scores[i]) for i in top[1:] if self.responses[i] != self.responses[best]), 0.0)
+        return float(scores[best]), self.responses[best], self.instructions[best], runner_up
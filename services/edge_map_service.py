@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from sqlalchemy.exc import IntegrityError
+from extension import db
+from models import EdgeMap, ImageHistory
+
+
+class EdgeMapStore:
+    """
+    Menyimpan foto upload dan edge map 512x512-nya berdasarkan SHA-256 isi foto:
+    <EDGE_MAP_FOLDER>/<sha256>.orig (foto asli) dan <sha256>.png (edge map).
+    Baris EdgeMap per user menunjuk file tersebut; regenerate cukup membaca edge map dari disk.
+    Retensi: maksimal EDGE_MAP_MAX_PER_USER per user dan EDGE_MAP_MAX_AGE detik sejak terakhir dipakai.
+    """
+
+    def __init__(self):
+        self.folder = None
+        self.max_per_user = 20
+        self.max_age = 30 * 24 * 3600
+        self.cleanup_interval = 3600
+        self._last_cleanup = 0
+        self._cleanup_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.folder = app.config.get("EDGE_MAP_FOLDER", "edge_maps")
+        self.max_per_user = app.config.get("EDGE_MAP_MAX_PER_USER", 20)
+        self.max_age = app.config.get("EDGE_MAP_MAX_AGE", 30 * 24 * 3600)
+        os.makedirs(self.folder, exist_ok=True)
+
+    # --- PATH & FILE ---
+    def photo_path(self, sha256):
+        return os.path.join(self.folder, f"{sha256}.orig")
+
+    def canny_path(self, sha256):
+        return os.path.join(self.folder, f"{sha256}.png")
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _read_canny(self, sha256):
+        try:
+            with open(self.canny_path(sha256), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # --- API UNTUK GENERATE ---
+    def get_or_create(self, user_id, image_bytes, preprocess):
+        """
+        Foto upload -> (EdgeMap, canny_bytes). preprocess(image_bytes) hanya dipanggil
+        jika edge map untuk foto yang sama belum ada di disk (upload ulang foto yang sama juga dilewati).
+        """
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        canny_bytes = self._read_canny(sha256)
+        if canny_bytes is None:
+            canny_bytes = preprocess(image_bytes)
+            self._write_atomic(self.photo_path(sha256), image_bytes)
+            self._write_atomic(self.canny_path(sha256), canny_bytes)
+
+        now = int(time.time())
+        edge_map = EdgeMap.query.filter_by(user_id=user_id, sha256=sha256).first()
+        if edge_map is None:
+            try:
+                edge_map = EdgeMap(user_id=user_id, sha256=sha256, photo_size=len(image_bytes),
+                                   created_at=now, last_used_at=now)
+                db.session.add(edge_map)
+                db.session.commit()
+            except IntegrityError:
+                # Upload paralel foto yang sama oleh user yang sama
+                db.session.rollback()
+                edge_map = EdgeMap.query.filter_by(user_id=user_id, sha256=sha256).first()
+            self._enforce_user_cap(user_id, keep_id=edge_map.id)
+        else:
+            edge_map.last_used_at = now
+            db.session.commit()
+
+        self.maybe_cleanup()
+        return edge_map, canny_bytes
+
+    def resolve(self, user_id, edge_map_id=None, history_id=None):
+        """EdgeMap milik user dari edge_map_id atau history_id, None jika tidak ada / sudah dibersihkan"""
+        if edge_map_id is None and history_id is not None:
+            history = db.session.get(ImageHistory, history_id)
+            if history is None or history.user_id != user_id:
+                return None
+            edge_map_id = history.edge_map_id
+        if edge_map_id is None:
+            return None
+        edge_map = db.session.get(EdgeMap, edge_map_id)
+        if edge_map is None or edge_map.user_id != user_id:
+            return None
+        if not os.path.exists(self.canny_path(edge_map.sha256)):
+            return None
+        return edge_map
+
+    def load(self, edge_map_id):
+        """Baca edge map untuk job regenerate, sekaligus memperbarui last_used_at"""
+        edge_map = db.session.get(EdgeMap, edge_map_id)
+        canny_bytes = self._read_canny(edge_map.sha256) if edge_map else None
+        if canny_bytes is None:
+            raise Exception("Edge map sudah tidak tersedia, silakan upload ulang foto.")
+        edge_map.last_used_at = int(time.time())
+        db.session.commit()
+        return edge_map, canny_bytes
+
+    # --- RETENSI ---
+    def _enforce_user_cap(self, user_id, keep_id=None):
+        ids = [row.id for row in db.session.query(EdgeMap.id)
+               .filter(EdgeMap.user_id == user_id)
+               .order_by(EdgeMap.last_used_at.desc(), EdgeMap.id.desc())
+               .offset(self.max_per_user).all()]
+        self._delete(id_ for id_ in ids if id_ != keep_id)
+
+    def maybe_cleanup(self):
+        """Hapus edge map yang lama tidak dipakai, paling sering sekali per cleanup_interval"""
+        now = time.time()
+        if now - self._last_cleanup < self.cleanup_interval or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_cleanup = now
+            while True:
+                ids = [row.id for row in db.session.query(EdgeMap.id)
+                       .filter(EdgeMap.last_used_at < now - self.max_age).limit(500).all()]
+                if not ids:
+                    break
+                self._delete(ids)
+        finally:
+            self._cleanup_lock.release()
+
+    def _delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        hashes = {row.sha256 for row in db.session.query(EdgeMap.sha256).filter(EdgeMap.id.in_(ids))}
+        # Histori tetap ada, hanya tidak bisa di-regenerate lagi
+        ImageHistory.query.filter(ImageHistory.edge_map_id.in_(ids)).update(
+            {ImageHistory.edge_map_id: None}, synchronize_session=False)
+        EdgeMap.query.filter(EdgeMap.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+        # File dibagi antar user: hapus hanya jika tidak ada baris lain dengan hash yang sama
+        still_used = {row.sha256 for row in db.session.query(EdgeMap.sha256).filter(EdgeMap.sha256.in_(hashes))}
+        for sha256 in hashes - still_used:
+            for path in (self.photo_path(sha256), self.canny_path(sha256)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# Inisialisasi Singleton
+edge_map_store = EdgeMapStore()
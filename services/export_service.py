@@ -0,0 +1,181 @@
+import csv
+import datetime
+import io
+import json
+import os
+import time
+import zipfile
+from sqlalchemy import select
+from extension import db
+from models import Feedback, ImageHistory, User
+from services.storage_service import output_storage
+
+FEEDBACK_EXPORT_FIELDS = ("id", "user_id", "user_name", "user_email", "star_rating",
+                          "ai_score", "sentiment", "created_at", "content")
+HISTORY_MANIFEST_FIELDS = ("id", "created_at", "prompt", "batch_id", "file")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Tujuan tulis zipfile yang tidak bisa di-seek: byte ditampung lalu diambil generator per potongan"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _csv_safe(value):
+    # Sel yang diawali = + - @ dieksekusi sebagai formula oleh Excel / Sheets
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value
+    return value
+
+
+class ExportService:
+    """
+    Export massal yang di-stream ke client (generator untuk Response Flask):
+    - ZIP seluruh gambar hasil generate milik satu user + manifest.csv
+    - ulasan Feedback (CSV / NDJSON) untuk admin
+    Baris dibaca per chunk dan tiap potongan langsung dikirim, sehingga memori tidak bergantung
+    pada jumlah baris dan byte pertama keluar sebelum query selesai.
+    """
+
+    def __init__(self):
+        self.chunk_size = 500
+        self.fetch_size = 1000
+        self.block_size = 64 * 1024
+
+    def init_app(self, app):
+        self.chunk_size = app.config.get("EXPORT_CHUNK_SIZE", 500)
+        self.fetch_size = app.config.get("EXPORT_FETCH_SIZE", 1000)
+
+    # --- HISTORY ZIP (USER) ---
+    def _history_chunks(self, user_id):
+        """Histori user per chunk, keyset pada id (index ix_image_history_user_id_id)"""
+        last_id = 0
+        while True:
+            rows = db.session.query(ImageHistory.id, ImageHistory.image_filename, ImageHistory.prompt,
+                                    ImageHistory.created_at, ImageHistory.batch_id) \
+                .filter(ImageHistory.user_id == user_id, ImageHistory.id > last_id) \
+                .order_by(ImageHistory.id).limit(self.chunk_size).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1].id
+
+    @staticmethod
+    def _archive_name(filename):
+        return "images/" + os.path.basename(filename)
+
+    def history_zip(self, user_id):
+        """
+        Generator byte ZIP: manifest.csv (satu baris per histori) lalu images/<nama file>.
+        ZIP ditulis ke stream non-seekable (data descriptor), gambar disimpan tanpa kompresi ulang
+        dan dibaca per blok; yang tersisa di memori hanya central directory (satu entri per file).
+        """
+        return (chunk for chunk in self._history_zip(user_id) if chunk)
+
+    def _history_zip(self, user_id):
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+            # 1. Manifest di depan agar bisa dibaca sebelum seluruh gambar selesai diunduh
+            info = zipfile.ZipInfo("manifest.csv", time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, "w", force_zip64=True) as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+                writer = csv.writer(text)
+                writer.writerow(HISTORY_MANIFEST_FIELDS)
+                text.flush()
+                yield sink.take()
+                for rows in self._history_chunks(user_id):
+                    for r in rows:
+                        exists = r.image_filename and os.path.exists(output_storage.path(r.image_filename))
+                        writer.writerow([r.id, r.created_at, _csv_safe(r.prompt), r.batch_id,
+                                         self._archive_name(r.image_filename) if exists else ""])
+                    text.flush()
+                    yield sink.take()
+                text.detach()
+
+            # 2. Gambar; file yang dipakai beberapa histori (hasil cache) cukup ditulis sekali
+            written = set()
+            for rows in self._history_chunks(user_id):
+                for r in rows:
+                    if not r.image_filename or r.image_filename in written:
+                        continue
+                    try:
+                        src = open(output_storage.path(r.image_filename), "rb")
+                    except OSError:
+                        continue
+                    written.add(r.image_filename)
+                    with src:
+                        created = time.localtime(max(r.created_at or 0, 315532800))[:6]  # ZIP minimal 1980
+                        info = zipfile.ZipInfo(self._archive_name(r.image_filename), created)
+                        info.compress_type = zipfile.ZIP_STORED  # PNG / WebP sudah terkompresi
+                        with zf.open(info, "w", force_zip64=True) as dst:
+                            while True:
+                                block = src.read(self.block_size)
+                                if not block:
+                                    break
+                                dst.write(block)
+                                yield sink.take()
+                    yield sink.take()
+        yield sink.take()
+
+    # --- FEEDBACK CSV / NDJSON (ADMIN) ---
+    def feedback_export(self, fmt="csv", sentiment=None):
+        """
+        Generator potongan teks CSV / NDJSON seluruh Feedback (urut id).
+        Query dijalankan dengan server-side cursor (yield_per / stream_results): driver hanya
+        mengambil fetch_size baris sekaligus, bukan seluruh hasil query.
+        """
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(FEEDBACK_EXPORT_FIELDS)
+            # Header langsung dikirim sebelum query mulai berjalan
+            yield buf.getvalue()
+
+        stmt = select(Feedback.id, Feedback.user_id, User.name, User.email, Feedback.star_rating,
+                      Feedback.ai_score, Feedback.sentiment, Feedback.created_at, Feedback.content) \
+            .outerjoin(User, User.id == Feedback.user_id).order_by(Feedback.id)
+        if sentiment:
+            stmt = stmt.where(Feedback.sentiment == sentiment)
+
+        result = db.session.execute(stmt.execution_options(yield_per=self.fetch_size))
+        try:
+            for rows in result.partitions():
+                if fmt == "csv":
+                    buf.seek(0)
+                    buf.truncate()
+                    writer.writerows(
+                        [r[0], r[1], _csv_safe(r[2]), _csv_safe(r[3]), r[4], r[5], r[6],
+                         r[7].isoformat() if r[7] else "", _csv_safe(r[8])]
+                        for r in rows)
+                    yield buf.getvalue()
+                else:
+                    yield "".join(
+                        json.dumps(dict(zip(FEEDBACK_EXPORT_FIELDS, r)), ensure_ascii=False, default=_json_default) + "\n"
+                        for r in rows)
+        finally:
+            # Client putus di tengah export -> cursor server ikut ditutup
+            result.close()
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipe {type(value).__name__} tidak bisa di-serialize")
+
+
+# Inisialisasi Singleton
+export_service = ExportService()
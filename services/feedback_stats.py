@@ -0,0 +1,148 @@
+import datetime
+from collections import defaultdict
+from sqlalchemy import select, func, insert
+from extension import db
+from models import Feedback, FeedbackDailyStat
+
+STAT_FIELDS = ("count", "star_sum", "ai_score_sum", "ai_scored")
+
+
+def _day(created_at):
+    return (created_at or datetime.datetime.utcnow()).date()
+
+
+class FeedbackStats:
+    """
+    Agregat sentimen per (hari, sentimen) di tabel feedback_daily_stat.
+    Diperbarui sebagai delta di transaksi yang sama dengan insert / re-score Feedback,
+    sehingga dashboard admin tidak perlu GROUP BY atas seluruh tabel feedback.
+    """
+
+    def __init__(self):
+        self._built = False
+
+    # --- DELTA ---
+    @staticmethod
+    def _add(deltas, day, sentiment, star_rating, ai_score, sign=1):
+        d = deltas[(day, sentiment or "")]
+        d["count"] += sign
+        d["star_sum"] += sign * (star_rating or 0)
+        if ai_score is not None:
+            d["ai_score_sum"] += sign * ai_score
+            d["ai_scored"] += sign
+
+    def record_inserts(self, feedbacks):
+        """
+        Panggil untuk Feedback baru SEBELUM db.session.add, lalu commit bersama;
+        ensure_built() tidak boleh ikut menghitung baris yang belum tercatat.
+        """
+        self.ensure_built()
+        deltas = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+        for fb in feedbacks:
+            self._add(deltas, _day(fb.created_at), fb.sentiment, fb.star_rating, fb.ai_score)
+        self._apply(deltas)
+
+    def record_rescore(self, changes):
+        """changes: list (created_at, star_rating, old_score, old_label, new_score, new_label)"""
+        self.ensure_built()
+        deltas = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+        for created_at, star_rating, old_score, old_label, new_score, new_label in changes:
+            day = _day(created_at)
+            self._add(deltas, day, old_label, star_rating, old_score, sign=-1)
+            self._add(deltas, day, new_label, star_rating, new_score)
+        self._apply(deltas)
+
+    def _apply(self, deltas):
+        # Upsert atomik (kolom = kolom + delta) agar request paralel tidak saling menimpa
+        rows = [{"day": day, "sentiment": sentiment, **d}
+                for (day, sentiment), d in deltas.items() if any(d.values())]
+        if not rows:
+            return
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        table = FeedbackDailyStat.__table__
+        for row in rows:
+            stmt = dialect_insert(table).values(**row)
+            increments = {f: table.c[f] + row[f] for f in STAT_FIELDS}
+            if dialect == "mysql":
+                stmt = stmt.on_duplicate_key_update(**increments)
+            else:
+                stmt = stmt.on_conflict_do_update(index_elements=["day", "sentiment"], set_=increments)
+            db.session.execute(stmt)
+
+    # --- BACA ---
+    def rebuild(self):
+        """Hitung ulang seluruh agregat dari tabel feedback (sekali, untuk data lama)"""
+        day = func.date(Feedback.created_at)
+        rows = db.session.execute(
+            select(day, Feedback.sentiment, func.count(Feedback.id), func.sum(Feedback.star_rating),
+                   func.sum(Feedback.ai_score), func.count(Feedback.ai_score))
+            .group_by(day, Feedback.sentiment)
+        ).all()
+        db.session.query(FeedbackDailyStat).delete()
+        values = [
+            {"day": d if isinstance(d, datetime.date) else datetime.date.fromisoformat(str(d)),
+             "sentiment": sentiment or "", "count": count, "star_sum": int(star_sum or 0),
+             "ai_score_sum": int(ai_sum or 0), "ai_scored": ai_scored}
+            for d, sentiment, count, star_sum, ai_sum, ai_scored in rows if d is not None
+        ]
+        if values:
+            db.session.execute(insert(FeedbackDailyStat), values)
+        db.session.commit()
+
+    def ensure_built(self):
+        # Database lama: agregat kosong padahal feedback sudah ada -> bangun sekali per proses
+        if self._built:
+            return
+        if db.session.scalar(select(FeedbackDailyStat.day).limit(1)) is None and \
+                db.session.scalar(select(Feedback.id).limit(1)) is not None:
+            self.rebuild()
+        self._built = True
+
+    def summary(self, days=30):
+        """
+        Ringkasan untuk dashboard: total per sentimen, rata-rata bintang vs skor AI per sentimen,
+        dan jumlah per hari untuk `days` hari terakhir. Ukuran kerja = jumlah baris agregat, bukan feedback.
+        """
+        self.ensure_built()
+        totals = db.session.execute(
+            select(FeedbackDailyStat.sentiment, func.sum(FeedbackDailyStat.count),
+                   func.sum(FeedbackDailyStat.star_sum), func.sum(FeedbackDailyStat.ai_score_sum),
+                   func.sum(FeedbackDailyStat.ai_scored))
+            .group_by(FeedbackDailyStat.sentiment)
+        ).all()
+
+        since = datetime.datetime.utcnow().date() - datetime.timedelta(days=days - 1)
+        daily_rows = db.session.execute(
+            select(FeedbackDailyStat.day, FeedbackDailyStat.sentiment, FeedbackDailyStat.count)
+            .where(FeedbackDailyStat.day >= since)
+        ).all()
+
+        by_sentiment = {}
+        for sentiment, count, star_sum, ai_sum, ai_scored in totals:
+            count = int(count or 0)
+            if not count or not sentiment:
+                continue
+            by_sentiment[sentiment] = {
+                "count": count,
+                "avg_star": round(int(star_sum) / count, 2),
+                "avg_ai_score": round(int(ai_sum) / int(ai_scored), 2) if ai_scored else None,
+            }
+
+        labels = [(since + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+        daily = defaultdict(lambda: [0] * days)
+        for day, sentiment, count in daily_rows:
+            if sentiment and count:
+                daily[sentiment][(day - since).days] = count
+
+        return {"by_sentiment": by_sentiment, "daily": {"labels": labels, "series": dict(daily)}}
+
+
+# Inisialisasi Singleton
+feedback_stats = FeedbackStats()
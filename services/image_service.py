@@ -1,19 +1,85 @@
-import cv2
+import io
 import numpy as np
 from PIL import Image
 
+# Ukuran edge map yang dikirim ke Colab
+CANNY_SIZE = (512, 512)
+
+# Format foto yang diterima dan magic byte-nya (dicek sebelum PIL men-decode apa pun)
+IMAGE_SIGNATURES = {
+    "JPEG": (b"\xff\xd8\xff",),
+    "PNG": (b"\x89PNG\r\n\x1a\n",),
+    "WEBP": (b"RIFF",),
+}
+
+def sniff_image_format(head):
+    """Format foto dari beberapa byte pertama, None jika bukan JPEG / PNG / WebP"""
+    for fmt, signatures in IMAGE_SIGNATURES.items():
+        if any(head.startswith(sig) for sig in signatures):
+            if fmt == "WEBP" and head[8:12] != b"WEBP":
+                continue
+            return fmt
+    return None
+
+def inspect_image(fp, max_pixels):
+    """
+    Cek format + dimensi dari header saja (Image.open tidak men-decode piksel).
+    Guard decompression bomb: file kecil dengan dimensi raksasa ditolak sebelum di-decode.
+    Return (format, width, height); ValueError jika tidak valid.
+    """
+    head = fp.read(16)
+    fp.seek(0)
+    if sniff_image_format(head) is None:
+        raise ValueError("Format gambar harus JPEG, PNG, atau WebP.")
+    try:
+        with Image.open(fp) as img:
+            fmt, (width, height) = img.format, img.size
+    except (Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ValueError(f"Gambar tidak bisa dibaca: {e}")
+    finally:
+        fp.seek(0)
+    if width * height > max_pixels:
+        raise ValueError(f"Resolusi gambar terlalu besar ({width}x{height}).")
+    return fmt, width, height
+
+def _canny_array(gray, low_threshold=100, high_threshold=200):
+    # cv2 di-import saat pertama dipakai agar import app tetap ringan
+    import cv2
+
+    # Blur sedikit untuk mengurangi noise pada hasil generate
+    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+
+    # Algoritma Canny
+    return cv2.Canny(blurred, low_threshold, high_threshold)
+
 def get_canny_image(pil_image, low_threshold=100, high_threshold=200):
     # Konversi PIL ke Numpy (RGB)
     img_np = np.array(pil_image.convert("RGB"))
-    
+
     # Konversi ke Grayscale untuk deteksi tepi
+    import cv2
     gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
-    
-    # Blur sedikit untuk mengurangi noise pada hasil generate
-    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
-    
-    # Algoritma Canny
-    canny = cv2.Canny(blurred, low_threshold, high_threshold)
-    
+
+    canny = _canny_array(gray, low_threshold, high_threshold)
+
     # Balikkan ke format PIL (Grayscale 'L')
-    return Image.fromarray(canny).convert("L")
\ No newline at end of file
+    return Image.fromarray(canny).convert("L")
+
+def load_gray_reduced(image_bytes, size=CANNY_SIZE):
+    """
+    Decode foto upload langsung ke ukuran target.
+    Untuk JPEG, draft() membuat decoder hanya membaca skala 1/2, 1/4 atau 1/8,
+    sehingga foto 12 MP tidak pernah di-decode penuh.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft("L", size)
+    return img.convert("L").resize(size, Image.BILINEAR)
+
+def get_canny_png_bytes(image_bytes, size=CANNY_SIZE, low_threshold=100, high_threshold=200):
+    """Foto upload (bytes) -> edge map PNG (bytes), seluruhnya di memori"""
+    gray = np.asarray(load_gray_reduced(image_bytes, size))
+    canny = _canny_array(gray, low_threshold, high_threshold)
+
+    buf = io.BytesIO()
+    Image.fromarray(canny).save(buf, format="PNG")
+    return buf.getvalue()
@@ -0,0 +1,243 @@
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from services.metrics import JOBS_TOTAL, STAGE_SECONDS, QUEUE_WAIT_SECONDS
+
+# Status yang mungkin dimiliki sebuah job generate
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Dilempar saat antrean generate sudah penuh; retry_after = perkiraan detik sampai ada tempat"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UserQueueFullError(QueueFullError):
+    """Dilempar saat user sudah punya terlalu banyak job di antrean"""
+
+
+class GenerationJob:
+    def __init__(self, user_id, payload, weight=1, slots=1):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.payload = payload
+        self.weight = weight
+        self.slots = slots  # Jumlah request Cloud paralel job ini (variants), dihitung ke batas running user
+        self.status = STATUS_QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": int(self.created_at),
+            "started_at": int(self.started_at) if self.started_at else None,
+            "finished_at": int(self.finished_at) if self.finished_at else None,
+            "error": self.error,
+        }
+
+
+class GenerationQueue:
+    """
+    Antrean job generate dengan sejumlah worker thread.
+    Jumlah worker sebaiknya disamakan dengan jumlah slot backend cloud,
+    sehingga throughput naik seiring kapasitas backend.
+
+    Penjadwalan adil antar user: tiap user punya antrean sendiri dan worker mengambil job
+    bergiliran (weighted round-robin, satu giliran = `weight` job), sehingga satu akun yang
+    mengirim banyak job tidak membuat user lain menunggu di belakang seluruh job-nya.
+    Per user juga dibatasi jumlah job antre (user_max_queued) dan berjalan (user_max_running).
+    """
+
+    def __init__(self):
+        self.handler = None
+        self.app = None
+        self.max_queue = 16
+        self.user_max_queued = 4
+        self.user_max_running = 1
+        self.result_ttl = 3600
+        self._pending = {}      # user_id -> deque job antre
+        self._ring = deque()    # giliran user yang punya job antre
+        self._weights = {}      # user_id -> job per giliran
+        self._credit = {}       # user_id -> sisa jatah giliran saat ini
+        self._running = {}      # user_id -> jumlah slot berjalan (job multi-varian = beberapa slot)
+        self._active = 0        # jumlah job berjalan
+        self._queued = 0
+        self._avg_runtime = None  # EWMA durasi job (detik), untuk Retry-After
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def init_app(self, app, handler):
+        self.app = app
+        self.handler = handler
+        self.max_queue = app.config.get("GENERATION_QUEUE_SIZE", 16)
+        self.user_max_queued = app.config.get("GENERATION_USER_MAX_QUEUED", 4)
+        self.user_max_running = app.config.get("GENERATION_USER_MAX_RUNNING", 1)
+        self.result_ttl = app.config.get("GENERATION_RESULT_TTL", 3600)
+
+        num_workers = app.config.get("GENERATION_WORKERS", 2)
+        for i in range(num_workers):
+            t = threading.Thread(target=self._worker_loop, name=f"gen-worker-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    # --- API UNTUK ROUTE ---
+    def submit(self, user_id, payload, weight=1, slots=1):
+        weight = max(int(weight), 1)
+        # Job multi-varian memakai beberapa slot backend sekaligus, dibatasi batas running per user
+        job = GenerationJob(user_id, payload, weight, max(min(int(slots), self.user_max_running), 1))
+        with self._cond:
+            self._prune_finished()
+            if self._queued >= self.max_queue:
+                raise QueueFullError("Antrean generate penuh.",
+                                     self._retry_after(self._queued / max(len(self._workers), 1)))
+            user_queue = self._pending.get(user_id)
+            if user_queue and len(user_queue) >= self.user_max_queued:
+                raise UserQueueFullError(f"Masih ada {len(user_queue)} job Anda di antrean.",
+                                         self._retry_after(len(user_queue) / self.user_max_running))
+            if user_queue is None:
+                user_queue = self._pending[user_id] = deque()
+                self._ring.append(user_id)
+            self._weights[user_id] = weight
+            user_queue.append(job)
+            self._queued += 1
+            self._jobs[job.id] = job
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """
+        Perkiraan posisi job di antrean (1 = berikutnya diproses) menurut urutan round-robin saat ini,
+        None jika tidak sedang antre
+        """
+        with self._cond:
+            if job.status != STATUS_QUEUED:
+                return None
+            for i, queued in enumerate(self._dispatch_order()):
+                if queued is job:
+                    return i + 1
+        return None
+
+    def stats(self):
+        with self._cond:
+            return {"queued": self._queued, "running": self._active, "workers": len(self._workers)}
+
+    def user_stats(self):
+        """{user_id: {"queued": job, "running": slot}} untuk user yang punya job antre / berjalan"""
+        with self._cond:
+            users = set(self._pending) | set(self._running)
+            return {uid: {"queued": len(self._pending.get(uid, ())), "running": self._running.get(uid, 0)}
+                    for uid in users}
+
+    # --- INTERNAL ---
+    def _retry_after(self, rounds):
+        # Perkiraan detik sampai ada tempat: putaran job di depan x rata-rata durasi job
+        return max(1, math.ceil(rounds * (self._avg_runtime or 10)))
+
+    def _next_job(self):
+        """Job berikutnya menurut weighted round-robin; user yang slot running-nya tidak cukup dilewati"""
+        for _ in range(len(self._ring)):
+            user_id = self._ring[0]
+            user_queue = self._pending[user_id]
+            if self._running.get(user_id, 0) + user_queue[0].slots > self.user_max_running:
+                self._ring.rotate(-1)
+                continue
+            job = user_queue.popleft()
+            self._queued -= 1
+            credit = self._credit.pop(user_id, self._weights[user_id]) - 1
+            if not user_queue:
+                self._ring.popleft()
+                del self._pending[user_id], self._weights[user_id]
+            elif credit > 0:
+                self._credit[user_id] = credit  # Masih punya jatah, tetap di depan giliran
+            else:
+                self._ring.rotate(-1)
+            return job
+        return None
+
+    def _dispatch_order(self):
+        """Urutan job antre bila dijalankan terus dengan giliran yang sama (tanpa melihat batas running)"""
+        order = []
+        ring = deque(self._ring)
+        taken = dict.fromkeys(ring, 0)
+        credit = dict(self._credit)
+        while ring:
+            user_id = ring.popleft()
+            user_queue = self._pending[user_id]
+            n = credit.pop(user_id, self._weights[user_id])
+            order.extend(islice(user_queue, taken[user_id], taken[user_id] + n))
+            taken[user_id] += n
+            if taken[user_id] < len(user_queue):
+                ring.append(user_id)
+        return order
+
+    def _prune_finished(self):
+        # Hapus job selesai yang sudah melewati TTL agar memori tidak terus tumbuh
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                job.status = STATUS_RUNNING
+                job.started_at = time.time()
+                self._running[job.user_id] = self._running.get(job.user_id, 0) + job.slots
+                self._active += 1
+            wait = job.started_at - job.created_at
+            STAGE_SECONDS.observe(wait, "generate", "queue_wait")
+            # Per bobot giliran (jumlahnya terbatas dari config), bukan per user: rincian per user di /admin/queue/status
+            QUEUE_WAIT_SECONDS.observe(wait, str(job.weight))
+
+            try:
+                with self.app.app_context():
+                    job.result = self.handler(job)
+                job.status = STATUS_DONE
+            except Exception as e:
+                print(f"GENERATION ERROR (job {job.id}): {str(e)}")
+                job.error = str(e)
+                job.status = STATUS_FAILED
+            finally:
+                JOBS_TOTAL.inc(job.status)
+                job.finished_at = time.time()
+                # Payload (bytes gambar) tidak diperlukan lagi
+                job.payload = None
+                with self._cond:
+                    runtime = job.finished_at - job.started_at
+                    self._avg_runtime = runtime if self._avg_runtime is None else 0.8 * self._avg_runtime + 0.2 * runtime
+                    self._running[job.user_id] -= job.slots
+                    self._active -= 1
+                    if not self._running[job.user_id]:
+                        del self._running[job.user_id]
+                    # Job user ini yang tertahan batas running kini bisa diambil worker lain yang menganggur
+                    self._cond.notify()
+
+
+# Inisialisasi Singleton
+generation_queue = GenerationQueue()
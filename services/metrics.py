@@ -0,0 +1,188 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket latensi default (detik), mencakup dari operasi lokal ms hingga generate Cloud menit
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180)
+
+timing_logger = logging.getLogger("staging.timing")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in pairs)
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            if not self._values and not self.labelnames:
+                lines.append(f"{self.name} 0")
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [counts per bucket..., +Inf], sum
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][idx] += 1
+            entry[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {round(total, 6)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Metrik yang nilainya dibaca saat scrape dari fungsi (misal statistik cache)"""
+
+    def __init__(self, name, help_text, metric_type, labelnames, fn):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.labelnames = labelnames
+        self.fn = fn  # -> {labels_tuple: value}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        try:
+            values = self.fn()
+        except Exception:
+            values = {}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name, help_text, metric_type, labelnames, fn):
+        with self._lock:
+            self._metrics[name] = CallbackMetric(name, help_text, metric_type, labelnames, fn)
+
+    def render(self):
+        """Format teks Prometheus (text/plain; version=0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Inisialisasi Singleton
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "staging_stage_seconds", "Durasi tiap tahap proses generate / chat", ("path", "stage"))
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "staging_http_request_seconds", "Durasi request HTTP per endpoint", ("endpoint", "status"))
+QUEUE_REJECTIONS = metrics.counter(
+    "staging_queue_rejections_total", "Request generate yang ditolak karena antrean penuh (global / per user)",
+    ("reason",))
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "staging_queue_wait_seconds", "Lama job generate menunggu di antrean per bobot giliran", ("weight",))
+RATE_LIMITED = metrics.counter(
+    "staging_rate_limited_total", "Request AI yang ditolak batas per user", ("scope", "reason"))
+BACKEND_ERRORS = metrics.counter(
+    "staging_backend_errors_total", "Request ke backend cloud yang gagal / lambat", ("backend",))
+JOBS_TOTAL = metrics.counter(
+    "staging_generation_jobs_total", "Job generate selesai per status", ("status",))
+
+
+@contextmanager
+def timed(path, stage):
+    """Span tanpa log per request, hanya dicatat ke histogram STAGE_SECONDS"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, path, stage)
+
+
+class RequestTiming:
+    """
+    Kumpulan span waktu untuk satu request / job.
+    Tiap span dicatat ke histogram STAGE_SECONDS dan, di akhir, ditulis sebagai satu baris log JSON.
+    """
+
+    def __init__(self, path, **fields):
+        self.path = path
+        self.fields = fields
+        self.stages = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            STAGE_SECONDS.observe(elapsed, self.path, stage)
+            self.stages[stage] = round(self.stages.get(stage, 0) + elapsed * 1000, 2)
+
+    def emit(self, status, **fields):
+        if not timing_logger.isEnabledFor(logging.INFO):
+            return
+        record = {
+            "path": self.path,
+            "status": status,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 2),
+            "stages_ms": self.stages,
+        }
+        record.update(self.fields)
+        record.update(fields)
+        timing_logger.info(json.dumps(record))
@@ -0,0 +1,136 @@
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from services.image_service import get_canny_png_bytes, CANNY_SIZE
+
+
+class PreprocessBusyError(Exception):
+    """Dilempar saat slot preprocessing tidak kosong dalam batas waktu tunggu"""
+
+
+def _init_worker():
+    # Dijalankan sekali per proses worker: import cv2 + satu Canny kecil (warm-up),
+    # sehingga job pertama tidak membayar biaya import / inisialisasi OpenCV
+    import cv2
+    from PIL import Image
+
+    cv2.setNumThreads(1)  # Paralelisme dari jumlah proses, bukan thread OpenCV di tiap proses
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(buf, format="JPEG")
+    get_canny_png_bytes(buf.getvalue(), (64, 64))
+
+
+def _canny_from_shm(name, size, canny_size):
+    """Dijalankan di proses worker: foto dibaca langsung dari shared memory milik proses induk"""
+    shm = shared_memory.SharedMemory(name=name)
+    view = shm.buf[:size]
+    try:
+        return get_canny_png_bytes(view, canny_size)
+    finally:
+        view.release()
+        shm.close()
+
+
+class PreprocessPool:
+    """
+    Pool proses untuk preprocessing foto (decode + Canny + encode PNG) agar tidak berebut GIL
+    dengan thread request dan inferensi T5 lokal. Foto dikirim ke worker lewat shared memory
+    (hanya nama blok yang di-pickle), hasil PNG edge map yang kecil dikembalikan biasa.
+    Jumlah job yang menunggu / berjalan dibatasi max_pending; pemanggil menunggu slot hingga
+    queue_timeout detik lalu PreprocessBusyError. workers = 0 atau pool belum di-start()
+    -> dikerjakan langsung di thread pemanggil.
+    """
+
+    def __init__(self):
+        self.workers = 0
+        self.max_pending = 4
+        self.queue_timeout = 30
+        self._executor = None
+        self._context = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get("PREPROCESS_WORKERS", 2)
+        self.max_pending = max(app.config.get("PREPROCESS_MAX_PENDING", 4), 1)
+        self.queue_timeout = app.config.get("PREPROCESS_QUEUE_TIMEOUT", 30)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def start(self):
+        """
+        Jalankan proses worker (pre-warm). Dipanggil hook startup server (gunicorn post_worker_init,
+        lifespan asgi.py), bukan saat import, agar import app tetap ringan. Aman dipanggil berulang.
+        """
+        with self._lock:
+            if self.workers and self._executor is None:
+                self._start()
+
+    def _start(self):
+        # Dipanggil dengan self._lock dipegang. forkserver: proses worker di-fork dari server bersih
+        # (tanpa thread gen-worker / sweeper / pool SQLAlchemy milik proses ini), jadi aman juga saat
+        # pool dibuat ulang di tengah jalan. Syarat spawn / forkserver: modul __main__ aman di-import
+        # ulang, karena itu pool tidak dijalankan dari `python app.py`.
+        if self._context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                self._context = multiprocessing.get_context("forkserver")
+                # cv2 / numpy / PIL sudah di-import di server, worker baru tinggal fork
+                self._context.set_forkserver_preload(["services.preprocess_pool"])
+            else:
+                self._context = multiprocessing.get_context("spawn")
+        # Resource tracker dipakai bersama proses worker: blok shared memory yang di-attach worker
+        # tercatat sekali dan dilepas saat induk melakukan unlink
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=self._context, initializer=_init_worker)
+        for _ in range(self.workers):
+            self._executor.submit(int)  # Tiap submit membuat satu proses worker (pre-warm)
+
+    def canny_png(self, image_bytes, size=CANNY_SIZE):
+        """Foto upload (bytes) -> edge map PNG (bytes), sama dengan get_canny_png_bytes"""
+        if self._executor is None:
+            return get_canny_png_bytes(image_bytes, size)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PreprocessBusyError("Antrean preprocessing penuh, silakan coba lagi.")
+        with self._lock:
+            self._pending += 1
+        shm = shared_memory.SharedMemory(create=True, size=max(len(image_bytes), 1))
+        try:
+            shm.buf[:len(image_bytes)] = image_bytes
+            executor = self._executor
+            try:
+                return executor.submit(_canny_from_shm, shm.name, len(image_bytes), size).result()
+            except BrokenProcessPool:
+                # Proses worker mati (OOM / crash decoder): pool diganti, job ini dikerjakan langsung
+                print("⚠️ Pool preprocessing rusak, membuat ulang proses worker")
+                self._restart(executor)
+                return get_canny_png_bytes(image_bytes, size)
+        finally:
+            shm.close()
+            shm.unlink()
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return  # Sudah dibuat ulang oleh thread lain
+            broken.shutdown(wait=False)
+            self._start()
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "pending": self._pending}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Inisialisasi Singleton
+preprocess_pool = PreprocessPool()
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def bucket_dimension(value, step=0.5):
+    """Bulatkan dimensi ruangan ke kelipatan `step` meter (3.2 -> 3, 3.3 -> 3.5)"""
+    try:
+        v = round(float(str(value).replace(",", ".")) / step) * step
+        return f"{v:g}"
+    except (TypeError, ValueError):
+        return str(value or "").strip().lower()
+
+
+class PromptCache:
+    """Cache LRU untuk hasil generate_prompt, opsional disimpan ke disk (JSON)"""
+
+    def __init__(self, max_entries=1000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def normalize(room_type, style, w, l, h, step=0.5):
+        return (
+            str(room_type or "").strip().lower(),
+            str(style or "").strip().lower(),
+            bucket_dimension(w, step),
+            bucket_dimension(l, step),
+            bucket_dimension(h, step),
+        )
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    # --- PERSISTENSI ---
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                self._entries = OrderedDict((tuple(k), v) for k, v in json.load(f))
+        except (OSError, ValueError):
+            self._entries = OrderedDict()
+
+    def _save(self):
+        # Dipanggil dengan self._lock sudah dipegang
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._entries.items()), f)
+        os.replace(tmp_path, self.path)
+
+
+class _PendingPrompt:
+    def __init__(self, text, distinct=False):
+        self.text = text
+        self.distinct = distinct  # True: tidak digabung dengan input identik (varian sampling)
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class PromptBatcher:
+    """
+    Micro-batching untuk T5: request yang datang dalam jendela `window` detik
+    digabung menjadi satu panggilan generate dengan padding.
+    """
+
+    def __init__(self, generate_fn, window=0.02, max_batch=8):
+        self.generate_fn = generate_fn  # list[str] -> list[str]
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, text):
+        return self._submit([_PendingPrompt(text)])[0]
+
+    def submit_many(self, texts):
+        """
+        Beberapa input sekaligus, masing-masing satu baris sendiri di panggilan T5 walaupun identik
+        (variants=N: sampling membuat tiap baris berbeda). Tetap lewat thread batcher, satu-satunya
+        tempat generate T5 dijalankan, sehingga model tidak dipakai dua thread bersamaan.
+        """
+        return self._submit([_PendingPrompt(text, distinct=True) for text in texts])
+
+    def _submit(self, items):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="t5-batcher", daemon=True)
+                self._thread.start()
+            self._pending.extend(items)
+            self._cond.notify()
+        for item in items:
+            item.done.wait()
+            if item.error:
+                raise item.error
+        return [item.result for item in items]
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Tunggu sebentar agar request lain sempat ikut dalam batch yang sama
+                deadline = time.time() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+
+            # Input identik dalam satu batch cukup di-generate sekali (kecuali item distinct)
+            texts, rows, shared = [], [], {}
+            for item in batch:
+                if item.distinct:
+                    rows.append(len(texts))
+                    texts.append(item.text)
+                else:
+                    if item.text not in shared:
+                        shared[item.text] = len(texts)
+                        texts.append(item.text)
+                    rows.append(shared[item.text])
+            try:
+                outputs = self.generate_fn(texts)
+                for item, row in zip(batch, rows):
+                    item.result = outputs[row]
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+            finally:
+                for item in batch:
+                    item.done.set()
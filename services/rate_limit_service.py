@@ -0,0 +1,114 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from services.metrics import RATE_LIMITED
+
+
+class RateLimitedError(Exception):
+    """Request ditolak batas per user; retry_after = detik yang disarankan ke client (Retry-After)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Batas per user untuk endpoint AI (chat ke backend cloud, submit generate):
+    - token bucket: `rate` request per detik dengan cadangan `burst` (client yang retry terus-menerus
+      cepat habis token-nya, user lain tidak terpengaruh)
+    - jumlah request berjalan bersamaan per user (`concurrent`), misal chat yang sedang menunggu Colab
+    Aturan per scope dari app.config; rate / concurrent 0 = tanpa batas.
+    State ada di memori per proses worker (sama seperti antrean generate).
+    """
+
+    def __init__(self):
+        self.rules = {}          # scope -> (rate per detik, burst, concurrent)
+        self.max_buckets = 10000
+        self._buckets = {}       # (scope, user_id) -> [token, waktu update]
+        self._inflight = {}      # (scope, user_id) -> jumlah request berjalan
+        self._hold = {}          # scope -> EWMA lama request berjalan (detik), untuk Retry-After
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rules = {
+            "chat": (app.config.get("CHAT_RATE_PER_MIN", 20) / 60, app.config.get("CHAT_BURST", 10),
+                     app.config.get("CHAT_USER_CONCURRENCY", 2)),
+            "generate": (app.config.get("GENERATE_RATE_PER_MIN", 6) / 60, app.config.get("GENERATE_BURST", 3), 0),
+        }
+
+    def acquire(self, scope, user_id):
+        """Ambil satu token; RateLimitedError jika bucket user kosong"""
+        rate, burst, _ = self.rules.get(scope, (0, 0, 0))
+        if not rate:
+            return
+        key = (scope, user_id)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune(now)
+                bucket = self._buckets[key] = [burst, now]
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                retry_after = math.ceil((1 - bucket[0]) / rate)
+            else:
+                bucket[0] -= 1
+                return
+        RATE_LIMITED.inc(scope, "rate")
+        raise RateLimitedError(f"Terlalu banyak permintaan, coba lagi dalam {retry_after} detik.", retry_after)
+
+    def refund(self, scope, user_id):
+        """Kembalikan token dari acquire() saat request ditolak karena kondisi server (antrean penuh, kuota)"""
+        rate, burst, _ = self.rules.get(scope, (0, 0, 0))
+        if not rate:
+            return
+        with self._lock:
+            bucket = self._buckets.get((scope, user_id))
+            if bucket is not None:
+                bucket[0] = min(burst, bucket[0] + 1)
+
+    def enter(self, scope, user_id):
+        """Tandai satu request berjalan; RateLimitedError jika user sudah di batas. Return waktu mulai untuk leave()"""
+        limit = self.rules.get(scope, (0, 0, 0))[2]
+        key = (scope, user_id)
+        with self._lock:
+            if limit and self._inflight.get(key, 0) >= limit:
+                retry_after = max(1, math.ceil(self._hold.get(scope, 1)))
+            else:
+                self._inflight[key] = self._inflight.get(key, 0) + 1
+                return time.monotonic()
+        RATE_LIMITED.inc(scope, "concurrent")
+        raise RateLimitedError(f"Masih ada {limit} permintaan Anda yang sedang diproses.", retry_after)
+
+    def leave(self, scope, user_id, started):
+        held = time.monotonic() - started
+        key = (scope, user_id)
+        with self._lock:
+            self._inflight[key] -= 1
+            if not self._inflight[key]:
+                del self._inflight[key]
+            previous = self._hold.get(scope)
+            self._hold[scope] = held if previous is None else 0.8 * previous + 0.2 * held
+
+    @contextmanager
+    def slot(self, scope, user_id):
+        started = self.enter(scope, user_id)
+        try:
+            yield
+        finally:
+            self.leave(scope, user_id, started)
+
+    def _prune(self, now):
+        # Bucket yang sudah terisi penuh lagi sama dengan bucket baru, aman dibuang
+        full = [key for key, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * self.rules[key[0]][0] >= self.rules[key[0]][1]]
+        for key in full:
+            del self._buckets[key]
+
+
+# Inisialisasi Singleton
+rate_limiter = RateLimiter()
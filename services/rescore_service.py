@@ -0,0 +1,122 @@
+import threading
+import time
+from sqlalchemy import select, update
+from extension import db
+from models import Feedback
+from services.feedback_stats import feedback_stats
+
+# Status job re-score
+STATUS_IDLE = "idle"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class RescoreAlreadyRunning(Exception):
+    """Dilempar saat admin memulai re-score ketika job sebelumnya belum selesai"""
+
+
+class RescoreService:
+    """
+    Re-score seluruh tabel Feedback di background setelah model sentimen dilatih ulang.
+    Baris dibaca per chunk (keyset pada id), diprediksi sekaligus lewat predict_sentiment_batch,
+    lalu ai_score/sentiment ditulis balik dengan satu bulk UPDATE per chunk.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.predict_batch = None
+        self.chunk_size = 1000
+        self._lock = threading.Lock()
+        self._thread = None
+        self._progress = {"status": STATUS_IDLE}
+
+    def init_app(self, app, predict_batch):
+        self.app = app
+        self.predict_batch = predict_batch
+        self.chunk_size = app.config.get("RESCORE_CHUNK_SIZE", 1000)
+
+    # --- API UNTUK ROUTE ---
+    def start(self):
+        with self._lock:
+            if self._progress["status"] == STATUS_RUNNING:
+                raise RescoreAlreadyRunning("Re-score masih berjalan.")
+            self._progress = {
+                "status": STATUS_RUNNING,
+                "total": None,
+                "processed": 0,
+                "changed": 0,
+                "started_at": int(time.time()),
+                "finished_at": None,
+                "error": None,
+            }
+            self._thread = threading.Thread(target=self._run, name="feedback-rescore", daemon=True)
+            self._thread.start()
+        return self.progress()
+
+    def progress(self):
+        with self._lock:
+            progress = dict(self._progress)
+        if progress.get("total"):
+            progress["percent"] = round(progress["processed"] / progress["total"] * 100, 1)
+        return progress
+
+    # --- INTERNAL ---
+    def _update(self, **fields):
+        with self._lock:
+            self._progress.update(fields)
+
+    def _run(self):
+        try:
+            with self.app.app_context():
+                self._rescore_all()
+            self._update(status=STATUS_DONE, finished_at=int(time.time()))
+        except Exception as e:
+            print(f"RESCORE ERROR: {str(e)}")
+            self._update(status=STATUS_FAILED, error=str(e), finished_at=int(time.time()))
+
+    def _rescore_all(self):
+        total = db.session.scalar(select(db.func.count(Feedback.id)))
+        self._update(total=total)
+
+        last_id = 0
+        processed = changed = 0
+        while True:
+            # Hanya kolom yang dibutuhkan, tanpa objek ORM (tidak menumpuk di identity map)
+            rows = db.session.execute(
+                select(Feedback.id, Feedback.content, Feedback.ai_score, Feedback.sentiment,
+                       Feedback.star_rating, Feedback.created_at)
+                .where(Feedback.id > last_id)
+                .order_by(Feedback.id)
+                .limit(self.chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            results = self.predict_batch([r.content for r in rows])
+            if results and results[0][0] is None:
+                raise RuntimeError("Model sentimen belum dimuat")
+
+            # Baris yang hasilnya tidak berubah tidak perlu ditulis ulang
+            changed_rows = [
+                (r, score, label) for r, (score, label) in zip(rows, results)
+                if (r.ai_score, r.sentiment) != (score, label)
+            ]
+            if changed_rows:
+                db.session.execute(update(Feedback), [
+                    {"id": r.id, "ai_score": score, "sentiment": label} for r, score, label in changed_rows
+                ])
+                feedback_stats.record_rescore([
+                    (r.created_at, r.star_rating, r.ai_score, r.sentiment, score, label)
+                    for r, score, label in changed_rows
+                ])
+            db.session.commit()
+
+            last_id = rows[-1].id
+            processed += len(rows)
+            changed += len(changed_rows)
+            self._update(processed=processed, changed=changed)
+
+
+# Inisialisasi Singleton
+rescore_service = RescoreService()
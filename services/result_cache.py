@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Cache hasil generate berbasis isi (content-addressed).
+    Kunci = SHA-256 dari user + edge map + prompt + negative prompt, nilai = nama file di static/outputs.
+    Cache per user: file hasil ada di shard user pemiliknya dan dihitung ke kuota user itu,
+    jadi histori user lain tidak boleh menunjuk file yang sama.
+    File hasil tetap milik ImageHistory; eviction hanya menghapus entri index, bukan file.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.max_entries = 500
+        self.max_age = 7 * 24 * 3600
+        self.folder = None
+        self.index_path = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> {"filename", "created_at"}, urutan = LRU
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RESULT_CACHE_ENABLED", True)
+        self.max_entries = app.config.get("RESULT_CACHE_MAX_ENTRIES", 500)
+        self.max_age = app.config.get("RESULT_CACHE_MAX_AGE", 7 * 24 * 3600)
+        self.folder = app.config["GENERATED_FOLDER"]
+        # Index berisi prompt + path hasil semua user: disimpan di luar folder yang dilayani sebagai static
+        self.index_path = app.config["RESULT_CACHE_INDEX"]
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(user_id, canny_bytes, prompt, negative_prompt, seed=None):
+        h = hashlib.sha256()
+        h.update(str(user_id).encode("utf-8") + b"\0")
+        h.update(canny_bytes)
+        h.update(b"\0" + prompt.encode("utf-8"))
+        h.update(b"\0" + negative_prompt.encode("utf-8"))
+        if seed is not None:
+            # Varian dengan seed berbeda adalah hasil berbeda
+            h.update(b"\0" + str(seed).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            valid = (
+                entry is not None
+                and time.time() - entry["created_at"] <= self.max_age
+                and os.path.exists(os.path.join(self.folder, entry["filename"]))
+            )
+            if not valid:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["filename"]
+
+    def put(self, key, filename):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = {"filename": filename, "created_at": time.time()}
+            self._entries.move_to_end(key)
+            self._evict()
+            self._save()
+
+    def discard_filename(self, filename):
+        """Dipanggil saat file hasil dihapus agar cache tidak menunjuk file yang hilang"""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e["filename"] == filename]
+            for k in stale:
+                del self._entries[k]
+            if stale:
+                self._save()
+
+    def rename_filename(self, old_filename, new_filename):
+        """Dipanggil saat file hasil dikompres ulang dengan nama / format baru"""
+        with self._lock:
+            renamed = [e for e in self._entries.values() if e["filename"] == old_filename]
+            for e in renamed:
+                e["filename"] = new_filename
+            if renamed:
+                self._save()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    # --- INTERNAL ---
+    def _evict(self):
+        # Dipanggil dengan self._lock sudah dipegang
+        now = time.time()
+        for k in [k for k, e in self._entries.items() if now - e["created_at"] > self.max_age]:
+            del self._entries[k]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                self._entries = OrderedDict(json.load(f))
+            self._evict()
+        except (OSError, ValueError):
+            self._entries = OrderedDict()
+
+    def _save(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+
+
+# Inisialisasi Singleton
+result_cache = ResultCache()
@@ -1,35 +1,167 @@
 import os
-import joblib
-import requests
+import asyncio
 import base64
+import json
 import re
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import threading
+from services.backend_pool import BackendPool
+from services.prompt_cache import PromptCache, PromptBatcher
+from services.chat_retrieval import ChatRetrievalIndex
+from services.metrics import timed
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
+# torch / transformers / joblib baru di-import saat model dimuat (lihat load_models),
+# sehingga proses CLI / admin yang hanya butuh app tidak menanggung biaya import ML
+device = None
+
+# Regex pembersih teks ulasan, dikompilasi sekali (dipakai per ulasan dan per batch)
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_DIGIT_RE = re.compile(r'\d+')
+_SPACE_RE = re.compile(r'\s+')
+
+class BinaryTransportUnsupported(Exception):
+    """GENERATE_TRANSPORT=binary tetapi backend tidak melayani /generate/binary (tidak ada fallback JSON)"""
 
 class AIService:
     def __init__(self):
-        # URL BASE dari Ngrok Colab
+        # URL BASE dari Ngrok Colab (bisa lebih dari satu, pisahkan dengan koma)
         self.colab_base_url = "https://unrighted-allie-ferruginous.ngrok-free.dev" 
+        backend_urls = os.getenv("COLAB_BACKEND_URLS", self.colab_base_url).split(",")
+        self.backends = BackendPool(
+            [u.strip() for u in backend_urls if u.strip()],
+            pool_size=int(os.getenv("BACKEND_POOL_SIZE", 10)),
+            failure_threshold=int(os.getenv("BACKEND_FAILURE_THRESHOLD", 3)),
+            cooldown=int(os.getenv("BACKEND_COOLDOWN", 30)),
+            slow_threshold=float(os.getenv("BACKEND_SLOW_THRESHOLD", 0)) or None,
+            health_interval=int(os.getenv("BACKEND_HEALTH_INTERVAL", 15)),
+            async_pool_size=int(os.getenv("BACKEND_ASYNC_POOL_SIZE", 1000)),
+        )
         
+        # Transport generate: auto (binary, fallback JSON) | binary | json
+        self.generate_transport = os.getenv("GENERATE_TRANSPORT", "auto")
+        self._binary_supported = None  # None = belum diketahui
+
+        # Cache & micro-batching untuk prompt T5
+        self.prompt_cache = PromptCache(
+            max_entries=int(os.getenv("PROMPT_CACHE_SIZE", 1000)),
+            path=os.getenv("PROMPT_CACHE_PATH") or None,
+        )
+        self.prompt_batcher = PromptBatcher(
+            self._generate_prompt_batch,
+            window=float(os.getenv("PROMPT_BATCH_WINDOW", 0.02)),
+            max_batch=int(os.getenv("PROMPT_BATCH_SIZE", 8)),
+        )
+
+        # Backend inferensi T5: torch | int8 | onnx, thread intra-op eksplisit (0 = default)
+        self.t5_backend = os.getenv("T5_BACKEND", "torch")
+        self.t5_num_threads = int(os.getenv("T5_NUM_THREADS", 0))
+
+        # Index retrieval lokal untuk chatbot (Dataset_json). Dijawab lokal hanya jika skor >= threshold
+        # dan unggul >= margin dari jawaban lain; selain itu diteruskan ke Cloud.
+        # Kalibrasi default: benchmarks/bench_chat_threshold.py
+        self.chat_index = ChatRetrievalIndex()
+        self.chat_dataset_dir = os.getenv("CHAT_DATASET_DIR", "Dataset_json")
+        self.chat_local_threshold = float(os.getenv("CHAT_LOCAL_THRESHOLD", 0.85))
+        self.chat_local_margin = float(os.getenv("CHAT_LOCAL_MARGIN", 0.05))
+
+        # models_loaded: load_models + warm-up selesai (berhasil atau tidak), dipakai gerbang per route.
+        # models_ready: sama, dan model wajib (MODELS_REQUIRED) termuat, dipakai /readyz
+        self.models_loaded = threading.Event()
+        self.models_ready = threading.Event()
+        self.load_errors = {}  # nama model -> pesan error saat dimuat, ditampilkan di /readyz
+        # Model yang harus termuat sebelum /readyz ready (kosong = boleh ready tanpa model lokal)
+        self.required_models = [m.strip() for m in os.getenv("MODELS_REQUIRED", "t5,sentiment").split(",") if m.strip()]
+        self._loader_thread = None
+        self._loader_lock = threading.Lock()
+
         # Inisialisasi placeholder model
         self.t5_model = None
         self.t5_tokenizer = None
         self.rf_model = None
         self.tfidf = None
 
+    def start_background_load(self, base_path):
+        """
+        Muat model di thread terpisah agar server bisa langsung menerima request (/healthz).
+        Aman dipanggil lebih dari sekali (hook gunicorn + lifespan ASGI): model hanya dimuat sekali.
+        """
+        with self._loader_lock:
+            if self._loader_thread is None:
+                self._loader_thread = threading.Thread(target=self.load_models, args=(base_path,),
+                                                       name="model-loader", daemon=True)
+                self._loader_thread.start()
+        return self._loader_thread
+
+    def model_state(self, *names):
+        """Status model yang dipakai satu route: loading (load_models belum selesai) | failed | ready"""
+        if not self.models_loaded.is_set():
+            return "loading"
+        if any(name in self.load_errors for name in names):
+            return "failed"
+        return "ready"
+
+    def status(self):
+        return {
+            "ready": self.models_ready.is_set(),
+            "loaded": self.models_loaded.is_set(),
+            "t5": self.t5_model is not None,
+            "sentiment": self.rf_model is not None and self.tfidf is not None,
+            "chat_index": self.chat_index.ready,
+            "errors": dict(self.load_errors),
+        }
+
     def load_models(self, base_path):
-        """Memuat semua model: T5 Lokal dan Sentiment Analysis Lokal"""
-        
+        """Memuat semua model: T5 Lokal, Sentiment Analysis Lokal dan index chatbot"""
+        self._load_torch_models(base_path)
+
+        # 3. Build / Load Index Retrieval Chatbot (cukup numpy, tetap dimuat walau torch gagal di-import)
+        try:
+            index_dir = os.path.join(base_path, "chat_index")
+            mode = self.chat_index.load_or_build(self.chat_dataset_dir, index_dir)
+            print(f"✅ INFO: Index Chatbot Lokal Berhasil Dimuat ({mode}, {len(self.chat_index.responses)} data).")
+        except Exception as e:
+            # Tidak wajib: tanpa index, semua pertanyaan chat diteruskan ke Cloud
+            self.load_errors["chat_index"] = str(e)
+            print(f"⚠️ WARN: Gagal memuat index chatbot lokal: {e}")
+
+        print("ℹ️ INFO: Chatbot (pertanyaan di luar dataset) & Stable Diffusion dialihkan ke Cloud (Colab).")
+
+        # 4. Warm-up: inferensi pertama (alokasi memori, kernel) tidak dibebankan ke request user
+        self._warm_up()
+        self.models_loaded.set()
+        missing = [name for name in self.required_models if not self.status().get(name)]
+        if missing:
+            # Route yang tidak memakai model tersebut (chat) tetap jalan, hanya /readyz yang tidak ready
+            print(f"❌ ERROR: Model wajib gagal dimuat ({', '.join(missing)}), server tetap tidak ready.")
+            return
+        self.models_ready.set()
+        print("✅ INFO: Semua model siap.")
+
+    def _load_torch_models(self, base_path):
+        """Langkah 1-2 load_models: T5 + model sentimen; error dicatat per model di load_errors"""
+        global device
+        try:
+            import torch
+            import joblib
+            from transformers import AutoTokenizer
+            from services.t5_backends import load_t5_model
+        except Exception as e:
+            for name in ("t5", "sentiment"):
+                self.load_errors[name] = f"Gagal import library model: {e}"
+            print(f"❌ ERROR: Gagal import library model: {e}")
+            return
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
         # 1. Load T5 (Prompt Generator)
         try:
             t5_dir = os.path.join(base_path, "prompt_generator_final_model_t5")
             self.t5_tokenizer = AutoTokenizer.from_pretrained(t5_dir, use_fast=False) 
-            self.t5_model = AutoModelForSeq2SeqLM.from_pretrained(t5_dir).to(device)
-            print("✅ INFO: Model T5 Lokal Berhasil Dimuat.")
+            self.t5_model = load_t5_model(t5_dir, self.t5_backend, self.t5_num_threads, device)
+            print(f"✅ INFO: Model T5 Lokal Berhasil Dimuat (backend: {self.t5_backend}).")
         except Exception as e:
-            print(f"⚠️ WARN: Gagal memuat T5 lokal: {e}")
+            self.t5_model = self.t5_tokenizer = None
+            self.load_errors["t5"] = str(e)
+            print(f"❌ ERROR: Gagal memuat T5 lokal: {e}")
 
         # 2. Load Sentiment Analysis (Random Forest & TF-IDF)
         try:
@@ -39,76 +171,330 @@ class AIService:
             self.tfidf = joblib.load(tfidf_path)
             print("✅ INFO: Model Sentimen Berhasil Dimuat.")
         except Exception as e:
+            self.rf_model = self.tfidf = None
+            self.load_errors["sentiment"] = str(e)
             print(f"❌ ERROR: Gagal memuat model sentimen: {e}")
 
-        print("ℹ️ INFO: Chatbot & Stable Diffusion dialihkan ke Cloud (Colab).")
+    def _warm_up(self):
+        try:
+            if self.t5_model is not None:
+                self._generate_prompt_batch(["generate prompt: jenis_ruangan: kamar tidur, gaya: minimalis, "
+                                             "lebar: 3m, panjang: 4m, tinggi: 3m"], do_sample=False)
+            if self.rf_model is not None:
+                self.predict_sentiment("hasilnya bagus")
+            self.chat_index.query("warna cat kamar tidur")
+        except Exception as e:
+            print(f"⚠️ WARN: Warm-up model gagal: {e}")
 
     # --- FUNGSI SENTIMEN (LOKAL) ---
     def clean_text(self, text):
         text = str(text).lower()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\d+', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _NON_WORD_RE.sub(' ', text)
+        text = _DIGIT_RE.sub(' ', text)
+        text = _SPACE_RE.sub(' ', text).strip()
         return text
 
+    @staticmethod
+    def sentiment_label(prediction):
+        if prediction >= 4:
+            return "POSITIF"
+        elif prediction <= 2:
+            return "NEGATIF"
+        return "NETRAL"
+
     def predict_sentiment(self, text):
         """Fungsi untuk memprediksi sentimen ulasan"""
         if not self.rf_model or not self.tfidf:
             return None, "Model belum dimuat"
             
-        cleaned = self.clean_text(text)
-        vec = self.tfidf.transform([cleaned])
-        prediction = int(self.rf_model.predict(vec)[0])
-        
-        # Tentukan label
-        if prediction >= 4:
-            label = "POSITIF"
-        elif prediction <= 2:
-            label = "NEGATIF"
-        else:
-            label = "NETRAL"
-            
-        return prediction, label
+        with timed("feedback", "predict_sentiment"):
+            cleaned = self.clean_text(text)
+            vec = self.tfidf.transform([cleaned])
+            prediction = int(self.rf_model.predict(vec)[0])
+
+        return prediction, self.sentiment_label(prediction)
+
+    def predict_sentiment_batch(self, texts):
+        """
+        Prediksi sentimen banyak ulasan sekaligus: satu tfidf.transform (matriks sparse)
+        dan satu rf_model.predict untuk seluruh batch. Return list (score, label) sesuai urutan input.
+        """
+        if not self.rf_model or not self.tfidf:
+            return [(None, "Model belum dimuat")] * len(texts)
+        if not texts:
+            return []
+
+        with timed("feedback", "predict_sentiment_batch"):
+            vec = self.tfidf.transform([self.clean_text(t) for t in texts])
+            predictions = self.rf_model.predict(vec)
+
+        return [(int(p), self.sentiment_label(int(p))) for p in predictions]
+
+    # --- FUNGSI CHATBOT (LOKAL + CLOUD) ---
+    def local_reply(self, user_input):
+        """(skor, jawaban dataset lokal atau None jika harus diteruskan ke Cloud)"""
+        score, reply, _, runner_up = self.chat_index.query(user_input)
+        if reply is None or score < self.chat_local_threshold or score - runner_up < self.chat_local_margin:
+            return score, None
+        return score, reply
+
+    def answer_chat(self, user_input):
+        """Jawab dari dataset lokal jika cukup mirip, selain itu teruskan ke Cloud"""
+        with timed("chat", "local_retrieval"):
+            score, local_reply = self.local_reply(user_input)
+        if local_reply is not None:
+            return {"reply": local_reply, "source": "local", "score": round(score, 4)}
+        with timed("chat", "cloud"):
+            reply = self.get_chat_response(user_input)
+        return {"reply": reply, "source": "cloud", "score": round(score, 4)}
+
+    def stream_chat_response(self, user_input):
+        """
+        Generator event chat untuk SSE: {"event": "meta"|"delta"|"error", ...}.
+        Backend yang mendukung /chat/stream diteruskan per-chunk; jika tidak, jatuh ke mode buffered.
+        """
+        score, local_reply = self.local_reply(user_input)
+        if local_reply is not None:
+            yield {"event": "meta", "source": "local", "score": round(score, 4)}
+            yield {"event": "delta", "text": local_reply}
+            return
+
+        yield {"event": "meta", "source": "cloud", "score": round(score, 4)}
+        streamed = False
+        try:
+            headers = {"Accept": "text/event-stream"}
+            with self.backends.stream("POST", "/chat/stream", json={"message": user_input},
+                                      headers=headers, timeout=(5, 60)) as response:
+                content_type = response.headers.get("Content-Type", "")
+                if response.status_code == 200 and "text/event-stream" in content_type:
+                    for line in response.iter_lines(decode_unicode=True):
+                        done, text = self._stream_token(line)
+                        if done:
+                            break
+                        if text:
+                            streamed = True
+                            yield {"event": "delta", "text": text}
+                    return
+        except Exception as e:
+            print(f"CHAT STREAM ERROR: {str(e)}")
+            if streamed:
+                # Sebagian jawaban sudah terkirim, jangan diulang dari awal
+                yield {"event": "error", "message": "Koneksi ke Cloud terputus."}
+                return
+
+        # Backend tidak mendukung streaming: kirim jawaban lengkap sekaligus
+        yield {"event": "delta", "text": self.get_chat_response(user_input)}
 
-    # --- FUNGSI CHATBOT (CLOUD) ---
     def get_chat_response(self, user_input):
         try:
-            url = f"{self.colab_base_url}/chat"
             payload = {"message": user_input}
-            response = requests.post(url, json=payload, timeout=60)
+            # Timeout koneksi pendek agar node mati cepat dilewati
+            response = self.backends.request("POST", "/chat", json=payload, timeout=(5, 60))
             if response.status_code == 200:
                 return response.json().get("reply", "Maaf, tidak ada jawaban.")
             return f"Error Server Cloud ({response.status_code})"
         except Exception as e:
             return f"Gagal terhubung ke Cloud: {str(e)}"
 
+    @staticmethod
+    def _stream_token(line):
+        """Satu baris SSE dari backend -> (selesai, teks token)"""
+        if not line or not line.startswith("data:"):
+            return False, ""
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return True, ""
+        try:
+            return False, json.loads(data).get("token", "")
+        except (ValueError, AttributeError):
+            return False, data
+
+    # --- FUNGSI CHATBOT ASYNC (mode ASGI, lihat asgi.py) ---
+    # Sama dengan versi sinkron, tetapi menunggu Cloud lewat aiohttp di event loop (tanpa memegang thread).
+    # Retrieval lokal (numpy) tetap dijalankan di executor agar tidak menahan event loop.
+    async def answer_chat_async(self, user_input, executor=None):
+        loop = asyncio.get_running_loop()
+        with timed("chat", "local_retrieval"):
+            score, local_reply = await loop.run_in_executor(executor, self.local_reply, user_input)
+        if local_reply is not None:
+            return {"reply": local_reply, "source": "local", "score": round(score, 4)}
+        with timed("chat", "cloud"):
+            reply = await self.get_chat_response_async(user_input)
+        return {"reply": reply, "source": "cloud", "score": round(score, 4)}
+
+    async def stream_chat_response_async(self, user_input, executor=None):
+        loop = asyncio.get_running_loop()
+        score, local_reply = await loop.run_in_executor(executor, self.local_reply, user_input)
+        if local_reply is not None:
+            yield {"event": "meta", "source": "local", "score": round(score, 4)}
+            yield {"event": "delta", "text": local_reply}
+            return
+
+        yield {"event": "meta", "source": "cloud", "score": round(score, 4)}
+        streamed = False
+        try:
+            headers = {"Accept": "text/event-stream"}
+            async with self.backends.astream("POST", "/chat/stream", json={"message": user_input},
+                                             headers=headers, timeout=(5, 60)) as response:
+                content_type = response.headers.get("Content-Type", "")
+                if response.status == 200 and "text/event-stream" in content_type:
+                    async for raw in response.content:
+                        done, text = self._stream_token(raw.decode("utf-8", "replace").rstrip("\r\n"))
+                        if done:
+                            break
+                        if text:
+                            streamed = True
+                            yield {"event": "delta", "text": text}
+                    return
+        except Exception as e:
+            print(f"CHAT STREAM ERROR: {str(e)}")
+            if streamed:
+                yield {"event": "error", "message": "Koneksi ke Cloud terputus."}
+                return
+
+        yield {"event": "delta", "text": await self.get_chat_response_async(user_input)}
+
+    async def get_chat_response_async(self, user_input):
+        try:
+            status, body = await self.backends.arequest("POST", "/chat", json={"message": user_input}, timeout=(5, 60))
+            if status == 200:
+                return json.loads(body).get("reply", "Maaf, tidak ada jawaban.")
+            return f"Error Server Cloud ({status})"
+        except Exception as e:
+            return f"Gagal terhubung ke Cloud: {str(e)}"
+
     # --- FUNGSI IMAGE GENERATION (CLOUD) ---
-    def generate_staged_image(self, prompt, negative_prompt, canny_image_path):
+    def generate_staged_image(self, prompt, negative_prompt, canny_png_bytes, output_path, seed=None):
+        """
+        Kirim edge map ke Cloud dan tulis hasilnya ke output_path.
+        Mode binary (multipart + respon image/png di-stream ke file) dicoba dulu,
+        mode JSON base64 dipakai jika backend belum mendukung (hanya pada GENERATE_TRANSPORT=auto;
+        pada mode binary -> BinaryTransportUnsupported). Return jumlah byte, None jika gagal.
+        seed (opsional) diteruskan ke backend agar tiap varian berbeda walau prompt-nya sama.
+        """
         try:
-            with open(canny_image_path, "rb") as img_file:
-                img_b64 = base64.b64encode(img_file.read()).decode('utf-8')
-
-            url = f"{self.colab_base_url}/generate"
-            payload = {
-                "prompt": prompt,
-                "negative_prompt": negative_prompt,
-                "image": img_b64
-            }
-            response = requests.post(url, json=payload, timeout=180)
-            if response.status_code == 200:
-                result_data = response.json().get("generated_image")
-                return base64.b64decode(result_data)
-            return None
+            if self.generate_transport in ("auto", "binary") and self._binary_supported is not False:
+                written = self._generate_binary(prompt, negative_prompt, canny_png_bytes, output_path, seed)
+                if written is not None:
+                    return written
+                if self.generate_transport == "binary":
+                    raise BinaryTransportUnsupported(
+                        "Backend tidak mendukung /generate/binary, padahal GENERATE_TRANSPORT=binary. "
+                        "Perbarui backend Colab atau pakai GENERATE_TRANSPORT=auto.")
+            return self._generate_json(prompt, negative_prompt, canny_png_bytes, output_path, seed)
+        except BinaryTransportUnsupported:
+            raise
         except Exception as e:
             print(f"Gagal generate di Cloud: {e}")
             return None
 
+    def _generate_binary(self, prompt, negative_prompt, canny_png_bytes, output_path, seed=None):
+        files = {"image": ("canny.png", canny_png_bytes, "image/png")}
+        data = {"prompt": prompt, "negative_prompt": negative_prompt}
+        if seed is not None:
+            data["seed"] = str(seed)
+        headers = {"Accept": "image/png"}
+        with self.backends.stream("POST", "/generate/binary", files=files, data=data,
+                                  headers=headers, timeout=(5, 180)) as response:
+            status = response.status_code
+            content_type = response.headers.get("Content-Type", "")
+            # Hanya endpoint yang tidak dikenal, atau respon sukses yang bukan gambar, berarti backend lama.
+            # Error lain (400, halaman error HTML, dst.) adalah kegagalan biasa, transport tidak diganti.
+            if status in (404, 405, 415) or (200 <= status < 300 and not content_type.startswith("image/")):
+                # Backend lama: ingat agar request berikutnya langsung memakai JSON
+                if self.generate_transport == "auto":
+                    self._binary_supported = False
+                    print("ℹ️ INFO: Backend belum mendukung /generate/binary, memakai mode JSON.")
+                return None
+            if status != 200:
+                raise Exception(f"Error Server Cloud ({status})")
+
+            # Tulis per-chunk ke file sementara, rename setelah lengkap
+            tmp_path = output_path + ".tmp"
+            written = 0
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+                        written += len(chunk)
+                if not written:
+                    raise Exception("Respon gambar dari Cloud kosong")
+                os.replace(tmp_path, output_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._binary_supported = True
+            return written
+
+    def _generate_json(self, prompt, negative_prompt, canny_png_bytes, output_path, seed=None):
+        img_b64 = base64.b64encode(canny_png_bytes).decode('utf-8')
+
+        payload = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "image": img_b64
+        }
+        if seed is not None:
+            payload["seed"] = seed
+        response = self.backends.request("POST", "/generate", json=payload, timeout=(5, 180))
+        if response.status_code == 200:
+            result_data = response.json().get("generated_image")
+            if not result_data:
+                return None
+            output_bytes = base64.b64decode(result_data)
+            # Tulis ke file sementara lalu rename, agar tidak ada file hasil setengah jadi
+            tmp_path = output_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(output_bytes)
+            os.replace(tmp_path, output_path)
+            return len(output_bytes)
+        return None
+
     # --- FUNGSI PROMPT GENERATOR (LOKAL) ---
     def generate_prompt(self, room_type, style, w, l, h):
-        input_text = f"generate prompt: jenis_ruangan: {room_type}, gaya: {style}, lebar: {w}m, panjang: {l}m, tinggi: {h}m"
-        ids = self.t5_tokenizer.encode(input_text, return_tensors="pt").to(device)
-        outputs = self.t5_model.generate(ids, max_length=128, num_beams=4, do_sample=True)
-        return self.t5_tokenizer.decode(outputs[0], skip_special_tokens=True)
+        # Input dinormalisasi (dimensi dibulatkan 0.5m) agar input yang mirip memakai cache yang sama
+        key = PromptCache.normalize(room_type, style, w, l, h)
+        cached = self.prompt_cache.get(key)
+        if cached is not None:
+            return cached
+
+        prompt = self.prompt_batcher.submit(self._prompt_input_text(key, room_type, style))
+        self.prompt_cache.put(key, prompt)
+        return prompt
+
+    def generate_prompt_variants(self, room_type, style, w, l, h, n):
+        """
+        N prompt untuk input yang sama (variants=N). Varian pertama sama dengan generate_prompt
+        (dari cache jika ada), sisanya sampel baru lewat batcher tanpa digabung meski inputnya identik.
+        """
+        if n <= 1:
+            return [self.generate_prompt(room_type, style, w, l, h)]
+        key = PromptCache.normalize(room_type, style, w, l, h)
+        input_text = self._prompt_input_text(key, room_type, style)
+        cached = self.prompt_cache.get(key)
+        prompts = self.prompt_batcher.submit_many([input_text] * (n if cached is None else n - 1))
+        if cached is None:
+            self.prompt_cache.put(key, prompts[0])
+            return prompts
+        return [cached] + prompts
+
+    @staticmethod
+    def _prompt_input_text(key, room_type, style):
+        # Huruf asli room_type/style dipertahankan untuk model, cukup key cache yang lowercase
+        room_type, style = str(room_type or "").strip(), str(style or "").strip()
+        w, l, h = key[2:]
+        return f"generate prompt: jenis_ruangan: {room_type}, gaya: {style}, lebar: {w}m, panjang: {l}m, tinggi: {h}m"
+
+    def _generate_prompt_batch(self, input_texts, do_sample=True):
+        """Satu panggilan generate T5 untuk banyak input sekaligus (dengan padding)"""
+        import torch
+
+        enc = self.t5_tokenizer(input_texts, return_tensors="pt", padding=True)
+        if self.t5_backend == "torch":
+            enc = enc.to(device)
+        with torch.inference_mode():
+            outputs = self.t5_model.generate(**enc, max_length=128, num_beams=4, do_sample=do_sample)
+        return self.t5_tokenizer.batch_decode(outputs, skip_special_tokens=True)
 
 # Inisialisasi Singleton
 ai_service = AIService()
\ No newline at end of file
@@ -0,0 +1,295 @@
+import glob
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from PIL import Image
+from werkzeug.utils import safe_join
+
+# Nama file hasil generate: gen_<user>_<timestamp>_<job>[_<varian>].png|.webp
+OUTPUT_NAME_RE = re.compile(r"^gen_(\d+)_\d+_[0-9a-f]+(?:_\d+)?\.(png|webp)$")
+
+
+class OutputStorage:
+    """
+    Penyimpanan gambar hasil generate dengan layout bertingkat:
+    <GENERATED_FOLDER>/<user_id % 256 (hex)>/<user_id>/<2 hex awal job id>/gen_....png
+    sehingga tiap direktori tetap kecil walau jumlah file jutaan. Nama relatif (dengan '/')
+    disimpan di ImageHistory.image_filename; file lama yang masih flat tetap dilayani.
+
+    Thread sweeper di background:
+    - menghapus file yang diminta delete_async (file + thumbnail turunan + entri result cache)
+    - membersihkan file *.tmp yang tertinggal dan file hasil yang tidak direferensikan ImageHistory
+    - menghitung pemakaian disk per user / total untuk kuota
+    - opsional: mengompres ulang PNG lama menjadi WebP
+    """
+
+    def __init__(self):
+        self.app = None
+        self.root = None
+        self.sharded = True
+        self.user_quota = 0
+        self.global_quota = 0
+        self.sweep_interval = 600
+        self.temp_max_age = 3600
+        self.orphan_grace = 3600
+        self.recompress_after = 0
+        self._deletions = queue.Queue()
+        self._usage = {}  # user_id -> byte
+        self._total = 0
+        self._sweep_changes = None  # nama file -> byte dari add_usage selama sweep berjalan (lihat sweep)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_sweep = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.root = app.config["GENERATED_FOLDER"]
+        self.sharded = app.config.get("OUTPUT_SHARDING", True)
+        self.user_quota = app.config.get("STORAGE_USER_QUOTA", 0)
+        self.global_quota = app.config.get("STORAGE_GLOBAL_QUOTA", 0)
+        self.sweep_interval = app.config.get("STORAGE_SWEEP_INTERVAL", 600)
+        self.temp_max_age = app.config.get("STORAGE_TEMP_MAX_AGE", 3600)
+        self.orphan_grace = app.config.get("STORAGE_ORPHAN_GRACE", 3600)
+        self.recompress_after = app.config.get("STORAGE_RECOMPRESS_AFTER", 0)
+        os.makedirs(self.root, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._sweeper_loop, name="storage-sweeper", daemon=True)
+        self._thread.start()
+
+    # --- PATH ---
+    def new_filename(self, user_id, job_id, suffix=""):
+        name = f"gen_{user_id}_{int(time.time())}_{job_id[:8]}{suffix}.png"
+        if not self.sharded:
+            return name
+        return f"{user_id % 256:02x}/{user_id}/{job_id[:2]}/{name}"
+
+    def renamed(self, filename):
+        """
+        Nama WebP untuk PNG yang sudah dikompres ulang oleh sweeper, None jika tidak ada.
+        URL lama (ter-cache client dengan max-age panjang) diarahkan ke nama ini.
+        """
+        if not filename.endswith(".png"):
+            return None
+        new_filename = filename[:-len(".png")] + ".webp"
+        old_path, new_path = safe_join(self.root, filename), safe_join(self.root, new_filename)
+        if old_path is None or new_path is None or os.path.exists(old_path) or not os.path.exists(new_path):
+            return None
+        return new_filename
+
+    def path(self, filename, create_dirs=False):
+        path = os.path.join(self.root, *filename.split("/"))
+        if create_dirs:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    @staticmethod
+    def temp_path(path):
+        # Di direktori yang sama agar os.replace atomik; nama unik untuk penulis paralel
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def write_atomic(self, filename, data):
+        path = self.path(filename, create_dirs=True)
+        tmp = self.temp_path(path)
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.add_usage(filename, len(data))
+
+    # --- KUOTA ---
+    @staticmethod
+    def owner(filename):
+        match = OUTPUT_NAME_RE.match(os.path.basename(filename))
+        return int(match.group(1)) if match else None
+
+    def add_usage(self, filename, size):
+        user_id = self.owner(filename)
+        with self._lock:
+            self._total += size
+            if user_id is not None:
+                self._usage[user_id] = self._usage.get(user_id, 0) + size
+            if self._sweep_changes is not None:
+                self._sweep_changes[filename] = self._sweep_changes.get(filename, 0) + size
+
+    def over_quota(self, user_id):
+        """Alasan penolakan ('user' / 'global') jika kuota disk terlampaui, None jika masih boleh"""
+        with self._lock:
+            if self.global_quota and self._total >= self.global_quota:
+                return "global"
+            if self.user_quota and self._usage.get(user_id, 0) >= self.user_quota:
+                return "user"
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {"total_bytes": self._total, "users": len(self._usage),
+                    "pending_deletes": self._deletions.qsize(), **self.last_sweep}
+
+    # --- HAPUS ---
+    def delete_async(self, filename):
+        """Hapus file di background (request tidak menunggu I/O disk)"""
+        self._deletions.put(filename)
+
+    def _delete_now(self, filename):
+        from services.result_cache import result_cache
+        from services.thumbnail_service import thumbnail_service
+
+        result_cache.discard_filename(filename)
+        path = self.path(filename)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.add_usage(filename, -size)
+        except OSError:
+            pass
+        thumbnail_service.discard(filename)
+
+    # --- SWEEPER ---
+    def _sweeper_loop(self):
+        # Sweep pertama tidak langsung saat start (tabel / worker lain mungkin belum siap)
+        next_sweep = time.time() + min(60, self.sweep_interval)
+        while True:
+            try:
+                filename = self._deletions.get(timeout=max(0.0, next_sweep - time.time()))
+                self._delete_now(filename)
+                continue
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"⚠️ WARN: Gagal menghapus file hasil: {e}")
+                continue
+            try:
+                with self.app.app_context():
+                    self.sweep()
+            except Exception as e:
+                print(f"⚠️ WARN: Sweep storage gagal: {e}")
+            next_sweep = time.time() + self.sweep_interval
+
+    def sweep(self):
+        """Satu putaran pembersihan; dipanggil thread sweeper (butuh app context)"""
+        # Perubahan add_usage selama walk dicatat per file lalu digabung ke hasil walk (lihat _sweep)
+        with self._lock:
+            self._sweep_changes = {}
+        try:
+            self._sweep()
+        finally:
+            with self._lock:
+                self._sweep_changes = None
+
+    def _sweep(self):
+        from extension import db
+        from models import ImageHistory
+
+        t0 = time.time()
+        now = time.time()
+        usage, total = {}, 0
+        counted_recent = set()  # file baru yang sudah terhitung walk, perubahannya tidak dihitung dua kali
+        removed_temp = removed_orphans = recompressed = 0
+
+        # Temp file Canny versi lama (sebelum preprocessing in-memory) yang tertinggal di CWD
+        for path in glob.glob("temp_canny_*.png"):
+            if now - os.path.getmtime(path) > self.temp_max_age:
+                os.remove(path)
+                removed_temp += 1
+
+        pending = {}  # nama relatif -> stat, dicek ke DB per 500 file (lintas direktori)
+
+        def flush():
+            nonlocal total, removed_orphans, recompressed
+            referenced = {r.image_filename for r in db.session.query(ImageHistory.image_filename)
+                          .filter(ImageHistory.image_filename.in_(list(pending)))}
+            for filename, st in pending.items():
+                if filename not in referenced:
+                    # Grace period: job yang sedang berjalan menulis file sebelum commit histori
+                    if now - st.st_mtime > self.orphan_grace:
+                        self._delete_now(filename)
+                        removed_orphans += 1
+                    continue
+                size = st.st_size
+                if self.recompress_after and filename.endswith(".png") and now - st.st_mtime > self.recompress_after:
+                    new_size = self._recompress(filename)
+                    if new_size:
+                        size = new_size
+                        recompressed += 1
+                user_id = self.owner(filename)
+                usage[user_id] = usage.get(user_id, 0) + size
+                total += size
+                # Hasil yang baru ditulis (add_usage bisa tercatat sedikit setelah file ada di disk)
+                if st.st_mtime >= t0 - 60:
+                    counted_recent.add(filename)
+            pending.clear()
+
+        for dirpath, _, names in os.walk(self.root):
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            prefix = "" if rel_dir == "." else rel_dir + "/"
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp"):
+                    if now - st.st_mtime > self.temp_max_age:
+                        os.remove(path)
+                        removed_temp += 1
+                    continue
+                if OUTPUT_NAME_RE.match(name):
+                    pending[prefix + name] = st
+                    if len(pending) >= 500:
+                        flush()
+        if pending:
+            flush()
+
+        with self._lock:
+            # Hasil baru yang ditulis worker saat walk berjalan tetapi tidak terlihat walk: tambahkan.
+            # Delta negatif (file yang sudah tidak ada saat dilewati walk, termasuk orphan) diabaikan
+            for filename, size in self._sweep_changes.items():
+                if size > 0 and filename not in counted_recent:
+                    user_id = self.owner(filename)
+                    usage[user_id] = usage.get(user_id, 0) + size
+                    total += size
+            self._usage, self._total = usage, total
+        self.last_sweep = {"last_sweep_at": int(t0), "last_sweep_seconds": round(time.time() - t0, 3),
+                           "removed_temp": removed_temp, "removed_orphans": removed_orphans,
+                           "recompressed": recompressed}
+        if self.global_quota and total > self.global_quota:
+            print(f"⚠️ WARN: Storage hasil {total} byte melebihi kuota global {self.global_quota} byte.")
+
+    def _recompress(self, filename):
+        """PNG lama -> WebP (kualitas tinggi); ImageHistory & result cache ikut diarahkan ke nama baru"""
+        from extension import db
+        from models import ImageHistory
+        from services.result_cache import result_cache
+        from services.thumbnail_service import thumbnail_service
+
+        new_filename = filename[:-len(".png")] + ".webp"
+        src, dst = self.path(filename), self.path(new_filename)
+        tmp = self.temp_path(dst)
+        try:
+            with Image.open(src) as img:
+                img.save(tmp, format="WEBP", quality=90, method=4)
+            # Hanya diganti jika memang lebih kecil
+            if os.path.getsize(tmp) >= os.path.getsize(src):
+                return None
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        ImageHistory.query.filter_by(image_filename=filename).update(
+            {ImageHistory.image_filename: new_filename}, synchronize_session=False)
+        db.session.commit()
+        result_cache.rename_filename(filename, new_filename)
+        os.remove(src)
+        thumbnail_service.discard(filename)
+        return os.path.getsize(dst)
+
+
+# Inisialisasi Singleton
+output_storage = OutputStorage()
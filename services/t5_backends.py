@@ -0,0 +1,50 @@
+import os
+import torch
+from transformers import AutoModelForSeq2SeqLM
+
+# Backend inferensi yang didukung untuk prompt generator T5
+#   torch : PyTorch full precision (default)
+#   int8  : PyTorch dengan dynamic int8 quantization pada layer Linear (khusus CPU)
+#   onnx  : ONNX Runtime (butuh `optimum[onnxruntime]`), decoder memakai KV cache
+T5_BACKENDS = ("torch", "int8", "onnx")
+
+
+def configure_threads(num_threads):
+    """Atur jumlah thread intra-op PyTorch secara eksplisit (0 = biarkan default)"""
+    if num_threads:
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Hanya bisa di-set sekali sebelum ada operasi paralel pertama
+            pass
+
+
+def load_t5_model(t5_dir, backend="torch", num_threads=0, device="cpu"):
+    if backend not in T5_BACKENDS:
+        raise ValueError(f"T5 backend tidak dikenal: {backend} (pilihan: {', '.join(T5_BACKENDS)})")
+
+    configure_threads(num_threads)
+
+    if backend == "onnx":
+        import onnxruntime as ort
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        # Hasil export disimpan di samping model asli agar startup berikutnya tidak export ulang
+        onnx_dir = t5_dir.rstrip("/\\") + "_onnx"
+        if os.path.isdir(onnx_dir):
+            return ORTModelForSeq2SeqLM.from_pretrained(onnx_dir, use_cache=True, session_options=options)
+        model = ORTModelForSeq2SeqLM.from_pretrained(t5_dir, export=True, use_cache=True, session_options=options)
+        model.save_pretrained(onnx_dir)
+        return model
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(t5_dir)
+    model.eval()
+    if backend == "int8":
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model.to(device)
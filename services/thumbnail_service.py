@@ -0,0 +1,87 @@
+import os
+import uuid
+from PIL import Image
+from werkzeug.utils import safe_join
+
+# Ukuran (sisi terpanjang, px) dan format turunan yang boleh diminta
+THUMB_SIZES = (128, 256, 512)
+THUMB_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 85, "optimize": True}),
+}
+
+
+class ThumbnailService:
+    """
+    Membuat versi kecil (thumbnail) gambar hasil generate sesuai permintaan,
+    lalu menyimpannya di disk: <DERIVED_FOLDER>/<size>/<nama>.<format>.
+    """
+
+    def __init__(self):
+        self.source_folder = None
+        self.derived_folder = None
+        self.prerender_sizes = ()
+
+    def init_app(self, app):
+        self.source_folder = app.config["GENERATED_FOLDER"]
+        self.derived_folder = app.config.get("DERIVED_FOLDER", os.path.join("static", "derived"))
+        self.prerender_sizes = app.config.get("THUMB_PRERENDER_SIZES", (256,))
+        os.makedirs(self.derived_folder, exist_ok=True)
+
+    def source_path(self, filename):
+        path = safe_join(self.source_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def etag(self, filename, size, fmt):
+        """ETag kuat dari identitas file sumber + varian"""
+        st = os.stat(self.source_path(filename))
+        return f"{st.st_mtime_ns:x}-{st.st_size:x}-{size}-{fmt}"
+
+    def get(self, filename, size, fmt="webp"):
+        """Kembalikan path file turunan, dibuat dulu jika belum ada / sumber lebih baru"""
+        if size not in THUMB_SIZES or fmt not in THUMB_FORMATS:
+            raise ValueError("Ukuran atau format thumbnail tidak didukung.")
+
+        src = self.source_path(filename)
+        if src is None:
+            return None
+
+        name = os.path.splitext(filename)[0] + "." + fmt
+        dst = safe_join(self.derived_folder, str(size), name)
+        if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            return dst
+
+        pil_format, _, save_kwargs = THUMB_FORMATS[fmt]
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        with Image.open(src) as img:
+            img.draft("RGB", (size, size))
+            img = img.convert("RGB")
+            img.thumbnail((size, size), Image.LANCZOS)
+            # Tulis ke file sementara lalu rename agar request paralel tidak membaca file setengah jadi
+            tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+            img.save(tmp, format=pil_format, **save_kwargs)
+        os.replace(tmp, dst)
+        return dst
+
+    def discard(self, filename):
+        """Hapus semua turunan sebuah file sumber (dipanggil saat sumber dihapus / diganti)"""
+        stem = os.path.splitext(filename)[0]
+        for size in THUMB_SIZES:
+            for fmt in THUMB_FORMATS:
+                path = safe_join(self.derived_folder, str(size), f"{stem}.{fmt}")
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def prerender(self, filename, fmt="webp"):
+        """Dipanggil setelah generate agar ukuran umum sudah siap sebelum diminta"""
+        for size in self.prerender_sizes:
+            try:
+                self.get(filename, size, fmt)
+            except Exception as e:
+                print(f"⚠️ WARN: Gagal membuat thumbnail {size}px untuk {filename}: {e}")
+
+
+# Inisialisasi Singleton
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from services.image_service import sniff_image_format, inspect_image
+
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+STATUS_UPLOADING = "uploading"
+STATUS_COMPLETE = "complete"
+
+
+class UploadError(Exception):
+    """Kesalahan upload untuk client: pesan + status HTTP (+ field tambahan, misal offset saat ini)"""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class UploadService:
+    """
+    Upload foto yang bisa dilanjutkan (resumable) dari aplikasi mobile:
+    create (ukuran total) -> PATCH chunk per offset -> complete (sha256) -> upload_id dipakai /api/generate.
+    File ditulis langsung ke disk: <UPLOAD_FOLDER>/<id>.part + <id>.json (metadata).
+    Offset = ukuran .part di disk, jadi setelah koneksi putus client cukup menanyakan offset
+    dan mengirim sisa byte; metadata di disk juga membuat upload bisa dilanjutkan di worker lain.
+    """
+
+    def __init__(self):
+        self.folder = None
+        self.max_bytes = 20 * 1024 * 1024
+        self.chunk_max = 1024 * 1024
+        self.max_pixels = 50_000_000
+        self.ttl = 24 * 3600
+        self.block_size = 64 * 1024
+        self.cleanup_interval = 600
+        self._last_cleanup = 0
+        self._cleanup_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.folder = app.config.get("UPLOAD_FOLDER", "uploads")
+        self.max_bytes = app.config.get("UPLOAD_MAX_BYTES", 20 * 1024 * 1024)
+        self.chunk_max = app.config.get("UPLOAD_CHUNK_MAX", 1024 * 1024)
+        self.max_pixels = app.config.get("UPLOAD_MAX_PIXELS", 50_000_000)
+        self.ttl = app.config.get("UPLOAD_TTL", 24 * 3600)
+        os.makedirs(self.folder, exist_ok=True)
+
+    # --- PATH & METADATA ---
+    def _path(self, upload_id, ext):
+        return os.path.join(self.folder, f"{upload_id}.{ext}")
+
+    def _write_meta(self, meta):
+        path = self._path(meta["id"], "json")
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def _offset(self, upload_id):
+        try:
+            return os.path.getsize(self._path(upload_id, "part"))
+        except OSError:
+            return 0
+
+    def get(self, user_id, upload_id):
+        """Metadata upload milik user; UploadError 404 jika tidak ada, milik user lain, atau kedaluwarsa"""
+        if not UPLOAD_ID_RE.match(upload_id or ""):
+            raise UploadError("Upload tidak ditemukan.", 404)
+        try:
+            with open(self._path(upload_id, "json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise UploadError("Upload tidak ditemukan.", 404)
+        if meta["user_id"] != user_id or meta["expires_at"] < time.time():
+            raise UploadError("Upload tidak ditemukan.", 404)
+        meta["offset"] = meta["size"] if meta["status"] == STATUS_COMPLETE else self._offset(upload_id)
+        return meta
+
+    @staticmethod
+    def public(meta):
+        return {k: meta.get(k) for k in ("id", "status", "size", "offset", "format", "width", "height", "expires_at")}
+
+    # --- API UNTUK ROUTE ---
+    def create(self, user_id, size):
+        # Cek ukuran di awal: file terlalu besar ditolak sebelum satu byte pun dikirim
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError("size (byte) wajib diisi.")
+        if size > self.max_bytes:
+            raise UploadError(f"Ukuran foto maksimal {self.max_bytes // (1024 * 1024)} MB.", 413)
+
+        self.maybe_cleanup()
+        now = int(time.time())
+        meta = {"id": uuid.uuid4().hex, "user_id": user_id, "size": size, "status": STATUS_UPLOADING,
+                "created_at": now, "expires_at": now + self.ttl}
+        open(self._path(meta["id"], "part"), "wb").close()
+        self._write_meta(meta)
+        meta["offset"] = 0
+        return meta
+
+    def append(self, user_id, upload_id, offset, stream, content_length):
+        """
+        Tulis satu chunk mulai `offset` dari stream request (dibaca per blok, tidak ditampung di memori).
+        Offset harus sama dengan byte yang sudah diterima; jika tidak, 409 + offset saat ini
+        (misal chunk sebelumnya ternyata sudah masuk sebagian sebelum koneksi putus).
+        """
+        meta = self.get(user_id, upload_id)
+        if meta["status"] != STATUS_UPLOADING:
+            raise UploadError("Upload sudah selesai.", 409, offset=meta["offset"])
+        if content_length is None:
+            raise UploadError("Content-Length wajib diisi.", 411)
+        if content_length > self.chunk_max:
+            raise UploadError(f"Chunk maksimal {self.chunk_max} byte.", 413)
+        if offset + content_length > meta["size"]:
+            raise UploadError("Chunk melebihi ukuran upload.", 413, offset=meta["offset"])
+
+        # Satu penulis per upload (lintas proses worker): lock file dibuat atomik dengan O_EXCL
+        lock = self._path(upload_id, "lock")
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if time.time() - os.path.getmtime(lock) < 60:
+                raise UploadError("Chunk lain untuk upload ini sedang ditulis.", 409, offset=meta["offset"])
+            os.remove(lock)  # Lock basi dari proses yang mati
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        try:
+            current = self._offset(upload_id)
+            if offset != current:
+                raise UploadError("Offset tidak sesuai.", 409, offset=current)
+            with open(self._path(upload_id, "part"), "ab") as f:
+                remaining = content_length
+                while remaining:
+                    block = stream.read(min(self.block_size, remaining))
+                    if not block:
+                        break  # Koneksi putus: byte yang sudah tertulis tetap dipakai saat lanjut
+                    f.write(block)
+                    remaining -= len(block)
+            new_offset = self._offset(upload_id)
+            if current < 16 <= new_offset:
+                # Cek format begitu 16 byte pertama diterima, bukan setelah seluruh file terkirim
+                with open(self._path(upload_id, "part"), "rb") as f:
+                    if sniff_image_format(f.read(16)) is None:
+                        self._remove(upload_id)
+                        raise UploadError("Format gambar harus JPEG, PNG, atau WebP.", 415)
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+        return new_offset
+
+    def complete(self, user_id, upload_id, sha256):
+        """Verifikasi ukuran + sha256 + header gambar (guard decompression bomb), lalu tandai selesai"""
+        meta = self.get(user_id, upload_id)
+        if meta["status"] == STATUS_COMPLETE:
+            return meta
+        if meta["offset"] != meta["size"]:
+            raise UploadError("Upload belum lengkap.", 409, offset=meta["offset"])
+
+        path = self._path(upload_id, "part")
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(self.block_size), b""):
+                digest.update(block)
+        if not sha256 or digest.hexdigest() != str(sha256).lower():
+            # Isi rusak di jalan: mulai ulang dari offset 0 pada sesi yang sama
+            open(path, "wb").close()
+            raise UploadError("Checksum sha256 tidak cocok, kirim ulang dari offset 0.", 422, offset=0)
+        try:
+            with open(path, "rb") as f:
+                fmt, width, height = inspect_image(f, self.max_pixels)
+        except ValueError as e:
+            self._remove(upload_id)
+            raise UploadError(str(e), 422)
+
+        meta.pop("offset")
+        meta.update(status=STATUS_COMPLETE, sha256=digest.hexdigest(), format=fmt, width=width, height=height)
+        self._write_meta(meta)
+        meta["offset"] = meta["size"]
+        return meta
+
+    def read(self, user_id, upload_id):
+        """Isi foto dari upload yang sudah complete (dipanggil worker generate)"""
+        meta = self.get(user_id, upload_id)
+        if meta["status"] != STATUS_COMPLETE:
+            raise UploadError("Upload belum selesai.", 409, offset=meta["offset"])
+        with open(self._path(upload_id, "part"), "rb") as f:
+            return f.read()
+
+    def delete(self, user_id, upload_id):
+        self.get(user_id, upload_id)
+        self._remove(upload_id)
+
+    def _remove(self, upload_id):
+        for ext in ("part", "json", "lock"):
+            try:
+                os.remove(self._path(upload_id, ext))
+            except OSError:
+                pass
+
+    # --- RETENSI ---
+    def maybe_cleanup(self):
+        """Hapus upload kedaluwarsa (belum selesai maupun sudah dipakai), paling sering sekali per cleanup_interval"""
+        now = time.time()
+        if now - self._last_cleanup < self.cleanup_interval or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_cleanup = now
+            for name in os.listdir(self.folder):
+                upload_id, _, ext = name.partition(".")
+                if ext != "json" or not UPLOAD_ID_RE.match(upload_id):
+                    continue
+                try:
+                    with open(os.path.join(self.folder, name)) as f:
+                        expired = json.load(f)["expires_at"] < now
+                except (OSError, ValueError, KeyError):
+                    expired = now - os.path.getmtime(os.path.join(self.folder, name)) > self.ttl
+                if expired:
+                    self._remove(upload_id)
+        finally:
+            self._cleanup_lock.release()
+
+
+# Inisialisasi Singleton
+upload_service = UploadService()